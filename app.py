@@ -1,7 +1,9 @@
 from app import create_app
+from app.database import create_all
 
 app = create_app()
 
 if __name__ == "__main__":
+    # Local development server; deployments run `flask --app app db-init` instead.
+    create_all()
     app.run(host="0.0.0.0", port=5000)
-
@@ -1,26 +1,52 @@
 from flask import Flask
 from flask_wtf import CSRFProtect
 
+from .assets import assets
+from .cache import export_cache, fragment_cache, page_cache, prefill_cache
+from .cli import init_app as init_cli
+from .compression import compression
 from .config import Config
 from .database import init_app as init_database, session_cleanup
+from .jobs import export_jobs
+from .live import entry_feed
+from .metrics import metrics
+from .partitions import partitions
+from .spc import SUBGROUP_SIZES
 
 csrf = CSRFProtect()
 
 
 def create_app(config_class: type[Config] = Config):
-    app = Flask(__name__, template_folder="../templates")
+    app = Flask(__name__, template_folder="../templates", static_folder="../static")
     app.config.from_object(config_class)
 
     if not app.config.get("SECRET_KEY"):
         raise RuntimeError("SECRET_KEY environment variable must be set for this app.")
+    if app.config.get("SPC_SUBGROUP_SIZE", 5) not in SUBGROUP_SIZES:
+        raise RuntimeError(
+            f"SPC_SUBGROUP_SIZE must be between {SUBGROUP_SIZES[0]} and {SUBGROUP_SIZES[-1]}, "
+            f"got {app.config.get('SPC_SUBGROUP_SIZE')!r}."
+        )
 
     # Ensure baseline choices are available even if env vars were empty.
     app.config.setdefault("SHIFT_CHOICES", ["A", "B", "C"])
     app.config.setdefault("MACHINE_CHOICES", [2, 3, 4, 5, 6])
     app.config.setdefault("MODEL_CHOICES", [f"sample{i}" for i in range(1, 11)])
 
-    csrf.init_app(app)
     init_database(app)
+    # Before CSRFProtect so requests it rejects are still timed.
+    metrics.init_app(app)
+    csrf.init_app(app)
+    partitions.init_app(app)
+    prefill_cache.init_app(app)
+    export_cache.init_app(app)
+    page_cache.init_app(app)
+    fragment_cache.init_app(app)
+    assets.init_app(app)
+    compression.init_app(app)
+    export_jobs.init_app(app)
+    entry_feed.init_app(app)
+    init_cli(app)
 
     from .routes import bp as main_bp
 
@@ -0,0 +1,90 @@
+"""ASGI entry point: Flask on a thread pool, /records/stream on the event loop.
+
+    uvicorn app.asgi:application --workers 2
+
+Every other request runs the WSGI app on one of WSGI_THREADS threads per
+worker, as under gunicorn --threads. Live-feed streams are answered here by
+EntryFeed.watch_async(), so an open stream holds no thread and a worker can
+serve LIVE_FEED_MAX_ASYNC_WATCHERS of them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+from a2wsgi import WSGIMiddleware
+from flask import url_for
+
+from . import create_app
+from .live import entry_feed
+from .routes.main import stream_arguments
+
+flask_app = create_app()
+_wsgi = WSGIMiddleware(flask_app, workers=flask_app.config.get("WSGI_THREADS", 8))
+with flask_app.test_request_context():
+    _STREAM_PATH = url_for("main.records_stream")
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+    elif scope["type"] == "http" and scope["path"] == _STREAM_PATH and scope["method"] == "GET" and entry_feed.enabled:
+        await _stream(scope, receive, send)
+    else:
+        await _wsgi(scope, receive, send)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _stream(scope, receive, send):
+    headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in scope["headers"]]
+    with flask_app.test_request_context(_STREAM_PATH, query_string=scope["query_string"].decode("latin-1"), headers=headers):
+        filters, last_event_id = stream_arguments()
+    events = await entry_feed.watch_async(filters, last_event_id)
+    if events is None:
+        retry_after = str(max(int(entry_feed.max_seconds), 1)).encode()
+        await send({"type": "http.response.start", "status": 503, "headers": [(b"retry-after", retry_after)]})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    # Runs the generator to its first yield right away, so its finally always drops the watcher.
+    first = await events.__anext__()
+
+    async def pump():
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream; charset=utf-8"),
+                    (b"cache-control", b"no-cache"),
+                    # Stops nginx-style proxies from buffering the stream.
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": first.encode("utf-8"), "more_body": True})
+        async for event in events:
+            await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def disconnected():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    sending = asyncio.ensure_future(pump())
+    closed = asyncio.ensure_future(disconnected())
+    try:
+        await asyncio.wait({sending, closed}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        sending.cancel()
+        closed.cancel()
+        await asyncio.gather(sending, closed, return_exceptions=True)
+        await events.aclose()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from flask import request, url_for
+from werkzeug.security import safe_join
+
+from .cache import encode_variants, variant_response
+
+# Text assets get precompressed variants; anything else is served as is.
+_COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+class Assets:
+    """Fingerprinted static files: ``asset_url('base.css')`` -> ``/static/base.css?v=<hash>``.
+
+    A request carrying the current hash is answered from memory, gzip/brotli
+    encoded, with a long-lived immutable Cache-Control; a new deploy changes
+    the hash and therefore the URL. Requests without it (or with an old
+    hash) fall through to Flask's normal static view.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._assets: Dict[str, Tuple[int, str, Dict[str, bytes], str]] = {}
+        self._send_static = None
+        self.folder: Optional[str] = None
+        self.max_age = 0
+
+    def init_app(self, app):
+        self.folder = app.static_folder
+        self.max_age = int(app.config.get("ASSET_MAX_AGE", 365 * 24 * 3600))
+        with self._lock:
+            self._assets.clear()
+        self._send_static = app.view_functions["static"]
+        app.view_functions["static"] = self.send_static
+        app.add_template_global(self.url, "asset_url")
+
+    def _load(self, filename: str):
+        """(mtime, digest, variants, mimetype) of a static file, or ``None`` if it does not exist."""
+        path = safe_join(self.folder, filename) if self.folder else None
+        if path is None:
+            return None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            asset = self._assets.get(filename)
+        if asset is not None and asset[0] == mtime:
+            return asset
+
+        with open(path, "rb") as handle:
+            body = handle.read()
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        if mimetype.startswith(_COMPRESSIBLE):
+            digest, variants = encode_variants(body)
+        else:
+            digest, variants = hashlib.sha256(body).hexdigest(), {"identity": body}
+        asset = (mtime, digest[:12], variants, mimetype)
+        with self._lock:
+            self._assets[filename] = asset
+        return asset
+
+    def url(self, filename: str) -> str:
+        asset = self._load(filename)
+        if asset is None:
+            return url_for("static", filename=filename)
+        return url_for("static", filename=filename, v=asset[1])
+
+    def send_static(self, filename: str):
+        asset = self._load(filename)
+        if asset is None or request.args.get("v") != asset[1]:
+            return self._send_static(filename=filename)
+        _, digest, variants, mimetype = asset
+        return variant_response(digest, variants, mimetype, f"public, max-age={self.max_age}, immutable")
+
+
+assets = Assets()
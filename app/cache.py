@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Iterator, Optional, Tuple, Union
+
+from flask import Response, request, session
+
+MISSING = object()
+
+
+class PrefillCache:
+    """Bounded LRU/TTL cache of the latest conditions per (machine_no, model_name).
+
+    Gunicorn workers share a stamp file: a save touches it, and every other
+    worker drops its cached snapshots the next time it notices the new mtime.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self._generation = 0
+        self._stamp = 0
+        self.max_entries = 0
+        self.ttl = 0.0
+        self.stamp_path: Optional[str] = None
+
+    def init_app(self, app):
+        self.max_entries = int(app.config.get("PREFILL_CACHE_SIZE", 256))
+        self.ttl = float(app.config.get("PREFILL_CACHE_TTL", 300))
+        self.stamp_path = app.config.get("PREFILL_CACHE_STAMP") or None
+        self._stamp = self._read_stamp()
+        self.clear()
+
+    @property
+    def generation(self) -> int:
+        """Token to pass to put(); a put is discarded if a write happened in between."""
+        return self._generation
+
+    def get(self, key: Hashable):
+        """Return the cached snapshot (``None`` if the pair has no entries yet) or ``MISSING``."""
+        if not self.max_entries:
+            return MISSING
+        self._sync()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return MISSING
+            expires_at, _, snapshot = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return snapshot
+
+    def put(self, key: Hashable, sort_key, snapshot, generation: int):
+        """Store a snapshot read from the database at ``generation``."""
+        if not self.max_entries:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._store(key, sort_key, snapshot)
+
+    def record_write(self, key: Hashable, sort_key, snapshot):
+        """Write-through after an entry is saved, then invalidate the other workers."""
+        self._sync()
+        with self._lock:
+            self._generation += 1
+            item = self._entries.get(key)
+            if item is not None:
+                cached_sort_key = item[1]
+                # An entry back-dated behind the cached one does not change the latest conditions.
+                if cached_sort_key is None or sort_key >= cached_sort_key:
+                    self._store(key, sort_key, snapshot)
+        self._touch()
+
+    def write_stamp(self) -> Tuple[int, int]:
+        """Changes whenever entries are written here or in another worker (for keying other caches)."""
+        self._sync()
+        with self._lock:
+            return self._stamp, self._generation
+
+    def invalidate_all(self):
+        """Drop every snapshot here and in the other workers (e.g. after a bulk import)."""
+        self.clear()
+        self._touch()
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def _store(self, key, sort_key, snapshot):
+        self._entries[key] = (time.monotonic() + self.ttl, sort_key, snapshot)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_stamp(self) -> int:
+        if not self.stamp_path:
+            return 0
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _sync(self):
+        stamp = self._read_stamp()
+        if stamp != self._stamp:
+            self._stamp = stamp
+            self.clear()
+
+    def _touch(self):
+        if not self.stamp_path:
+            return
+        try:
+            with open(self.stamp_path, "a"):
+                pass
+            os.utime(self.stamp_path)
+        except OSError:
+            return
+        self._stamp = self._read_stamp()
+
+
+prefill_cache = PrefillCache()
+
+
+class ExportCache:
+    """Finished /export downloads on local disk, evicted least recently used beyond ``max_bytes``.
+
+    Files are written under a temporary name and renamed into place, so
+    workers sharing the directory never serve a partial export.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.directory: Optional[str] = None
+        self.max_bytes = 0
+
+    def init_app(self, app):
+        self.directory = app.config.get("EXPORT_CACHE_DIR") or None
+        self.max_bytes = int(app.config.get("EXPORT_CACHE_MAX_BYTES", 0))
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory and self.max_bytes)
+
+    @staticmethod
+    def key(*parts) -> str:
+        return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:32]
+
+    def path(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, key + extension)
+
+    def get(self, key: str, extension: str) -> Optional[str]:
+        """Path of the cached file, or ``None``; a hit refreshes its LRU position."""
+        path = self.path(key, extension)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def tee(self, key: str, extension: str, chunks: Iterable[Union[str, bytes]]) -> Iterator[Union[str, bytes]]:
+        """Pass ``chunks`` through, storing them; the file is kept only if the stream completes."""
+        fd, partial = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        complete = False
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                for chunk in chunks:
+                    handle.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+                    yield chunk
+            os.replace(partial, self.path(key, extension))
+            complete = True
+        finally:
+            if not complete:
+                try:
+                    os.unlink(partial)
+                except OSError:
+                    pass
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            files = []
+            for entry in os.scandir(self.directory):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith(".part"):
+                    # Left behind by a worker that died mid-export.
+                    if stat.st_mtime < time.time() - 3600:
+                        try:
+                            os.unlink(entry.path)
+                        except OSError:
+                            pass
+                    continue
+                files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+
+
+export_cache = ExportCache()
+
+
+class PageCache:
+    """Rendered bodies of pages that only change on deploy (home, machine selection).
+
+    Each page is rendered once per worker and kept with a strong ETag plus
+    gzip (and brotli, when installed) variants, so a repeat visit is a dict
+    lookup and a revalidation a 304. Requests with query arguments or
+    pending flash messages are rendered normally.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pages: Dict[Hashable, Tuple[str, Dict[str, bytes]]] = {}
+        self.enabled = False
+        self.max_age = 0
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get("PAGE_CACHE_ENABLED", True))
+        self.max_age = int(app.config.get("PAGE_CACHE_MAX_AGE", 0))
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def response(self, key: Hashable, render: Callable[[], str]):
+        """The cached page for ``key``, rendering it with ``render()`` on first use."""
+        if not self.enabled or request.args or session.get("_flashes"):
+            return render()
+        with self._lock:
+            page = self._pages.get(key)
+        if page is None:
+            page = encode_variants(render().encode("utf-8"))
+            with self._lock:
+                page = self._pages.setdefault(key, page)
+        digest, variants = page
+        cache_control = f"private, max-age={self.max_age}" if self.max_age else "no-cache"
+        return variant_response(digest, variants, "text/html; charset=utf-8", cache_control)
+
+
+def encode_variants(body: bytes) -> Tuple[str, Dict[str, bytes]]:
+    """Content digest plus identity, gzip and (if the brotli package is installed) brotli encodings."""
+    variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        variants["br"] = brotli.compress(body, quality=11)
+    return hashlib.sha256(body).hexdigest()[:32], variants
+
+
+def variant_response(digest: str, variants: Dict[str, bytes], mimetype: str, cache_control: str) -> Response:
+    """Serve the encoding of a precompressed body that the client accepts, answering 304 when unchanged."""
+    encoding = request.accept_encodings.best_match([name for name in ("br", "gzip") if name in variants])
+    response = Response(variants[encoding or "identity"], mimetype=mimetype)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    # Strong ETags must differ between encodings of the same body.
+    response.set_etag(f"{digest}-{encoding}" if encoding else digest)
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = cache_control
+    return response.make_conditional(request)
+
+
+page_cache = PageCache()
+
+
+class FragmentCache:
+    """Bounded LRU/TTL cache of rendered template fragments (the /records table body).
+
+    Callers put the data version in the key (PrefillCache.write_stamp()), so
+    a save in any worker makes older fragments unreachable; they age out of
+    the LRU. The TTL bounds staleness after writes made outside the app.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self.max_entries = 0
+        self.ttl = 0.0
+
+    def init_app(self, app):
+        self.max_entries = int(app.config.get("RECORDS_FRAGMENT_CACHE_SIZE", 128))
+        self.ttl = float(app.config.get("RECORDS_FRAGMENT_CACHE_TTL", 60))
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key: Hashable):
+        """The cached value or ``MISSING``."""
+        if not self.max_entries:
+            return MISSING
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return MISSING
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,81 @@
+import click
+from flask import current_app
+
+from . import importer, summary
+from .cache import prefill_cache
+from .database import create_all, lift_statement_timeout, session_scope
+from .partitions import partitions
+
+
+@click.command("db-init")
+def db_init_command():
+    """Create or upgrade the database schema (run once per deploy)."""
+    changes = create_all()
+    for change in changes:
+        click.echo(change)
+    click.echo("Schema is up to date." if not changes else f"Applied {len(changes)} change(s).")
+
+
+@click.command("summary-backfill")
+def summary_backfill_command():
+    """Rebuild the shift/day summary table (archived months keep their rows)."""
+    since = partitions.archive_boundary()
+    with session_scope() as db_session:
+        lift_statement_timeout(db_session)
+        count = summary.backfill(db_session, since=since)
+    click.echo(f"Rebuilt {count} summary rows" + (f" (archived months before {since} kept)." if since else "."))
+
+
+@click.command("import-csv")
+@click.argument("path", type=click.File("r", encoding="utf-8-sig"))
+def import_csv_command(path):
+    """Load entries from a CSV in the /export layout."""
+    result = importer.import_with_config(path, current_app.config)
+    for error in result.errors:
+        click.echo(f"line {error.line}: {error.column}: {error.message}", err=True)
+    if result.truncated:
+        click.echo("(further errors omitted)", err=True)
+    click.echo(
+        f"Imported {result.inserted} row(s), rejected {result.rejected} "
+        f"in {result.elapsed:.2f}s ({result.rows_per_second:,.0f} rows/s)."
+    )
+    if result.errors:
+        raise SystemExit(1)
+
+
+@click.command("partition-entries")
+def partition_entries_command():
+    """PostgreSQL: partition entries by work_date month and create the upcoming months.
+
+    Running workers notice the conversion within a minute; no restart is needed.
+    """
+    try:
+        changes = partitions.partition_table()
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc))
+    for change in changes:
+        click.echo(change)
+    click.echo("Partitions are up to date." if not changes else f"Applied {len(changes)} change(s).")
+
+
+@click.command("archive-entries")
+@click.option("--keep-months", type=int, default=None, help="Months kept in the live table (default ARCHIVE_KEEP_MONTHS).")
+def archive_entries_command(keep_months):
+    """SQLite: move months older than --keep-months into per-month archive files."""
+    try:
+        moved = partitions.archive(keep_months)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc))
+    for month, count in moved:
+        click.echo(f"archived {count} row(s) of {month:%Y-%m} to {partitions.archive_path(month)}")
+    if moved:
+        prefill_cache.invalidate_all()
+    click.echo(f"Archived {sum(count for _, count in moved)} row(s).")
+
+
+def init_app(app):
+    app.cli.add_command(db_init_command)
+    app.cli.add_command(summary_backfill_command)
+    app.cli.add_command(import_csv_command)
+    app.cli.add_command(partition_entries_command)
+    app.cli.add_command(archive_entries_command)
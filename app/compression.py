@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import gzip
+import os
+import shutil
+import tempfile
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from flask import request, send_file
+
+# Response types worth compressing; exports in csv.gz/zst, Parquet and Arrow already are.
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/csv",
+    "text/plain",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+}
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush so each chunk of a streamed response reaches the client right away.
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        import brotli
+
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _brotli_available() -> bool:
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class Compression:
+    """gzip/brotli Content-Encoding for HTML, CSV, JSON and text responses.
+
+    Buffered bodies are compressed in one go; streamed ones (/export) chunk
+    by chunk with a flush after each, so downloads still start immediately.
+    Responses that already carry a Content-Encoding (cached pages, static
+    assets) and file passthroughs are left alone; files on disk (cached
+    exports, job downloads) go through send_file() instead, which serves
+    a gzip copy kept next to the file.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.min_size = 500
+        self.gzip_level = 6
+        self.brotli_quality = 4
+        self._encodings = ["gzip"]
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get("COMPRESSION_ENABLED", True))
+        self.min_size = int(app.config.get("COMPRESSION_MIN_SIZE", 500))
+        self.gzip_level = int(app.config.get("COMPRESSION_GZIP_LEVEL", 6))
+        self.brotli_quality = int(app.config.get("COMPRESSION_BROTLI_QUALITY", 4))
+        self._encodings = ["br", "gzip"] if _brotli_available() else ["gzip"]
+        if self.enabled:
+            app.after_request(self._after_request)
+
+    def send_file(self, path: str, mimetype: str, etag=True, **kwargs):
+        """flask.send_file() of ``path``, or of its gzip copy when the client accepts gzip."""
+        compressible = self.enabled and mimetype.split(";")[0].strip() in COMPRESSIBLE_MIMETYPES
+        compress = compressible and bool(request.accept_encodings["gzip"])
+        if compress:
+            path = _gzip_copy(path, self.gzip_level)
+            if isinstance(etag, str):
+                etag += ".gz"
+        response = send_file(path, mimetype=mimetype, etag=etag, **kwargs)
+        if compressible:
+            response.vary.add("Accept-Encoding")
+        if compress:
+            response.headers["Content-Encoding"] = "gzip"
+        return response
+
+    def _stream(self, encoding: str):
+        return _BrotliStream(self.brotli_quality) if encoding == "br" else _GzipStream(self.gzip_level)
+
+    def _after_request(self, response):
+        if (
+            response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or "Content-Encoding" in response.headers
+            or response.direct_passthrough
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding: Optional[str] = request.accept_encodings.best_match(self._encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = _compressed_chunks(response.response, self._stream(encoding))
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            stream = self._stream(encoding)
+            response.set_data(stream.compress(data) + stream.finish())
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The compressed body is a different byte sequence; a weak tag still matches If-None-Match.
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def _gzip_copy(path: str, level: int) -> str:
+    """``path + '.gz'``, written on first use; the files it is used for never change once written."""
+    target = path + ".gz"
+    try:
+        # Keeps the copy's LRU position in step with the export cache entry.
+        os.utime(target)
+        return target
+    except OSError:
+        pass
+    fd, partial = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with open(path, "rb") as source, os.fdopen(fd, "wb") as handle:
+            with gzip.GzipFile(fileobj=handle, mode="wb", compresslevel=level, mtime=0) as compressed:
+                shutil.copyfileobj(source, compressed, 1024 * 1024)
+        os.replace(partial, target)
+    except BaseException:
+        try:
+            os.unlink(partial)
+        except OSError:
+            pass
+        raise
+    return target
+
+
+def _compressed_chunks(chunks: Iterable, stream) -> Iterator[bytes]:
+    try:
+        for chunk in chunks:
+            data = stream.compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield stream.finish()
+    finally:
+        # Closes stream_with_context() generators (and the database session they hold).
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+compression = Compression()
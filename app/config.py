@@ -1,4 +1,6 @@
+import json
 import os
+import tempfile
 from typing import List
 
 
@@ -27,11 +29,95 @@ class Config:
     SESSION_COOKIE_SECURE = os.environ.get("SESSION_COOKIE_SECURE", "1") == "1"
     WTF_CSRF_TIME_LIMIT = None
 
+    # app.asgi (uvicorn): threads per worker that run the Flask app, like gunicorn --threads.
+    WSGI_THREADS = int(os.environ.get("WSGI_THREADS", "8"))
+
     # Database
     DATABASE_URL = os.environ.get("DATABASE_URL", "")
     DB_PATH = os.environ.get("DB_PATH", "production_log_v3.db")
     SQL_ECHO = os.environ.get("SQL_ECHO", "0") == "1"
 
+    # PostgreSQL connection pool (per worker process)
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "5"))
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "60000"))  # 0 disables
+
+    # SQLite tuning: WAL lets readers run alongside a writer, and busy_timeout
+    # makes concurrent saves wait for the write lock instead of failing.
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+    # PostgreSQL: flask partition-entries range-partitions entries by work_date
+    # month and keeps this many months of partitions ready ahead of today.
+    PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", "3"))
+    # SQLite: flask archive-entries moves months older than ARCHIVE_KEEP_MONTHS
+    # into one database file per month under ARCHIVE_DIR. This keeps the live
+    # file small; it does not make reads faster.
+    ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "entries-archive")
+    ARCHIVE_KEEP_MONTHS = int(os.environ.get("ARCHIVE_KEEP_MONTHS", "12"))
+
+    # Latest-conditions prefill cache (per worker). Saves touch the stamp file
+    # so the other gunicorn workers on this host drop their copies.
+    PREFILL_CACHE_SIZE = int(os.environ.get("PREFILL_CACHE_SIZE", "256"))
+    PREFILL_CACHE_TTL = float(os.environ.get("PREFILL_CACHE_TTL", "300"))
+    PREFILL_CACHE_STAMP = os.environ.get(
+        "PREFILL_CACHE_STAMP", os.path.join(tempfile.gettempdir(), "data-entry-app-prefill.stamp")
+    )
+
+    # /home and /select-machine are rendered once per worker and served with a
+    # strong ETag and gzip/brotli variants. PAGE_CACHE_MAX_AGE lets browsers
+    # reuse them without revalidating; 0 sends no-cache (ETag check each visit).
+    PAGE_CACHE_ENABLED = os.environ.get("PAGE_CACHE_ENABLED", "1") == "1"
+    PAGE_CACHE_MAX_AGE = int(os.environ.get("PAGE_CACHE_MAX_AGE", "0"))
+    # gzip (or brotli, if installed) for HTML/CSV/JSON/text responses larger
+    # than COMPRESSION_MIN_SIZE bytes; streamed exports are compressed per chunk.
+    COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "1") == "1"
+    COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "500"))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4"))
+    # Browser cache lifetime of fingerprinted static files (asset_url(), ?v=<hash>).
+    ASSET_MAX_AGE = int(os.environ.get("ASSET_MAX_AGE", str(365 * 24 * 3600)))
+    # Rendered /records table bodies per worker, keyed by filters, page cursor
+    # and the prefill stamp (touched by every save); 0 entries disables.
+    # The stamp is a file on this host, so this assumes every app process
+    # shares one host (or one PREFILL_CACHE_STAMP path): saves made through
+    # another host show up here only after RECORDS_FRAGMENT_CACHE_TTL. With
+    # several hosts on one database, set RECORDS_FRAGMENT_CACHE_SIZE=0.
+    RECORDS_FRAGMENT_CACHE_SIZE = int(os.environ.get("RECORDS_FRAGMENT_CACHE_SIZE", "128"))
+    RECORDS_FRAGMENT_CACHE_TTL = float(os.environ.get("RECORDS_FRAGMENT_CACHE_TTL", "60"))
+
+    # /records/stream live feed (server-sent events). One thread per worker
+    # learns of new entries (PostgreSQL LISTEN on LIVE_FEED_CHANNEL, SQLite a
+    # poll every LIVE_FEED_POLL_SECONDS) and fans them out to its watchers.
+    # Under app.asgi (the Procfile's uvicorn) streams run on the event loop and
+    # hold no thread; LIVE_FEED_MAX_ASYNC_WATCHERS caps them per worker. Under
+    # a WSGI server (gunicorn app:app) each open stream holds a thread: keep
+    # LIVE_FEED_MAX_WATCHERS well below --threads so saves and exports always
+    # find a free one.
+    LIVE_FEED_ENABLED = os.environ.get("LIVE_FEED_ENABLED", "1") == "1"
+    LIVE_FEED_CHANNEL = os.environ.get("LIVE_FEED_CHANNEL", "entries_live")
+    LIVE_FEED_POLL_SECONDS = float(os.environ.get("LIVE_FEED_POLL_SECONDS", "1"))
+    LIVE_FEED_HEARTBEAT_SECONDS = float(os.environ.get("LIVE_FEED_HEARTBEAT_SECONDS", "15"))
+    LIVE_FEED_MAX_WATCHERS = int(os.environ.get("LIVE_FEED_MAX_WATCHERS", "4"))
+    LIVE_FEED_MAX_ASYNC_WATCHERS = int(os.environ.get("LIVE_FEED_MAX_ASYNC_WATCHERS", "500"))
+    LIVE_FEED_MAX_SECONDS = float(os.environ.get("LIVE_FEED_MAX_SECONDS", "300"))
+    # Pending events per watcher; a watcher that falls further behind reloads.
+    LIVE_FEED_QUEUE_SIZE = int(os.environ.get("LIVE_FEED_QUEUE_SIZE", "100"))
+    LIVE_FEED_REPLAY_LIMIT = int(os.environ.get("LIVE_FEED_REPLAY_LIMIT", "50"))
+
+    # Request/SQL/template timings served at /metrics (Prometheus text format).
+    # Workers on a host merge their counters through snapshots in METRICS_DIR.
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+    METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(tempfile.gettempdir(), "data-entry-app-metrics"))
+    METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "1"))
+    # Log requests slower than this with their SQL/template breakdown; 0 disables.
+    METRICS_SLOW_REQUEST_MS = float(os.environ.get("METRICS_SLOW_REQUEST_MS", "0"))
+
     # Domain settings
     SHIFT_CHOICES = _csv_to_list(os.environ.get("SHIFT_CHOICES", "A,B,C"))
     MACHINE_CHOICES = _csv_to_list(os.environ.get("MACHINE_CHOICES", "2,3,4,5,6"), int)
@@ -41,8 +127,48 @@ class Config:
             "sample1,sample2,sample3,sample4,sample5,sample6,sample7,sample8,sample9,sample10",
         )
     )
-    RECORDS_LIMIT = int(os.environ.get("RECORDS_LIMIT", "250"))
+    BATCH_ENTRY_ROWS = int(os.environ.get("BATCH_ENTRY_ROWS", "5"))
+    BATCH_ENTRY_MAX_ROWS = int(os.environ.get("BATCH_ENTRY_MAX_ROWS", "50"))
+    SYNC_MAX_ENTRIES = int(os.environ.get("SYNC_MAX_ENTRIES", "200"))
+    RECORDS_PAGE_SIZE = int(os.environ.get("RECORDS_PAGE_SIZE", os.environ.get("RECORDS_LIMIT", "250")))
     EXPORT_FILENAME = os.environ.get("EXPORT_FILENAME", "production-log-export.csv")
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+    EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", str(64 * 1024)))
+    # Finished exports cached on local disk by filters + data version; 0 bytes disables.
+    EXPORT_CACHE_DIR = os.environ.get(
+        "EXPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "data-entry-app-exports")
+    )
+    EXPORT_CACHE_MAX_BYTES = int(os.environ.get("EXPORT_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    # Background exports (/export?async=1): pool threads per web process, output files.
+    EXPORT_JOB_WORKERS = int(os.environ.get("EXPORT_JOB_WORKERS", "1"))
+    EXPORT_JOB_DIR = os.environ.get(
+        "EXPORT_JOB_DIR", os.path.join(tempfile.gettempdir(), "data-entry-app-export-jobs")
+    )
+    EXPORT_JOB_RETENTION_HOURS = float(os.environ.get("EXPORT_JOB_RETENTION_HOURS", "24"))
+    EXPORT_JOB_STALE_SECONDS = float(os.environ.get("EXPORT_JOB_STALE_SECONDS", "300"))
+    # Rows per Parquet row group / Arrow record batch for /export?format=parquet|arrow.
+    EXPORT_ROW_GROUP_SIZE = int(os.environ.get("EXPORT_ROW_GROUP_SIZE", "65536"))
+    SUMMARY_EXPORT_FILENAME = os.environ.get("SUMMARY_EXPORT_FILENAME", "production-log-summary.csv")
+    # Bulk CSV import (/import, flask import-csv): rows per transaction, reported errors cap.
+    IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "5000"))
+    IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", "1000"))
+    MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", str(200 * 1024 * 1024)))
+
+    # Out-of-limit check on save: exponentially weighted mean/variance per
+    # machine/model, flagged beyond LIMITS_WIDTH sigma once warmed up.
+    LIMITS_ALPHA = float(os.environ.get("LIMITS_ALPHA", "0.05"))
+    LIMITS_WIDTH = float(os.environ.get("LIMITS_WIDTH", "3"))
+    LIMITS_MIN_SAMPLES = int(os.environ.get("LIMITS_MIN_SAMPLES", "20"))
+
+    # Statistical process control (/spc); subgroups of 2 to 10 entries
+    SPC_SUBGROUP_SIZE = int(os.environ.get("SPC_SUBGROUP_SIZE", "5"))
+    SPC_EWMA_LAMBDA = float(os.environ.get("SPC_EWMA_LAMBDA", "0.2"))
+    SPC_EWMA_WIDTH = float(os.environ.get("SPC_EWMA_WIDTH", "3"))
+    # Most recent entries per machine/model the charts are computed from (0 = whole history).
+    SPC_HISTORY_LIMIT = int(os.environ.get("SPC_HISTORY_LIMIT", "5000"))
+    SPC_JSON_POINTS = int(os.environ.get("SPC_JSON_POINTS", "200"))
+    # Spec limits per field for Cpk, e.g. {"cycle_time": [30.0, 35.0], "min_cushion": [0.2, null]}
+    SPC_SPEC_LIMITS = json.loads(os.environ.get("SPC_SPEC_LIMITS", "{}"))
 
     PATCH_NOTES = [
         {
@@ -2,9 +2,9 @@ from __future__ import annotations
 
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Generator, Optional
+from typing import Generator, List, Optional
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import Session, declarative_base, scoped_session, sessionmaker
 
 Base = declarative_base()
@@ -24,6 +24,35 @@ def _build_database_url(config) -> str:
     return f"sqlite:///{db_path}"
 
 
+def _sqlite_pragmas(config) -> List[str]:
+    pragmas = {
+        "journal_mode": config.get("SQLITE_JOURNAL_MODE"),
+        "synchronous": config.get("SQLITE_SYNCHRONOUS"),
+        "busy_timeout": config.get("SQLITE_BUSY_TIMEOUT_MS"),
+        "mmap_size": config.get("SQLITE_MMAP_SIZE"),
+    }
+    return [f"PRAGMA {name}={value}" for name, value in pragmas.items() if value not in (None, "")]
+
+
+def _engine_options(database_url: str, config) -> dict:
+    options = {"echo": config.get("SQL_ECHO", False), "future": True}
+    if database_url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+        return options
+
+    options.update(
+        pool_size=config.get("DB_POOL_SIZE", 5),
+        max_overflow=config.get("DB_MAX_OVERFLOW", 5),
+        pool_timeout=config.get("DB_POOL_TIMEOUT", 10),
+        pool_recycle=config.get("DB_POOL_RECYCLE", 1800),
+        pool_pre_ping=config.get("DB_POOL_PRE_PING", True),
+    )
+    statement_timeout = config.get("DB_STATEMENT_TIMEOUT_MS")
+    if statement_timeout and database_url.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={int(statement_timeout)}"}
+    return options
+
+
 def init_app(app):
     """Initialise SQLAlchemy engine and session factory."""
     global engine, SessionLocal
@@ -32,20 +61,104 @@ def init_app(app):
         return engine
 
     database_url = _build_database_url(app.config)
-    engine_kwargs = {"echo": app.config.get("SQL_ECHO", False), "future": True}
-    if database_url.startswith("sqlite:///"):
-        engine_kwargs["connect_args"] = {"check_same_thread": False}
-    engine = create_engine(database_url, **engine_kwargs)
+    engine = create_engine(database_url, **_engine_options(database_url, app.config))
+
+    if database_url.startswith("sqlite"):
+        pragmas = _sqlite_pragmas(app.config)
+
+        @event.listens_for(engine, "connect")
+        def _apply_pragmas(dbapi_connection, _connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
     SessionLocal = scoped_session(
         sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
     )
     return engine
 
 
-def create_all():
+def lift_statement_timeout(connection) -> None:
+    """Drop DB_STATEMENT_TIMEOUT_MS for the rest of this transaction (schema changes and backfills)."""
+    if engine.dialect.name == "postgresql":
+        connection.execute(text("SET LOCAL statement_timeout = 0"))
+
+
+def create_all() -> List[str]:
+    """Create missing tables, columns and indexes; returns a description of each change."""
     if engine is None:
         raise RuntimeError("Database engine is not initialised.")
+    existing_tables = set(inspect(engine).get_table_names())
+    changes = [
+        f"created table {table.name}"
+        for table in Base.metadata.sorted_tables
+        if table.name not in existing_tables
+    ]
     Base.metadata.create_all(bind=engine)
+    if "entries" in existing_tables and "entry_client_ids" not in existing_tables:
+        changes += _backfill_client_ids()
+    changes += _add_missing_columns()
+    changes += _create_missing_indexes()
+    return changes
+
+
+def _backfill_client_ids() -> List[str]:
+    """Register the offline-sync UUIDs saved before entry_client_ids existed."""
+    with engine.begin() as connection:
+        lift_statement_timeout(connection)
+        count = connection.execute(
+            text(
+                "INSERT INTO entry_client_ids (client_id, entry_id)"
+                " SELECT client_id, min(id) FROM entries WHERE client_id IS NOT NULL GROUP BY client_id"
+            )
+        ).rowcount
+    return [f"registered {count} offline-sync client id(s)"]
+
+
+def _add_missing_columns() -> List[str]:
+    """Add nullable columns declared on models since their table was created."""
+    changes = []
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        lift_statement_timeout(connection)
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                changes.append(f"added column {table.name}.{column.name}")
+    return changes
+
+
+# Indexes that a newer one covers (table -> names), dropped by create_all().
+_REPLACED_INDEXES = {
+    "entries": ("ix_entries_machine_no",),  # by ix_entries_machine_work_date_id
+}
+
+
+def _create_missing_indexes() -> List[str]:
+    """create_all() skips existing tables, so add indexes introduced since they were created."""
+    changes = []
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                # An index build on a large table easily outlasts the statement timeout.
+                with engine.begin() as connection:
+                    lift_statement_timeout(connection)
+                    index.create(connection)
+                changes.append(f"created index {index.name}")
+        # Only once its replacement exists, so queries never lose both.
+        for name in _REPLACED_INDEXES.get(table.name, ()):
+            if name in existing:
+                with engine.begin() as connection:
+                    connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+                changes.append(f"dropped index {name}")
+    return changes
 
 
 @contextmanager
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import csv
+import zlib
+from datetime import date, datetime
+from io import StringIO
+from itertools import chain, islice
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+
+from .fields import EXPORT_FIELDS
+from .keyset import newest_first, older_than
+from .models import Entry
+
+# Column order of CSV, Parquet and Arrow exports (and of /import).
+EXPORT_COLUMNS = EXPORT_FIELDS
+
+# csv.writer already renders None as "" and dates as ISO strings; only
+# timestamps need converting to match Entry.as_dict().
+_CONVERTERS = {
+    datetime: datetime.isoformat,
+}
+
+# Rows are grouped before handing them to csv.writer.writerows().
+_WRITE_GROUP = 256
+
+# format= value -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", ".csv"),
+    "csv.gz": ("application/gzip", ".csv.gz"),
+    "csv.zst": ("application/zstd", ".csv.zst"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", ".arrows"),
+}
+
+
+def iter_batches(
+    db_session: Session, statement: Select, batch_size: int, adapt: Optional[Callable[[Select], Select]] = None
+) -> Iterator[list]:
+    """Yield the rows of a newest-first ``statement`` in lists of up to ``batch_size``.
+
+    PostgreSQL streams through a server-side cursor; other backends (SQLite)
+    fetch keyset batches of ``batch_size`` rows on ``(work_date, id)``.
+    ``adapt`` rewrites each executed statement (see partitions.EntryPartitions).
+    """
+    adapt = adapt or (lambda batch_statement: batch_statement)
+    if db_session.get_bind().dialect.name == "postgresql":
+        result = db_session.execute(adapt(statement).execution_options(yield_per=batch_size))
+        yield from result.partitions()
+        return
+
+    batch_statement = statement
+    while True:
+        batch = db_session.execute(adapt(batch_statement.limit(batch_size))).all()
+        if batch:
+            yield batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1]
+        batch_statement = older_than(statement, last.work_date, last.id)
+
+
+def filter_entries(statement, machine_no=None, shift=None, date_from=None, date_to=None, model=Entry):
+    """Apply the RecordsFilterForm filters; empty values are ignored."""
+    if machine_no:
+        statement = statement.filter(model.machine_no == int(machine_no))
+    if shift:
+        statement = statement.filter(model.shift == shift)
+    if date_from:
+        statement = statement.filter(model.work_date >= date_from)
+    if date_to:
+        statement = statement.filter(model.work_date <= date_to)
+    return statement
+
+
+def export_columns(names: Sequence[str] = EXPORT_COLUMNS) -> List:
+    return [Entry.__table__.c[name] for name in names]
+
+
+def export_statement(columns: Sequence) -> Select:
+    return newest_first(select(*columns))
+
+
+def _row_converter(columns: Sequence) -> Optional[Callable[[Sequence], list]]:
+    converters = []
+    for index, column in enumerate(columns):
+        converter = _CONVERTERS.get(column.type.python_type)
+        if converter is not None:
+            converters.append((index, converter))
+    if not converters:
+        return None
+
+    def convert(row: Sequence) -> list:
+        values = list(row)
+        for index, converter in converters:
+            value = values[index]
+            if value is not None:
+                values[index] = converter(value)
+        return values
+
+    return convert
+
+
+def csv_chunks(rows: Iterable[Sequence], columns: Sequence, chunk_size: int) -> Iterator[str]:
+    """Serialise column tuples to CSV text, yielding roughly ``chunk_size`` characters at a time."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in columns])
+
+    convert = _row_converter(columns)
+    rows = iter(rows)
+    while True:
+        group = list(islice(rows, _WRITE_GROUP))
+        if not group:
+            break
+        writer.writerows(group if convert is None else map(convert, group))
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def zstd_chunks(chunks: Iterable[str], level: int = 3) -> Iterator[bytes]:
+    import zstandard
+
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever was written since the last drain()."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def arrow_schema(columns: Sequence):
+    import pyarrow as pa
+
+    types = {
+        int: pa.int64(),
+        float: pa.float64(),
+        str: pa.string(),
+        date: pa.date32(),
+        datetime: pa.timestamp("us"),
+    }
+    return pa.schema([pa.field(column.key, types[column.type.python_type]) for column in columns])
+
+
+def _record_batches(batches: Iterable[Sequence], schema) -> Iterator:
+    import pyarrow as pa
+
+    for batch in batches:
+        values = list(zip(*batch))
+        yield pa.record_batch(
+            [pa.array(column, type=field.type) for column, field in zip(values, schema)],
+            schema=schema,
+        )
+
+
+def _row_groups(record_batches: Iterable, rows_per_group: int) -> Iterator:
+    """Concatenate small record batches into tables of about ``rows_per_group`` rows."""
+    import pyarrow as pa
+
+    pending, pending_rows = [], 0
+    for record_batch in record_batches:
+        pending.append(record_batch)
+        pending_rows += record_batch.num_rows
+        if pending_rows >= rows_per_group:
+            yield pa.Table.from_batches(pending).combine_chunks()
+            pending, pending_rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending).combine_chunks()
+
+
+def parquet_chunks(
+    batches: Iterable[Sequence], columns: Sequence, rows_per_group: int, compression: str = "zstd"
+) -> Iterator[bytes]:
+    """Serialise row batches to Parquet, yielding bytes as each row group is written.
+
+    Each database batch becomes Arrow arrays straight away, so only one row
+    group is held in (compact, columnar) memory at a time.
+    """
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression=compression) as writer:
+        for table in _row_groups(_record_batches(batches, schema), rows_per_group):
+            writer.write_table(table, row_group_size=table.num_rows)
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def arrow_chunks(
+    batches: Iterable[Sequence], columns: Sequence, rows_per_group: int, compression: Optional[str] = "zstd"
+) -> Iterator[bytes]:
+    """Serialise row batches to the Arrow IPC streaming format, one record batch per row group."""
+    import pyarrow as pa
+
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    with pa.ipc.new_stream(sink, schema, options=options) as writer:
+        for table in _row_groups(_record_batches(batches, schema), rows_per_group):
+            writer.write_table(table)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def export_chunks(
+    batches: Iterable[Sequence], columns: Sequence, export_format: str, chunk_size: int, rows_per_group: int
+) -> Iterator:
+    """Serialise row batches in one of EXPORT_FORMATS (str chunks for plain CSV, bytes otherwise)."""
+    if export_format == "parquet":
+        return parquet_chunks(batches, columns, rows_per_group)
+    if export_format == "arrow":
+        return arrow_chunks(batches, columns, rows_per_group)
+    chunks = csv_chunks(chain.from_iterable(batches), columns, chunk_size)
+    if export_format == "csv.gz":
+        return gzip_chunks(chunks)
+    if export_format == "csv.zst":
+        return zstd_chunks(chunks)
+    return chunks
@@ -0,0 +1,189 @@
+"""One description per Entry column, shared by form conversion, prefill, CSV and JSON output.
+
+The registry is built once from ``Entry.__table__`` (type, required) and the
+``EntryForm`` declarations (precision). Conversions are resolved per field at
+import time, so a call only runs the precomputed per-kind loops.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from wtforms import IntegerField
+
+from .forms import EntryForm
+from .models import Entry
+
+# Column groups in table order; every Entry column belongs to exactly one.
+GROUPS = {
+    "record": ("id",),
+    "key": ("work_date", "shift", "machine_no", "model_name"),
+    "environment": ("environment_temp", "environment_humidity", "material_lot"),
+    "measurement": (
+        "inj_time",
+        "metering_time",
+        "vp_position",
+        "vp_pressure",
+        "min_cushion",
+        "peak_pressure",
+        "cycle_time",
+        "shot_count",
+    ),
+    # Molding conditions: carried over from the machine/model's latest entry.
+    "condition": (
+        "mold_temp_fixed",
+        "mold_temp_moving",
+        "nozzle_temp",
+        "cylinder_front_temp",
+        "cylinder_mid1_temp",
+        "cylinder_mid2_temp",
+        "cylinder_rear_temp",
+        "injection_speed_1",
+        "injection_speed_2",
+        "injection_switch_position",
+        "injection_pressure_setting",
+        "injection_time_setting",
+        "hold_pressure_1",
+        "hold_pressure_2",
+        "hold_time_1",
+        "hold_time_2",
+        "hold_pressure_total",
+        "metering_position",
+        "back_pressure",
+        "screw_rotation_speed",
+        "cooling_time",
+        "change_note",
+    ),
+    # Set by the server; not part of exports or the JSON representation.
+    "internal": ("out_of_limit_fields", "client_id"),
+    "timestamp": ("created_at", "updated_at"),
+}
+
+_GROUP_OF = {name: group for group, names in GROUPS.items() for name in names}
+
+
+@dataclass(frozen=True)
+class EntryField:
+    name: str
+    python_type: type
+    group: str
+    required: bool
+    # Entered through EntryForm (everything except ids, server-set values and timestamps).
+    on_form: bool
+    # Decimal places accepted by EntryForm (0 for integer inputs); None for non-numeric fields.
+    precision: Optional[int]
+
+    @property
+    def exported(self) -> bool:
+        return self.group != "internal"
+
+
+def _precision(name: str, column_type: type) -> Optional[int]:
+    unbound = getattr(EntryForm, name, None)
+    if unbound is None or column_type is not float and column_type is not int:
+        return None
+    if issubclass(unbound.field_class, IntegerField):
+        return 0
+    return unbound.kwargs.get("places")
+
+
+def _build() -> Tuple[EntryField, ...]:
+    fields = []
+    for column in Entry.__table__.columns:
+        if column.key not in _GROUP_OF:
+            raise RuntimeError(f"entries.{column.key} is missing from fields.GROUPS")
+        fields.append(
+            EntryField(
+                name=column.key,
+                python_type=column.type.python_type,
+                group=_GROUP_OF[column.key],
+                required=not column.nullable,
+                on_form=hasattr(EntryForm, column.key),
+                precision=_precision(column.key, column.type.python_type),
+            )
+        )
+    return tuple(fields)
+
+
+ENTRY_FIELDS = _build()
+FIELDS = {field.name: field for field in ENTRY_FIELDS}
+
+
+def names(*groups: str) -> List[str]:
+    """Field names of the given groups, in table order."""
+    return [field.name for field in ENTRY_FIELDS if field.group in groups]
+
+
+CONDITION_FIELDS = names("condition")
+EXPORT_FIELDS = [field.name for field in ENTRY_FIELDS if field.exported]
+
+
+def _optional(convert: Callable) -> Callable:
+    return lambda value: None if value is None else convert(value)
+
+
+def _identity(value):
+    return value
+
+
+def _form_names(python_type: type) -> Tuple[str, ...]:
+    return tuple(field.name for field in ENTRY_FIELDS if field.on_form and field.python_type is python_type)
+
+
+# Form fields by conversion, so form_values() runs one tight loop per kind
+# instead of dispatching on each column's type.
+_FORM_DATES = _form_names(date)
+_FORM_TEXT = _form_names(str)
+_FORM_INTS = _form_names(int)
+_FORM_FLOATS = _form_names(float)
+
+
+def form_values(form) -> Dict[str, object]:
+    """Column values from a validated EntryForm (Decimal -> float, blank text -> None)."""
+    form_fields = form._fields
+    values = {name: form_fields[name].data for name in _FORM_DATES}
+    for name in _FORM_TEXT:
+        values[name] = form_fields[name].data or None
+    for name in _FORM_INTS:
+        data = form_fields[name].data
+        values[name] = None if data is None else int(data)
+    for name in _FORM_FLOATS:
+        data = form_fields[name].data
+        values[name] = None if data is None else float(data)
+    return values
+
+
+# Stored as Float but entered as whole numbers; prefill shows them without a trailing ".0".
+_CONDITION_CONVERTERS: List[Tuple[str, Callable]] = [
+    (name, _optional(int) if FIELDS[name].precision == 0 and FIELDS[name].python_type is float else _identity)
+    for name in CONDITION_FIELDS
+]
+
+
+def condition_values(source) -> Dict[str, object]:
+    """Molding conditions of an entry, row or namespace, as shown in the prefilled form."""
+    return {name: convert(getattr(source, name, None)) for name, convert in _CONDITION_CONVERTERS}
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else ""
+
+
+def _json_converter(field: EntryField) -> Callable:
+    if field.python_type in (date, datetime):
+        return _isoformat
+    if field.required:
+        return _identity
+    if field.python_type is str:
+        return lambda value: value or ""
+    return lambda value: value if value is not None else ""
+
+
+_JSON_CONVERTERS: List[Tuple[str, Callable]] = [(name, _json_converter(FIELDS[name])) for name in EXPORT_FIELDS]
+
+
+def json_values(source) -> Dict[str, object]:
+    """Exported fields with blanks as "" and dates as ISO strings (the CSV/JSON representation)."""
+    return {name: convert(getattr(source, name)) for name, convert in _JSON_CONVERTERS}
@@ -1,7 +1,9 @@
+import math
 from datetime import date
 from typing import Iterable, Sequence
 
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField, FileRequired
 from wtforms import (
     DateField,
     DecimalField,
@@ -16,6 +18,16 @@ from wtforms import validators
 REQUIRED_MESSAGE = "この項目は必須です。"
 
 
+class FiniteDecimalField(DecimalField):
+    """DecimalField that rejects NaN, Infinity and values too large for a float column."""
+
+    def process_formdata(self, valuelist):
+        super().process_formdata(valuelist)
+        if self.data is not None and not math.isfinite(float(self.data)):
+            self.data = None
+            raise ValueError(self.gettext("Not a valid decimal value."))
+
+
 def _build_choice_tuples(values: Sequence, include_blank=False):
     choices = []
     if include_blank:
@@ -35,7 +47,7 @@ class EntryForm(FlaskForm):
     shift = SelectField("勤務帯", validators=[validators.DataRequired(message=REQUIRED_MESSAGE)])
     machine_no = SelectField("号機", validators=[validators.DataRequired(message=REQUIRED_MESSAGE)])
     model_name = SelectField("機種名", validators=[validators.DataRequired(message=REQUIRED_MESSAGE)])
-    environment_temp = DecimalField(
+    environment_temp = FiniteDecimalField(
         "環境温度 (℃)",
         places=1,
         rounding=None,
@@ -45,7 +57,7 @@ class EntryForm(FlaskForm):
         ],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    environment_humidity = DecimalField(
+    environment_humidity = FiniteDecimalField(
         "環境湿度 (%)",
         places=1,
         rounding=None,
@@ -60,7 +72,7 @@ class EntryForm(FlaskForm):
         validators=[validators.DataRequired(message=REQUIRED_MESSAGE), validators.Length(max=120)],
         render_kw={"placeholder": "例: LOT-20251115-A"},
     )
-    inj_time = DecimalField(
+    inj_time = FiniteDecimalField(
         "射出時間 (s)",
         places=3,
         rounding=None,
@@ -70,7 +82,7 @@ class EntryForm(FlaskForm):
         ],
         render_kw={"step": "0.001", "placeholder": "0.350", "inputmode": "decimal"},
     )
-    metering_time = DecimalField(
+    metering_time = FiniteDecimalField(
         "計量時間 (s)",
         places=2,
         rounding=None,
@@ -80,7 +92,7 @@ class EntryForm(FlaskForm):
         ],
         render_kw={"step": "0.01", "placeholder": "1.25", "inputmode": "decimal"},
     )
-    vp_position = DecimalField(
+    vp_position = FiniteDecimalField(
         "V-P位置 (mm)",
         places=3,
         rounding=None,
@@ -90,7 +102,7 @@ class EntryForm(FlaskForm):
         ],
         render_kw={"step": "0.001", "placeholder": "12.345", "inputmode": "decimal"},
     )
-    vp_pressure = DecimalField(
+    vp_pressure = FiniteDecimalField(
         "V-P圧力 (MPa)",
         places=1,
         rounding=None,
@@ -100,7 +112,7 @@ class EntryForm(FlaskForm):
         ],
         render_kw={"step": "0.1", "placeholder": "85.4", "inputmode": "decimal"},
     )
-    min_cushion = DecimalField(
+    min_cushion = FiniteDecimalField(
         "最小クッション (mm)",
         places=2,
         rounding=None,
@@ -110,7 +122,7 @@ class EntryForm(FlaskForm):
         ],
         render_kw={"step": "0.01", "placeholder": "0.30", "inputmode": "decimal"},
     )
-    peak_pressure = DecimalField(
+    peak_pressure = FiniteDecimalField(
         "ピーク圧 (MPa)",
         places=1,
         rounding=None,
@@ -120,7 +132,7 @@ class EntryForm(FlaskForm):
         ],
         render_kw={"step": "0.1", "placeholder": "120.5", "inputmode": "decimal"},
     )
-    cycle_time = DecimalField(
+    cycle_time = FiniteDecimalField(
         "サイクル時間 (s)",
         places=2,
         rounding=None,
@@ -138,49 +150,49 @@ class EntryForm(FlaskForm):
         ],
         render_kw={"step": "1", "placeholder": "50", "inputmode": "numeric"},
     )
-    mold_temp_fixed = DecimalField(
+    mold_temp_fixed = FiniteDecimalField(
         "金型温度（固定側）(℃)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    mold_temp_moving = DecimalField(
+    mold_temp_moving = FiniteDecimalField(
         "金型温度（稼働側）(℃)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    nozzle_temp = DecimalField(
+    nozzle_temp = FiniteDecimalField(
         "ノズル設定温度 (℃)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    cylinder_front_temp = DecimalField(
+    cylinder_front_temp = FiniteDecimalField(
         "シリンダ前部温度 (℃)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    cylinder_mid1_temp = DecimalField(
+    cylinder_mid1_temp = FiniteDecimalField(
         "シリンダ中部１温度 (℃)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    cylinder_mid2_temp = DecimalField(
+    cylinder_mid2_temp = FiniteDecimalField(
         "シリンダ中部２温度 (℃)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    cylinder_rear_temp = DecimalField(
+    cylinder_rear_temp = FiniteDecimalField(
         "シリンダ後部温度 (℃)",
         places=1,
         rounding=None,
@@ -188,35 +200,35 @@ class EntryForm(FlaskForm):
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
 
-    injection_speed_1 = DecimalField(
+    injection_speed_1 = FiniteDecimalField(
         "射出速度１ (mm/s)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    injection_speed_2 = DecimalField(
+    injection_speed_2 = FiniteDecimalField(
         "射出速度２ (mm/s)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    injection_switch_position = DecimalField(
+    injection_switch_position = FiniteDecimalField(
         "射出切替位置 (mm)",
         places=2,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.01", "inputmode": "decimal"},
     )
-    injection_pressure_setting = DecimalField(
+    injection_pressure_setting = FiniteDecimalField(
         "射出圧力 (MPa)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    injection_time_setting = DecimalField(
+    injection_time_setting = FiniteDecimalField(
         "射出時間 (s)",
         places=2,
         rounding=None,
@@ -224,35 +236,35 @@ class EntryForm(FlaskForm):
         render_kw={"step": "0.01", "inputmode": "decimal"},
     )
 
-    hold_pressure_1 = DecimalField(
+    hold_pressure_1 = FiniteDecimalField(
         "保圧１ (MPa)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    hold_pressure_2 = DecimalField(
+    hold_pressure_2 = FiniteDecimalField(
         "保圧２ (MPa)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    hold_time_1 = DecimalField(
+    hold_time_1 = FiniteDecimalField(
         "保圧１時間 (s)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    hold_time_2 = DecimalField(
+    hold_time_2 = FiniteDecimalField(
         "保圧２時間 (s)",
         places=1,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
-    hold_pressure_total = DecimalField(
+    hold_pressure_total = FiniteDecimalField(
         "保圧圧力 (MPa)",
         places=1,
         rounding=None,
@@ -260,14 +272,14 @@ class EntryForm(FlaskForm):
         render_kw={"step": "0.1", "inputmode": "decimal"},
     )
 
-    metering_position = DecimalField(
+    metering_position = FiniteDecimalField(
         "計量位置 (mm)",
         places=2,
         rounding=None,
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "0.01", "inputmode": "decimal"},
     )
-    back_pressure = DecimalField(
+    back_pressure = FiniteDecimalField(
         "背圧 (MPa)",
         places=1,
         rounding=None,
@@ -279,7 +291,7 @@ class EntryForm(FlaskForm):
         validators=[validators.Optional(), validators.NumberRange(min=0)],
         render_kw={"step": "1", "inputmode": "numeric"},
     )
-    cooling_time = DecimalField(
+    cooling_time = FiniteDecimalField(
         "冷却時間 (s)",
         places=1,
         rounding=None,
@@ -302,6 +314,19 @@ class EntryForm(FlaskForm):
         self.shift.choices = _build_choice_tuples(shift_choices)
 
 
+class BatchEntryForm(FlaskForm):
+    # Shared by every row of /batch; each row is validated by its own EntryForm.
+    work_date = EntryForm.work_date
+    shift = EntryForm.shift
+    environment_temp = EntryForm.environment_temp
+    environment_humidity = EntryForm.environment_humidity
+    submit = SubmitField("まとめて保存")
+
+    def __init__(self, *, shift_choices: Iterable, **kwargs):
+        super().__init__(**kwargs)
+        self.shift.choices = _build_choice_tuples(shift_choices)
+
+
 class RecordsFilterForm(FlaskForm):
     machine_no = SelectField("号機", validators=[validators.Optional()])
     shift = SelectField("勤務帯", validators=[validators.Optional()])
@@ -324,6 +349,17 @@ class RecordsFilterForm(FlaskForm):
         self.shift.choices = _build_choice_tuples(shift_choices, include_blank=True)
 
 
+class ImportForm(FlaskForm):
+    csv_file = FileField(
+        "CSVファイル",
+        validators=[
+            FileRequired(message=REQUIRED_MESSAGE),
+            FileAllowed(["csv"], message="CSVファイルを選択してください。"),
+        ],
+    )
+    submit = SubmitField("取り込む")
+
+
 class FeedbackForm(FlaskForm):
     category = SelectField("カテゴリ", validators=[validators.DataRequired(message=REQUIRED_MESSAGE)])
     details = TextAreaField(
@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import csv
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from io import StringIO
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, TextIO, Tuple
+
+from sqlalchemy import insert
+from wtforms import DateField, DecimalField, IntegerField, SelectField, validators
+
+from . import database, summary
+from .cache import prefill_cache
+from .export import EXPORT_COLUMNS
+from .forms import REQUIRED_MESSAGE, EntryForm
+from .live import entry_feed
+from .models import Entry
+from .partitions import partitions
+
+# Same layout as the CSV export; id and timestamps are assigned by the database.
+IMPORT_COLUMNS = [name for name in EXPORT_COLUMNS if name not in ("id", "created_at", "updated_at")]
+
+
+@dataclass
+class ImportIssue:
+    line: int
+    column: str
+    message: str
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    rejected: int = 0
+    errors: List[ImportIssue] = field(default_factory=list)
+    truncated: bool = False
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return (self.inserted + self.rejected) / self.elapsed if self.elapsed else 0.0
+
+
+def _to_float(raw: str) -> float:
+    # float() accepts "nan" and "inf", which EntryForm rejects.
+    value = float(raw)
+    if not math.isfinite(value):
+        raise ValueError(raw)
+    return value
+
+
+def _to_int(raw: str) -> int:
+    try:
+        return int(raw)
+    except ValueError:
+        value = float(raw)
+        if not value.is_integer():
+            raise
+        return int(value)
+
+
+@dataclass
+class _ColumnRule:
+    name: str
+    parse: Callable[[str], object]
+    required: bool
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    max_length: Optional[int] = None
+    choices: Optional[set] = None
+
+
+def _column_rules(machine_choices, model_choices, shift_choices) -> List[_ColumnRule]:
+    """Translate EntryForm's declared fields and validators into per-column rules."""
+    choices = {
+        "machine_no": {int(choice) for choice in machine_choices},
+        "model_name": {str(choice) for choice in model_choices},
+        "shift": {str(choice) for choice in shift_choices},
+    }
+    rules = []
+    for name in IMPORT_COLUMNS:
+        unbound = getattr(EntryForm, name)
+        field_class = unbound.field_class
+        if issubclass(field_class, DateField):
+            parse = date.fromisoformat
+        elif issubclass(field_class, DecimalField):
+            parse = _to_float
+        elif issubclass(field_class, IntegerField) or name == "machine_no":
+            parse = _to_int
+        else:
+            parse = str
+        rule = _ColumnRule(name=name, parse=parse, required=False, choices=choices.get(name))
+        for validator in unbound.kwargs.get("validators", []):
+            if isinstance(validator, (validators.InputRequired, validators.DataRequired)):
+                rule.required = True
+            elif isinstance(validator, validators.NumberRange):
+                rule.minimum, rule.maximum = validator.min, validator.max
+            elif isinstance(validator, validators.Length):
+                rule.max_length = validator.max if validator.max != -1 else None
+        if issubclass(field_class, SelectField):
+            rule.required = True
+        rules.append(rule)
+    return rules
+
+
+def _check_column(rule: _ColumnRule, raw_values: Sequence[str]) -> Tuple[list, Dict[int, str]]:
+    """Parse one column of a batch; returns the values and {row index: error message}."""
+    errors: Dict[int, str] = {}
+    parse = rule.parse
+    try:
+        values = [parse(raw) if raw else None for raw in raw_values]
+    except ValueError:
+        values = []
+        for index, raw in enumerate(raw_values):
+            try:
+                values.append(parse(raw) if raw else None)
+            except ValueError:
+                values.append(None)
+                errors[index] = f"値を解釈できません: {raw!r}"
+
+    present = [value for value in values if value is not None]
+    if rule.required and len(present) + len(errors) < len(values):
+        for index, value in enumerate(values):
+            if value is None and index not in errors:
+                errors[index] = REQUIRED_MESSAGE
+    if not present:
+        return values, errors
+    # Scan row by row only when the batch's extremes show a violation.
+    if rule.minimum is not None and min(present) < rule.minimum:
+        for index, value in enumerate(values):
+            if value is not None and value < rule.minimum:
+                errors.setdefault(index, f"{rule.minimum} 以上を入力してください。")
+    if rule.maximum is not None and max(present) > rule.maximum:
+        for index, value in enumerate(values):
+            if value is not None and value > rule.maximum:
+                errors.setdefault(index, f"{rule.maximum} 以下を入力してください。")
+    if rule.max_length is not None and max(map(len, present)) > rule.max_length:
+        for index, value in enumerate(values):
+            if value is not None and len(value) > rule.max_length:
+                errors.setdefault(index, f"{rule.max_length} 文字以内で入力してください。")
+    if rule.choices is not None and not rule.choices.issuperset(present):
+        for index, value in enumerate(values):
+            if value is not None and value not in rule.choices:
+                errors.setdefault(index, f"選択肢にない値です: {value}")
+    return values, errors
+
+
+def _valid_rows(columns: List[Sequence], bad_rows: Mapping[int, object]) -> List[tuple]:
+    if not bad_rows:
+        return list(zip(*columns))
+    return [row for index, row in enumerate(zip(*columns)) if index not in bad_rows]
+
+
+def _copy_text(rule: _ColumnRule, raw_values: Sequence[str], values: list) -> Sequence[str]:
+    """COPY input for one column: the uploaded text, except integers ("55.0" is not an integer to PostgreSQL)."""
+    if rule.parse is _to_int:
+        return ["" if value is None else str(value) for value in values]
+    return raw_values
+
+
+def _copy_rows(db_session, rows: Iterable[Sequence[str]]):
+    buffer = StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor = db_session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {Entry.__tablename__} ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def _insert_batch(rows: List[tuple], copy_rows: Optional[List[tuple]]):
+    records = [dict(zip(IMPORT_COLUMNS, row)) for row in rows]
+    partitions.ensure_months(record["work_date"] for record in records)
+    with database.session_scope() as db_session:
+        if copy_rows is not None:
+            _copy_rows(db_session, copy_rows)
+        else:
+            db_session.execute(insert(Entry.__table__), records)
+        summary.record_entries(db_session, records)
+
+
+def _numbered(reader) -> Iterator[Tuple[int, List[str]]]:
+    """(first physical line, record) pairs; quoted cells may span several lines."""
+    line = reader.line_num + 1
+    for raw in reader:
+        yield line, raw
+        line = reader.line_num + 1
+
+
+def import_csv(
+    stream: TextIO,
+    *,
+    machine_choices: Iterable,
+    model_choices: Iterable,
+    shift_choices: Iterable,
+    batch_size: int = 5000,
+    max_errors: int = 1000,
+) -> ImportResult:
+    """Validate and insert entries from a CSV in the /export layout.
+
+    Rows are validated a column at a time per batch; each batch of valid rows
+    is inserted in its own transaction (COPY on PostgreSQL, executemany
+    elsewhere). Invalid rows are skipped and reported. Control limits are not
+    updated: historical rows would otherwise drift them away from current
+    production.
+    """
+    started = time.perf_counter()
+    result = ImportResult()
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        result.errors.append(ImportIssue(1, "", "CSV が空です。"))
+        return result
+
+    rules = _column_rules(machine_choices, model_choices, shift_choices)
+    positions = {name.strip(): index for index, name in enumerate(header)}
+    # Optional columns may be absent (older sheets predate some condition fields).
+    missing = [rule.name for rule in rules if rule.required and rule.name not in positions]
+    if missing:
+        result.errors.append(ImportIssue(1, ", ".join(missing), "必要な列がありません。"))
+        return result
+
+    use_copy = database.engine.dialect.name == "postgresql"
+    width = len(header)
+    # Absent columns read from a trailing blank cell.
+    indexes = [positions.get(name, width) for name in IMPORT_COLUMNS]
+    width += 1
+    records = _numbered(reader)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        lines = [line for line, _ in batch]
+        raw_rows = [raw for _, raw in batch]
+
+        bad_rows: Dict[int, List[Tuple[str, str]]] = {}
+        for index, raw in enumerate(raw_rows):
+            if len(raw) < width:
+                raw_rows[index] = raw + [""] * (width - len(raw))
+        raw_columns = list(zip(*raw_rows))
+        columns = []
+        copy_columns = []
+        for rule, position in zip(rules, indexes):
+            values, errors = _check_column(rule, raw_columns[position])
+            columns.append(values)
+            if use_copy:
+                copy_columns.append(_copy_text(rule, raw_columns[position], values))
+            for index, message in errors.items():
+                bad_rows.setdefault(index, []).append((rule.name, message))
+
+        rows = _valid_rows(columns, bad_rows)
+        copy_rows = _valid_rows(copy_columns, bad_rows) if use_copy else None
+        if rows:
+            _insert_batch(rows, copy_rows)
+        result.inserted += len(rows)
+        result.rejected += len(bad_rows)
+        for index in sorted(bad_rows):
+            for column, message in bad_rows[index]:
+                if len(result.errors) < max_errors:
+                    result.errors.append(ImportIssue(lines[index], column, message))
+                else:
+                    result.truncated = True
+
+    if result.inserted:
+        prefill_cache.invalidate_all()
+        entry_feed.reset()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def import_with_config(stream: TextIO, config: Mapping) -> ImportResult:
+    return import_csv(
+        stream,
+        machine_choices=config.get("MACHINE_CHOICES") or [2, 3, 4, 5, 6],
+        model_choices=config.get("MODEL_CHOICES") or [f"sample{i}" for i in range(1, 11)],
+        shift_choices=config.get("SHIFT_CHOICES") or ["A", "B", "C"],
+        batch_size=config.get("IMPORT_BATCH_SIZE", 5000),
+        max_errors=config.get("IMPORT_MAX_ERRORS", 1000),
+    )
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Iterator, Mapping, Optional
+
+from sqlalchemy import delete, func, select, update
+
+from . import database
+from .export import EXPORT_FORMATS, export_chunks, export_columns, export_statement, filter_entries
+from .metrics import metrics
+from .models import Entry, ExportJob
+from .partitions import partitions
+
+# Progress is written back at most this often (seconds).
+_PROGRESS_INTERVAL = 1.0
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive UTC timestamps.
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class ExportJobs:
+    """Runs /export?async=1 jobs on a small thread pool inside each web process.
+
+    Job state lives in the export_jobs table so any worker can report
+    progress or serve the finished file from the shared EXPORT_JOB_DIR.
+    A job whose updated_at stops moving for EXPORT_JOB_STALE_SECONDS is
+    reported as failed: running jobs refresh it with their progress, and
+    every progress write also refreshes the jobs still queued behind them.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        # Jobs submitted to this process's pool that have not started yet.
+        self._queued: set = set()
+        self.app = None
+        self.directory: Optional[str] = None
+        self.retention = timedelta(hours=24)
+        self.stale_after = timedelta(minutes=5)
+        self._workers = 1
+
+    def init_app(self, app):
+        self.app = app
+        self.directory = app.config.get("EXPORT_JOB_DIR")
+        self.retention = timedelta(hours=float(app.config.get("EXPORT_JOB_RETENTION_HOURS", 24)))
+        self.stale_after = timedelta(seconds=float(app.config.get("EXPORT_JOB_STALE_SECONDS", 300)))
+        self._workers = int(app.config.get("EXPORT_JOB_WORKERS", 1))
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Created on first use so gunicorn's pre-fork master never owns the threads.
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="export-job")
+        return self._executor
+
+    def submit(self, export_format: str, filters: Mapping) -> str:
+        self.purge_expired()
+        job_id = uuid.uuid4().hex
+        with database.session_scope() as db_session:
+            db_session.add(
+                ExportJob(
+                    id=job_id,
+                    status="queued",
+                    export_format=export_format,
+                    filters=json.dumps(filters, default=date.isoformat, sort_keys=True),
+                )
+            )
+        with self._lock:
+            self._queued.add(job_id)
+        self._pool().submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with database.session_scope() as db_session:
+            job = db_session.get(ExportJob, job_id)
+            if job is None:
+                return None
+            status = job.status
+            stale = _utc(job.updated_at) < datetime.now(timezone.utc) - self.stale_after
+            if status in ("queued", "running") and stale:
+                # The process running (or holding) it went away (restart, deploy) without finishing.
+                status = "failed"
+            return {
+                "id": job.id,
+                "status": status,
+                "format": job.export_format,
+                "filters": json.loads(job.filters),
+                "rows_total": job.rows_total,
+                "rows_done": job.rows_done,
+                "error": job.error or ("中断されました。" if status != job.status else None),
+                "file_path": job.file_path if status == "done" else None,
+                "created_at": job.created_at,
+                "finished_at": job.finished_at,
+            }
+
+    def purge_expired(self):
+        """Delete jobs (and their files) older than the retention period."""
+        cutoff = datetime.now(timezone.utc) - self.retention
+        with database.session_scope() as db_session:
+            expired = db_session.execute(
+                select(ExportJob.id, ExportJob.file_path).where(ExportJob.created_at < cutoff)
+            ).all()
+            for _, file_path in expired:
+                if file_path:
+                    # Plus the gzip copy compression.send_file() may have made for the download.
+                    for path in (file_path, file_path + ".gz"):
+                        try:
+                            os.unlink(path)
+                        except OSError:
+                            pass
+            if expired:
+                db_session.execute(delete(ExportJob).where(ExportJob.id.in_([job_id for job_id, _ in expired])))
+
+    def _update(self, job_id: str, **values):
+        # Own connection: session_scope() would hand back the thread's session
+        # that is still streaming the export, commit it and close its cursor.
+        with self._lock:
+            waiting = list(self._queued - {job_id})
+        with database.engine.begin() as connection:
+            connection.execute(update(ExportJob).where(ExportJob.id == job_id).values(**values))
+            if waiting:
+                # Keeps the jobs queued behind this one from looking abandoned.
+                connection.execute(
+                    update(ExportJob)
+                    .where(ExportJob.id.in_(waiting), ExportJob.status == "queued")
+                    .values(updated_at=func.now())
+                )
+
+    def _counted(self, job_id: str, batches: Iterable[list]) -> Iterator[list]:
+        done = 0
+        reported = time.monotonic()
+        for batch in batches:
+            done += len(batch)
+            yield batch
+            if time.monotonic() - reported >= _PROGRESS_INTERVAL:
+                self._update(job_id, rows_done=done)
+                reported = time.monotonic()
+        self._update(job_id, rows_done=done)
+
+    def _run(self, job_id: str):
+        with self._lock:
+            self._queued.discard(job_id)
+        with self.app.app_context():
+            try:
+                self._export(job_id)
+            except Exception as exc:  # noqa: BLE001 - recorded on the job for the status page
+                self.app.logger.exception("export job %s failed", job_id)
+                self._update(job_id, status="failed", error=str(exc)[:1000], finished_at=func.now())
+
+    def _export(self, job_id: str):
+        cfg = self.app.config
+        with database.session_scope() as db_session:
+            job = db_session.get(ExportJob, job_id)
+            export_format, filters = job.export_format, json.loads(job.filters)
+        for name in ("date_from", "date_to"):
+            if filters.get(name):
+                filters[name] = date.fromisoformat(filters[name])
+
+        columns = export_columns()
+        statement = filter_entries(export_statement(columns), **filters)
+        count_statement = filter_entries(select(func.count(Entry.id)), **filters)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, job_id + EXPORT_FORMATS[export_format][1])
+        partial = path + ".part"
+
+        date_range = (filters.get("date_from"), filters.get("date_to"))
+        with database.session_scope() as db_session:
+            rows_total = sum(count for count, in partitions.each(db_session, count_statement, *date_range))
+            self._update(job_id, status="running", rows_total=rows_total)
+            batches = partitions.iter_batches(db_session, statement, cfg.get("EXPORT_BATCH_SIZE", 1000), *date_range)
+            batches = self._counted(job_id, metrics.export_batches(batches, export_format, "job"))
+            chunks = export_chunks(
+                batches,
+                columns,
+                export_format,
+                cfg.get("EXPORT_CHUNK_SIZE", 64 * 1024),
+                cfg.get("EXPORT_ROW_GROUP_SIZE", 65536),
+            )
+            try:
+                with open(partial, "wb") as handle:
+                    for chunk in chunks:
+                        handle.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+                os.replace(partial, path)
+            finally:
+                if os.path.exists(partial):
+                    os.unlink(partial)
+        self._update(job_id, status="done", file_path=path, finished_at=func.now())
+
+
+export_jobs = ExportJobs()
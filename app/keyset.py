@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+from .models import Entry
+
+# Entries are paged and exported newest first on (work_date, id); the
+# helpers accept either ORM Query objects or Core Select statements.
+
+
+def newest_first(statement):
+    return statement.order_by(Entry.work_date.desc(), Entry.id.desc())
+
+
+def oldest_first(statement):
+    return statement.order_by(Entry.work_date.asc(), Entry.id.asc())
+
+
+def older_than(statement, work_date, entry_id: int):
+    """Restrict a statement to rows that sort after ``(work_date, entry_id)`` newest first."""
+    return statement.filter(
+        # The redundant bound lets the (…, work_date, id) indexes seek past the cursor;
+        # the OR alone only narrows rows after they are read.
+        Entry.work_date <= work_date,
+        or_(
+            Entry.work_date < work_date,
+            and_(Entry.work_date == work_date, Entry.id < entry_id),
+        ),
+    )
+
+
+def newer_than(statement, work_date, entry_id: int):
+    """Restrict a statement to rows that sort before ``(work_date, entry_id)`` newest first."""
+    return statement.filter(
+        Entry.work_date >= work_date,
+        or_(
+            Entry.work_date > work_date,
+            and_(Entry.work_date == work_date, Entry.id > entry_id),
+        ),
+    )
+
+
+def encode_cursor(row) -> str:
+    return f"{row.work_date.isoformat()}.{row.id}"
+
+
+def decode_cursor(raw: Optional[str]) -> Optional[Tuple[date, int]]:
+    if not raw:
+        return None
+    work_date, _, entry_id = raw.partition(".")
+    try:
+        return date.fromisoformat(work_date), int(entry_id)
+    except ValueError:
+        return None
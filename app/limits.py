@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+from sqlalchemy import false, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .models import ControlLimit
+from .spc import SPC_FIELDS
+
+
+def _take_write_lock(db_session: Session):
+    """SQLite ignores FOR UPDATE; a no-op write makes this transaction the only writer before the read."""
+    if db_session.get_bind().dialect.name == "sqlite":
+        db_session.execute(update(ControlLimit).where(false()).values(sample_count=ControlLimit.sample_count))
+
+
+def _load_limits(db_session: Session, machine_no: int, model_name: str) -> Dict[str, ControlLimit]:
+    statement = (
+        select(ControlLimit)
+        .where(ControlLimit.machine_no == machine_no, ControlLimit.model_name == model_name)
+        .with_for_update()
+    )
+    limits = {row.field_name: row for row in db_session.scalars(statement)}
+    if len(limits) == len(SPC_FIELDS):
+        return limits
+
+    # First save for this pair: create the rows without racing a concurrent save.
+    dialect = db_session.get_bind().dialect.name
+    insert_factory = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    db_session.execute(
+        insert_factory(ControlLimit)
+        .values(
+            [
+                {"machine_no": machine_no, "model_name": model_name, "field_name": field, "sample_count": 0}
+                for field in SPC_FIELDS
+            ]
+        )
+        .on_conflict_do_nothing()
+    )
+    return {row.field_name: row for row in db_session.scalars(statement)}
+
+
+def _update(limit: ControlLimit, value: float, alpha: float):
+    count = limit.sample_count + 1
+    # Plain running average until 1/count drops below alpha, exponential weighting after that.
+    weight = max(alpha, 1.0 / count)
+    diff = value - limit.mean
+    increment = weight * diff
+    limit.mean = limit.mean + increment
+    limit.variance = (1.0 - weight) * (limit.variance + diff * increment)
+    limit.sample_count = count
+
+
+def check_entries(
+    db_session: Session,
+    rows: Iterable[Mapping],
+    alpha: float = 0.05,
+    width: float = 3.0,
+    min_samples: int = 20,
+) -> List[List[str]]:
+    """Flag monitored values outside mean ± width·σ, then fold each row into its limits.
+
+    Rows are processed in order; the result holds the flagged field names per row.
+    """
+    rows = list(rows)
+    # Otherwise two saves for one pair both read the old mean/variance and one update is lost.
+    _take_write_lock(db_session)
+    # Locked in key order, so concurrent batches over the same pairs cannot deadlock (PostgreSQL).
+    keys = sorted({(row["machine_no"], row["model_name"]) for row in rows})
+    cache: Dict[Tuple[int, str], Dict[str, ControlLimit]] = {key: _load_limits(db_session, *key) for key in keys}
+    flagged_rows = []
+    for row in rows:
+        limits = cache[(row["machine_no"], row["model_name"])]
+
+        flagged = []
+        for field in SPC_FIELDS:
+            value = row[field]
+            limit = limits[field]
+            if value is None:
+                continue
+            if (
+                limit.sample_count >= min_samples
+                and limit.variance > 0
+                and abs(value - limit.mean) > width * math.sqrt(limit.variance)
+            ):
+                flagged.append(field)
+            _update(limit, float(value), alpha)
+        flagged_rows.append(flagged)
+    return flagged_rows
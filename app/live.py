@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import queue
+import re
+import select as select_module
+import threading
+import time
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Optional, Set
+
+from flask import render_template
+from sqlalchemy import func, select
+
+from . import database
+from .export import export_columns
+from .models import Entry
+
+# Placed on a watcher's queue when it fell behind or the feed lost track; the page reloads.
+RESET = object()
+
+# pg_notify() payloads must stay below 8000 bytes.
+_NOTIFY_IDS = 500
+_CHANNEL_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+class _Watcher:
+    __slots__ = ("filters", "events", "wake")
+
+    def __init__(self, filters: dict, size: int, wake: Optional[Callable[[], None]] = None):
+        self.filters = filters
+        self.events: queue.Queue = queue.Queue(maxsize=size)
+        # Set for event-loop watchers (app.asgi): called after every put.
+        self.wake = wake
+
+    def put(self, event):
+        self.events.put_nowait(event)
+        if self.wake is not None:
+            self.wake()
+
+    def wants(self, row) -> bool:
+        filters = self.filters
+        if filters.get("machine_no") and str(row.machine_no) != str(filters["machine_no"]):
+            return False
+        if filters.get("shift") and row.shift != filters["shift"]:
+            return False
+        if filters.get("date_from") and row.work_date < filters["date_from"]:
+            return False
+        if filters.get("date_to") and row.work_date > filters["date_to"]:
+            return False
+        return True
+
+
+class EntryFeed:
+    """Fan-out of newly saved entries to /records/stream watchers (server-sent events).
+
+    One background thread per worker learns about new entries and renders
+    each row once; watchers only wait on their own queue, so the database
+    sees one query per batch of saves rather than one per watcher.
+    Under app.asgi (uvicorn) streams are served by watch_async() on the
+    event loop and cost no thread, up to LIVE_FEED_MAX_ASYNC_WATCHERS per
+    worker. Under a WSGI server every stream from watch() holds a worker
+    thread, so a worker takes at most LIVE_FEED_MAX_WATCHERS of them and
+    closes each after LIVE_FEED_MAX_SECONDS.
+    PostgreSQL: saves pg_notify() the new ids on LIVE_FEED_CHANNEL and
+    every worker LISTENs. SQLite: the thread looks for ids above the last
+    one it saw every LIVE_FEED_POLL_SECONDS (and right after a local save).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watchers: Set[_Watcher] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        # SQLite: highest id handed to watchers; None while nobody watches.
+        self._last_id: Optional[int] = None
+        self.app = None
+        self.enabled = False
+        self.channel = "entries_live"
+        self.poll_seconds = 1.0
+        self.heartbeat_seconds = 15.0
+        self.max_seconds = 300.0
+        self.max_watchers = 4
+        self.max_async_watchers = 500
+        self.queue_size = 100
+        self.replay_limit = 100
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = bool(app.config.get("LIVE_FEED_ENABLED", True))
+        self.channel = app.config.get("LIVE_FEED_CHANNEL", "entries_live")
+        if not _CHANNEL_NAME.match(self.channel):
+            raise RuntimeError(f"LIVE_FEED_CHANNEL must be a plain lower-case identifier: {self.channel!r}")
+        self.poll_seconds = float(app.config.get("LIVE_FEED_POLL_SECONDS", 1.0))
+        self.heartbeat_seconds = float(app.config.get("LIVE_FEED_HEARTBEAT_SECONDS", 15.0))
+        self.max_seconds = float(app.config.get("LIVE_FEED_MAX_SECONDS", 300))
+        self.max_watchers = int(app.config.get("LIVE_FEED_MAX_WATCHERS", 4))
+        self.max_async_watchers = int(app.config.get("LIVE_FEED_MAX_ASYNC_WATCHERS", 500))
+        self.queue_size = int(app.config.get("LIVE_FEED_QUEUE_SIZE", 100))
+        # A replay has to fit in the watcher's queue.
+        self.replay_limit = min(int(app.config.get("LIVE_FEED_REPLAY_LIMIT", 100)), self.queue_size - 1)
+
+    @staticmethod
+    def _postgresql() -> bool:
+        return database.engine.dialect.name == "postgresql"
+
+    # -- write side ------------------------------------------------------------------------
+
+    def publish(self, ids: Iterable[int]):
+        """Announce committed entries to the watchers of every worker."""
+        ids = list(ids)
+        if not self.enabled or not ids:
+            return
+        if not self._postgresql():
+            self._wake.set()
+            return
+        self._notify([{"ids": ids[start : start + _NOTIFY_IDS]} for start in range(0, len(ids), _NOTIFY_IDS)])
+
+    def reset(self):
+        """Tell every watcher to reload (after bulk imports, which are not streamed row by row)."""
+        if not self.enabled:
+            return
+        if self._postgresql():
+            self._notify([{"reset": True}])
+        else:
+            self._broadcast(RESET)
+
+    def _notify(self, payloads: List[dict]):
+        try:
+            with database.engine.begin() as connection:
+                for payload in payloads:
+                    connection.execute(select(func.pg_notify(self.channel, json.dumps(payload))))
+        except Exception:
+            # The entries are saved; watchers only miss the live update.
+            self.app.logger.warning("could not notify %s", self.channel, exc_info=True)
+
+    # -- watchers --------------------------------------------------------------------------
+
+    def watch(self, filters: dict, last_event_id: Optional[int] = None) -> Optional[Iterator[str]]:
+        """Event stream for one watcher, or ``None`` when this worker has no room for another."""
+        if not self._postgresql():
+            self._resume_polling()
+        watcher = self._add_watcher(filters, None)
+        if watcher is None:
+            return None
+        self._start()
+        if last_event_id is not None:
+            self._replay(watcher, last_event_id)
+        return self._events(watcher)
+
+    async def watch_async(self, filters: dict, last_event_id: Optional[int] = None) -> Optional[AsyncIterator[str]]:
+        """Like watch(), for a stream served on an asyncio event loop without holding a thread."""
+        loop = asyncio.get_running_loop()
+        if not self._postgresql():
+            await loop.run_in_executor(None, self._resume_polling)
+        ready = asyncio.Event()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass  # the loop has shut down
+
+        watcher = self._add_watcher(filters, wake)
+        if watcher is None:
+            return None
+        self._start()
+        if last_event_id is not None:
+            try:
+                await loop.run_in_executor(None, self._replay, watcher, last_event_id)
+            except BaseException:
+                self._remove_watcher(watcher)
+                raise
+        return self._events_async(watcher, ready)
+
+    def _add_watcher(self, filters: dict, wake) -> Optional[_Watcher]:
+        limit = self.max_watchers if wake is None else self.max_async_watchers
+        with self._lock:
+            if sum(1 for other in self._watchers if (other.wake is None) == (wake is None)) >= limit:
+                return None
+            watcher = _Watcher(filters, self.queue_size, wake)
+            self._watchers.add(watcher)
+        return watcher
+
+    def _remove_watcher(self, watcher: _Watcher):
+        with self._lock:
+            self._watchers.discard(watcher)
+
+    def _resume_polling(self):
+        """Start from the current newest entry once (again) someone is watching."""
+        with self._lock:
+            if self._last_id is not None and self._watchers:
+                return
+        with database.engine.connect() as connection:
+            newest = connection.scalar(select(func.max(Entry.id))) or 0
+        with self._lock:
+            if self._last_id is None or not self._watchers:
+                self._last_id = newest
+
+    def _events(self, watcher: _Watcher) -> Iterator[str]:
+        # Each stream holds a worker thread; ending it after max_seconds lets the
+        # browser reconnect (with Last-Event-ID) and other tabs get a turn.
+        deadline = time.monotonic() + self.max_seconds
+        try:
+            yield f"retry: {int(self.poll_seconds * 1000) + 2000}\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event = watcher.events.get(timeout=min(self.heartbeat_seconds, remaining))
+                except queue.Empty:
+                    # Keeps proxies from closing an idle connection.
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is RESET:
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                yield event
+        finally:
+            self._remove_watcher(watcher)
+
+    async def _events_async(self, watcher: _Watcher, ready: asyncio.Event) -> AsyncIterator[str]:
+        # No deadline: an idle stream only costs its queue.
+        try:
+            yield f"retry: {int(self.poll_seconds * 1000) + 2000}\n\n"
+            while True:
+                try:
+                    event = watcher.events.get_nowait()
+                except queue.Empty:
+                    # wake() runs on this loop, so a put after the clear below still sets ready.
+                    ready.clear()
+                    if watcher.events.empty():
+                        try:
+                            await asyncio.wait_for(ready.wait(), self.heartbeat_seconds)
+                        except asyncio.TimeoutError:
+                            yield ": keep-alive\n\n"
+                    continue
+                if event is RESET:
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                yield event
+        finally:
+            self._remove_watcher(watcher)
+
+    def _replay(self, watcher: _Watcher, after_id: int):
+        """Rows a reconnecting watcher missed, from the id in its Last-Event-ID header."""
+        statement = select(*_columns()).where(Entry.id > after_id).order_by(Entry.id).limit(self.replay_limit + 1)
+        with database.engine.connect() as connection:
+            rows = connection.execute(statement).all()
+        if len(rows) > self.replay_limit:
+            watcher.put(RESET)
+            return
+        for event in self._render([row for row in rows if watcher.wants(row)]):
+            watcher.put(event)
+
+    def _broadcast(self, event):
+        with self._lock:
+            watchers = list(self._watchers)
+        for watcher in watchers:
+            try:
+                watcher.put(event)
+            except queue.Full:
+                self._drop(watcher)
+
+    def _deliver(self, rows: list):
+        with self._lock:
+            watchers = list(self._watchers)
+        if not watchers or not rows:
+            return
+        events = self._render(rows)
+        for watcher in watchers:
+            for row, event in zip(rows, events):
+                if not watcher.wants(row):
+                    continue
+                try:
+                    watcher.put(event)
+                except queue.Full:
+                    self._drop(watcher)
+                    break
+
+    @staticmethod
+    def _drop(watcher: _Watcher):
+        # A watcher that stopped reading gets a reset as soon as it drains its queue.
+        try:
+            while True:
+                watcher.events.get_nowait()
+        except queue.Empty:
+            pass
+        watcher.put(RESET)
+
+    def _render(self, rows: list) -> List[str]:
+        """One SSE message per row: id plus the rendered <tr>, shared by every watcher."""
+        with self.app.app_context():
+            events = []
+            for row in rows:
+                data = {
+                    "id": row.id,
+                    "machine_no": row.machine_no,
+                    "shift": row.shift,
+                    "work_date": row.work_date.isoformat(),
+                    "html": render_template("records_rows.html", rows=[row]),
+                }
+                events.append(f"id: {row.id}\nevent: entry\ndata: {json.dumps(data, ensure_ascii=False)}\n\n")
+        return events
+
+    # -- background thread -----------------------------------------------------------------
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            target = self._listen if self._postgresql() else self._poll
+            self._thread = threading.Thread(target=target, name="entry-feed", daemon=True)
+            self._thread.start()
+
+    def _poll(self):
+        while True:
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            with self._lock:
+                last_id = self._last_id if self._watchers else None
+            if last_id is None:
+                continue
+            statement = select(*_columns()).where(Entry.id > last_id).order_by(Entry.id)
+            try:
+                with database.engine.connect() as connection:
+                    rows = connection.execute(statement.limit(self.replay_limit + 1)).all()
+            except Exception:
+                self.app.logger.warning("live feed poll failed", exc_info=True)
+                continue
+            if len(rows) > self.replay_limit:
+                # A bulk load; skip ahead rather than stream thousands of rows.
+                self._broadcast(RESET)
+                with self._lock:
+                    self._last_id = None
+                continue
+            if rows:
+                with self._lock:
+                    self._last_id = rows[-1].id
+                self._deliver(rows)
+
+    def _listen(self):
+        connected_before = False
+        while True:
+            connection = None
+            try:
+                pooled = database.engine.raw_connection()
+                # Held for the life of the worker, so keep it out of the pool.
+                pooled.detach()
+                connection = pooled.dbapi_connection
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                if connected_before:
+                    # Notifications sent while reconnecting are lost.
+                    self._broadcast(RESET)
+                connected_before = True
+                while True:
+                    readable, _, _ = select_module.select([connection], [], [], self.heartbeat_seconds)
+                    if not readable:
+                        # Surfaces a silently dropped connection as an error.
+                        with connection.cursor() as cursor:
+                            cursor.execute("SELECT 1")
+                        continue
+                    connection.poll()
+                    ids, reset = [], False
+                    while connection.notifies:
+                        payload = json.loads(connection.notifies.pop(0).payload)
+                        ids += payload.get("ids", [])
+                        reset = reset or payload.get("reset", False)
+                    if reset:
+                        self._broadcast(RESET)
+                    if ids:
+                        self._deliver(self._rows(ids))
+            except Exception:
+                self.app.logger.warning("live feed listener lost its connection", exc_info=True)
+                time.sleep(self.poll_seconds)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def _rows(self, ids: List[int]) -> list:
+        with self._lock:
+            if not self._watchers:
+                return []
+        statement = select(*_columns()).where(Entry.id.in_(ids)).order_by(Entry.id)
+        with database.engine.connect() as connection:
+            return connection.execute(statement).all()
+
+
+def _columns():
+    # The /records columns, so rows render through the same records_rows.html.
+    from .routes.main import RECORDS_COLUMNS
+
+    return export_columns(RECORDS_COLUMNS)
+
+
+entry_feed = EntryFeed()
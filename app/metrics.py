@@ -0,0 +1,372 @@
+from __future__ import annotations
+
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+from . import database
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# name -> (help, label names, buckets)
+HISTOGRAMS = {
+    "app_request_duration_seconds": (
+        "Request latency, measured until the response body has been sent.",
+        ("endpoint", "method"),
+        LATENCY_BUCKETS,
+    ),
+    "app_request_sql_queries": ("SQL statements executed per request.", ("endpoint",), QUERY_COUNT_BUCKETS),
+    "app_request_sql_duration_seconds": ("Time spent executing SQL per request.", ("endpoint",), LATENCY_BUCKETS),
+    "app_template_render_seconds": ("Jinja render time per template.", ("template",), LATENCY_BUCKETS),
+}
+# name -> (help, label names)
+COUNTERS = {
+    "app_requests_total": ("Requests by endpoint, method and status code.", ("endpoint", "method", "status")),
+    "app_slow_requests_total": ("Requests slower than METRICS_SLOW_REQUEST_MS.", ("endpoint",)),
+    "app_export_rows_total": ("Rows streamed by /export (mode=stream) and export jobs (mode=job).", ("format", "mode")),
+}
+
+# Totals of exited workers, folded together so METRICS_DIR does not grow with every restart.
+_RETIRED = "retired.json"
+
+# Not timed: the scrape itself, static files and the open-ended live feed.
+_SKIPPED_ENDPOINTS = {"main.metrics_view", "main.records_stream", "static"}
+
+
+class _RequestStats:
+    __slots__ = ("started", "queries", "sql_seconds", "slowest_sql", "template_seconds", "template_started", "rows")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.slowest_sql: Tuple[float, str] = (0.0, "")
+        self.template_seconds = 0.0
+        self.template_started: List[float] = []
+        self.rows = 0
+
+
+def _current() -> Optional[_RequestStats]:
+    # Export job threads run in an app context without a request; they are not profiled.
+    return g.get("_request_stats") if has_request_context() else None
+
+
+class Metrics:
+    """Per-endpoint latency, SQL and template timings in Prometheus text format.
+
+    Each gunicorn worker keeps its own counters and writes a snapshot to
+    METRICS_DIR (at most once per flush interval); /metrics adds up the
+    snapshots of every worker on the host so a scrape sees the whole service.
+    Snapshots are named by pid and start time, and each worker holds a
+    flock on a matching .lock file while it lives; a scrape that can take
+    that lock folds the snapshot into retired.json and removes it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[tuple, list]] = {name: {} for name in HISTOGRAMS}
+        self._counters: Dict[str, Dict[tuple, float]] = {name: {} for name in COUNTERS}
+        self._flush_timer: Optional[threading.Timer] = None
+        self._last_flush = 0.0
+        # (pid, snapshot name, open lock file) of the current process; redone after a fork.
+        self._process: Optional[Tuple[int, str, object]] = None
+        self.app = None
+        self.enabled = False
+        self.directory: Optional[str] = None
+        self.flush_interval = 1.0
+        self.slow_seconds = 0.0
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = bool(app.config.get("METRICS_ENABLED", True))
+        self.directory = app.config.get("METRICS_DIR") or None
+        self.flush_interval = float(app.config.get("METRICS_FLUSH_SECONDS", 1.0))
+        self.slow_seconds = float(app.config.get("METRICS_SLOW_REQUEST_MS", 0)) / 1000
+        if not self.enabled:
+            return
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._template_started, app)
+        template_rendered.connect(self._template_finished, app)
+        if not event.contains(database.engine, "before_cursor_execute", self._query_started):
+            event.listen(database.engine, "before_cursor_execute", self._query_started)
+            event.listen(database.engine, "after_cursor_execute", self._query_finished)
+
+    # -- recording -----------------------------------------------------------------
+
+    def observe(self, name: str, labels: tuple, value: float):
+        buckets = HISTOGRAMS[name][2]
+        index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+        with self._lock:
+            series = self._histograms[name].get(labels)
+            if series is None:
+                # Per-bucket counts (+Inf last), then sum and count.
+                series = self._histograms[name][labels] = [0] * (len(buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def inc(self, name: str, labels: tuple, amount: float = 1):
+        with self._lock:
+            counters = self._counters[name]
+            counters[labels] = counters.get(labels, 0) + amount
+
+    def export_batches(self, batches: Iterable[list], export_format: str, mode: str) -> Iterator[list]:
+        """Pass export row batches through, counting the rows streamed."""
+        stats = _current()
+        labels = (export_format, mode)
+        for batch in batches:
+            if self.enabled:
+                self.inc("app_export_rows_total", labels, len(batch))
+            if stats is not None:
+                stats.rows += len(batch)
+            yield batch
+        self._schedule_flush()
+
+    def _before_request(self):
+        g._request_stats = _RequestStats()
+
+    def _after_request(self, response):
+        stats = g.pop("_request_stats", None)
+        endpoint = request.endpoint or "unmatched"
+        if stats is not None and endpoint not in _SKIPPED_ENDPOINTS:
+            # Streamed bodies (exports) are produced after this hook; finish once the body is sent.
+            method, path, status = request.method, request.path, response.status_code
+            response.call_on_close(lambda: self._finish(stats, endpoint, method, path, status))
+        return response
+
+    def _finish(self, stats: _RequestStats, endpoint: str, method: str, path: str, status: int):
+        elapsed = time.perf_counter() - stats.started
+        self.observe("app_request_duration_seconds", (endpoint, method), elapsed)
+        self.observe("app_request_sql_queries", (endpoint,), stats.queries)
+        self.observe("app_request_sql_duration_seconds", (endpoint,), stats.sql_seconds)
+        self.inc("app_requests_total", (endpoint, method, str(status)))
+        if self.slow_seconds and elapsed >= self.slow_seconds:
+            self.inc("app_slow_requests_total", (endpoint,))
+            slowest_seconds, slowest_statement = stats.slowest_sql
+            self.app.logger.warning(
+                "slow request %s %s -> %s in %.0f ms: %d queries / %.0f ms sql, %.0f ms templates, %d rows; "
+                "slowest query %.0f ms: %s",
+                method,
+                path,
+                status,
+                elapsed * 1000,
+                stats.queries,
+                stats.sql_seconds * 1000,
+                stats.template_seconds * 1000,
+                stats.rows,
+                slowest_seconds * 1000,
+                " ".join(slowest_statement.split())[:300],
+            )
+        self._schedule_flush()
+
+    def _query_started(self, conn, cursor, statement, parameters, context, executemany):
+        if _current() is not None:
+            conn.info["metrics_query_started"] = time.perf_counter()
+
+    def _query_finished(self, conn, cursor, statement, parameters, context, executemany):
+        stats = _current()
+        started = conn.info.pop("metrics_query_started", None)
+        if stats is None or started is None:
+            return
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.sql_seconds += elapsed
+        if elapsed > stats.slowest_sql[0]:
+            stats.slowest_sql = (elapsed, statement)
+
+    def _template_started(self, sender, template, context, **extra):
+        stats = _current()
+        if stats is not None:
+            stats.template_started.append(time.perf_counter())
+
+    def _template_finished(self, sender, template, context, **extra):
+        stats = _current()
+        if stats is None or not stats.template_started:
+            return
+        elapsed = time.perf_counter() - stats.template_started.pop()
+        if not stats.template_started:
+            stats.template_seconds += elapsed
+        self.observe("app_template_render_seconds", (template.name or "",), elapsed)
+
+    # -- sharing between workers ------------------------------------------------------
+
+    def _snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "histograms": {name: [[list(k), list(v)] for k, v in series.items()] for name, series in self._histograms.items()},
+                "counters": {name: [[list(k), v] for k, v in series.items()] for name, series in self._counters.items()},
+            }
+
+    def _schedule_flush(self):
+        if not (self.enabled and self.directory):
+            return
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+            return
+        with self._lock:
+            if self._flush_timer is not None:
+                return
+            # Trailing write so the last requests before an idle period are not lost.
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _process_name(self) -> str:
+        pid = os.getpid()
+        if self._process is None or self._process[0] != pid:
+            name = f"{pid}-{time.time_ns()}"
+            # Held until the process exits, which tells scrapes the snapshot is still live.
+            lock = open(os.path.join(self.directory, name + ".lock"), "w")
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._process = (pid, name, lock)
+        return self._process[1]
+
+    def flush(self):
+        """Write this process's counters to METRICS_DIR for the other workers' /metrics."""
+        with self._lock:
+            self._flush_timer = None
+        self._last_flush = time.monotonic()
+        path = None
+        try:
+            path = os.path.join(self.directory, self._process_name() + ".json")
+            with open(path + ".tmp", "w", encoding="utf-8") as handle:
+                json.dump(self._snapshot(), handle)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            self.app.logger.warning("could not write metrics snapshot %s", path, exc_info=True)
+
+    def _retire_exited(self):
+        """Fold the snapshots of exited workers into retired.json, so counters never go backwards."""
+        try:
+            with open(os.path.join(self.directory, "retire.lock"), "w") as guard:
+                fcntl.flock(guard, fcntl.LOCK_EX)
+                retired_path = os.path.join(self.directory, _RETIRED)
+                retired = None
+                for path in glob.glob(os.path.join(self.directory, "*.json")):
+                    name = os.path.basename(path)[: -len(".json")]
+                    if path == retired_path or (self._process and name == self._process[1]):
+                        continue
+                    with open(os.path.join(self.directory, name + ".lock"), "w") as lock:
+                        try:
+                            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            continue  # still running
+                    if retired is None:
+                        retired = _read(retired_path) or _empty()
+                    snapshot = _read(path)
+                    if snapshot is not None:
+                        _merge(retired, snapshot)
+                    with open(retired_path + ".tmp", "w", encoding="utf-8") as handle:
+                        json.dump(retired, handle)
+                    os.replace(retired_path + ".tmp", retired_path)
+                    for leftover in (path, os.path.join(self.directory, name + ".lock")):
+                        try:
+                            os.unlink(leftover)
+                        except OSError:
+                            pass
+        except OSError:
+            self.app.logger.warning("could not retire metrics snapshots in %s", self.directory, exc_info=True)
+
+    def _snapshots(self) -> Iterator[dict]:
+        yield self._snapshot()
+        if not self.directory:
+            return
+        self._retire_exited()
+        own = self._process[1] + ".json" if self._process else None
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            if os.path.basename(path) == own:
+                continue
+            snapshot = _read(path)
+            if snapshot is not None:
+                yield snapshot
+
+    # -- exposition ----------------------------------------------------------------------
+
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format (0.0.4)."""
+        merged = _empty()
+        for snapshot in self._snapshots():
+            _merge(merged, snapshot)
+        histograms: Dict[str, Dict[tuple, list]] = {name: {} for name in HISTOGRAMS}
+        counters: Dict[str, Dict[tuple, float]] = {name: {} for name in COUNTERS}
+        for name, series in merged["histograms"].items():
+            if name in histograms:
+                histograms[name] = {tuple(labels): values for labels, values in series}
+        for name, series in merged["counters"].items():
+            if name in counters:
+                counters[name] = {tuple(labels): value for labels, value in series}
+
+        lines = []
+        for name, (help_text, label_names, buckets) in HISTOGRAMS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            bounds = [_number(bound) for bound in buckets] + ["+Inf"]
+            for labels, values in sorted(histograms[name].items()):
+                label_text = _labels(label_names, labels)
+                cumulative = 0
+                for bound, count in zip(bounds, values):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label_text}{"," if label_text else ""}le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{label_text}}} {_number(values[-2])}")
+                lines.append(f"{name}_count{{{label_text}}} {values[-1]}")
+        for name, (help_text, label_names) in COUNTERS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for labels, value in sorted(counters[name].items()):
+                lines.append(f"{name}{{{_labels(label_names, labels)}}} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _empty() -> dict:
+    return {"histograms": {}, "counters": {}}
+
+
+def _read(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(into: dict, snapshot: dict):
+    """Add ``snapshot``'s series to ``into`` (both in the snapshot file layout)."""
+    for name, series in snapshot.get("histograms", {}).items():
+        merged = {tuple(labels): values for labels, values in into["histograms"].get(name, [])}
+        for labels, values in series:
+            current = merged.get(tuple(labels))
+            if current is None:
+                merged[tuple(labels)] = list(values)
+            elif len(current) == len(values):
+                merged[tuple(labels)] = [a + b for a, b in zip(current, values)]
+        into["histograms"][name] = [[list(labels), values] for labels, values in merged.items()]
+    for name, series in snapshot.get("counters", {}).items():
+        merged = {tuple(labels): value for labels, value in into["counters"].get(name, [])}
+        for labels, value in series:
+            merged[tuple(labels)] = merged.get(tuple(labels), 0) + value
+        into["counters"][name] = [[list(labels), value] for labels, value in merged.items()]
+
+
+def _labels(names: Iterable[str], values: Iterable) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+metrics = Metrics()
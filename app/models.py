@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Date, DateTime, Float, Integer, String, Text, func
+from sqlalchemy import Column, Date, DateTime, Float, Index, Integer, String, Text, func
 
 from .database import Base
 
@@ -9,7 +9,7 @@ class Entry(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     work_date = Column(Date, nullable=False)
     shift = Column(String(1), nullable=False)
-    machine_no = Column(Integer, nullable=False, index=True)
+    machine_no = Column(Integer, nullable=False)
     model_name = Column(String(50), nullable=False)
     environment_temp = Column(Float, nullable=True)
     environment_humidity = Column(Float, nullable=True)
@@ -49,55 +49,51 @@ class Entry(Base):
     cooling_time = Column(Float, nullable=True)
 
     change_note = Column(Text, nullable=True)
+    # Comma-separated monitored fields that were outside their control limits when saved.
+    out_of_limit_fields = Column(String(255), nullable=True)
+    # UUID generated on the tablet for entries queued offline. EntryClientId holds the
+    # unique copy that makes /api/entries/sync idempotent.
+    client_id = Column(String(36), nullable=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
     )
 
+    __table_args__ = (
+        # Newest-first ordering used by /records and keyset export batches.
+        Index("ix_entries_work_date_id", work_date, id),
+        # The same ordering within one machine (filtered /records pages); replaces ix_entries_machine_no.
+        Index("ix_entries_machine_work_date_id", machine_no, work_date, id),
+        # Latest conditions for a machine/model (form prefill) as a single index seek.
+        Index(
+            "ix_entries_machine_model_latest",
+            machine_no,
+            model_name,
+            work_date.desc(),
+            id.desc(),
+        ),
+        Index("ux_entries_client_id", client_id, unique=True),
+    )
+
     def as_dict(self):
-        return {
-            "id": self.id,
-            "work_date": self.work_date.isoformat() if self.work_date else "",
-            "shift": self.shift,
-            "machine_no": self.machine_no,
-            "model_name": self.model_name,
-            "environment_temp": self.environment_temp if self.environment_temp is not None else "",
-            "environment_humidity": self.environment_humidity if self.environment_humidity is not None else "",
-            "material_lot": self.material_lot or "",
-            "inj_time": self.inj_time,
-            "metering_time": self.metering_time,
-            "vp_position": self.vp_position,
-            "vp_pressure": self.vp_pressure,
-            "min_cushion": self.min_cushion,
-            "peak_pressure": self.peak_pressure,
-            "cycle_time": self.cycle_time,
-            "shot_count": self.shot_count,
-            "mold_temp_fixed": self.mold_temp_fixed if self.mold_temp_fixed is not None else "",
-            "mold_temp_moving": self.mold_temp_moving if self.mold_temp_moving is not None else "",
-            "nozzle_temp": self.nozzle_temp if self.nozzle_temp is not None else "",
-            "cylinder_front_temp": self.cylinder_front_temp if self.cylinder_front_temp is not None else "",
-            "cylinder_mid1_temp": self.cylinder_mid1_temp if self.cylinder_mid1_temp is not None else "",
-            "cylinder_mid2_temp": self.cylinder_mid2_temp if self.cylinder_mid2_temp is not None else "",
-            "cylinder_rear_temp": self.cylinder_rear_temp if self.cylinder_rear_temp is not None else "",
-            "injection_speed_1": self.injection_speed_1 if self.injection_speed_1 is not None else "",
-            "injection_speed_2": self.injection_speed_2 if self.injection_speed_2 is not None else "",
-            "injection_switch_position": self.injection_switch_position if self.injection_switch_position is not None else "",
-            "injection_pressure_setting": self.injection_pressure_setting if self.injection_pressure_setting is not None else "",
-            "injection_time_setting": self.injection_time_setting if self.injection_time_setting is not None else "",
-            "hold_pressure_1": self.hold_pressure_1 if self.hold_pressure_1 is not None else "",
-            "hold_pressure_2": self.hold_pressure_2 if self.hold_pressure_2 is not None else "",
-            "hold_time_1": self.hold_time_1 if self.hold_time_1 is not None else "",
-            "hold_time_2": self.hold_time_2 if self.hold_time_2 is not None else "",
-            "hold_pressure_total": self.hold_pressure_total if self.hold_pressure_total is not None else "",
-            "metering_position": self.metering_position if self.metering_position is not None else "",
-            "back_pressure": self.back_pressure if self.back_pressure is not None else "",
-            "screw_rotation_speed": self.screw_rotation_speed if self.screw_rotation_speed is not None else "",
-            "cooling_time": self.cooling_time if self.cooling_time is not None else "",
-            "change_note": self.change_note or "",
-            "created_at": self.created_at.isoformat() if self.created_at else "",
-            "updated_at": self.updated_at.isoformat() if self.updated_at else "",
-        }
+        from .fields import json_values  # fields builds its registry from this model
+
+        return json_values(self)
+
+
+class EntryClientId(Base):
+    """Offline-sync UUIDs of saved entries, one row each.
+
+    Kept apart from entries so the UUID stays unique once entries is
+    partitioned by month (every unique index there has to include work_date)
+    or its old months are archived to other files.
+    """
+
+    __tablename__ = "entry_client_ids"
+
+    client_id = Column(String(36), primary_key=True)
+    entry_id = Column(Integer, nullable=False)
 
 
 class Feedback(Base):
@@ -107,3 +103,86 @@ class Feedback(Base):
     category = Column(String(50), nullable=False)
     details = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class EntrySummary(Base):
+    """Per machine/model/day/shift rollup of the monitored values, kept in step with entries."""
+
+    __tablename__ = "entry_summaries"
+
+    machine_no = Column(Integer, primary_key=True)
+    model_name = Column(String(50), primary_key=True)
+    work_date = Column(Date, primary_key=True)
+    shift = Column(String(1), primary_key=True)
+
+    entry_count = Column(Integer, nullable=False, default=0)
+    shot_count_total = Column(Integer, nullable=False, default=0)
+
+    cycle_time_sum = Column(Float, nullable=False, default=0)
+    cycle_time_min = Column(Float, nullable=True)
+    cycle_time_max = Column(Float, nullable=True)
+    cycle_time_sumsq = Column(Float, nullable=False, default=0)
+
+    peak_pressure_sum = Column(Float, nullable=False, default=0)
+    peak_pressure_min = Column(Float, nullable=True)
+    peak_pressure_max = Column(Float, nullable=True)
+    peak_pressure_sumsq = Column(Float, nullable=False, default=0)
+
+    min_cushion_sum = Column(Float, nullable=False, default=0)
+    min_cushion_min = Column(Float, nullable=True)
+    min_cushion_max = Column(Float, nullable=True)
+    min_cushion_sumsq = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (Index("ix_entry_summaries_work_date", work_date),)
+
+    def mean(self, field: str):
+        if not self.entry_count:
+            return None
+        return getattr(self, f"{field}_sum") / self.entry_count
+
+    def stddev(self, field: str):
+        count = self.entry_count or 0
+        if count < 2:
+            return None
+        total = getattr(self, f"{field}_sum")
+        variance = (getattr(self, f"{field}_sumsq") - total * total / count) / (count - 1)
+        return max(variance, 0.0) ** 0.5
+
+
+class ControlLimit(Base):
+    """Exponentially weighted mean/variance of a monitored field per machine/model."""
+
+    __tablename__ = "control_limits"
+
+    machine_no = Column(Integer, primary_key=True)
+    model_name = Column(String(50), primary_key=True)
+    field_name = Column(String(50), primary_key=True)
+    sample_count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0)
+    variance = Column(Float, nullable=False, default=0)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+
+class ExportJob(Base):
+    """A background /export run; the file is written to EXPORT_JOB_DIR on the web host."""
+
+    __tablename__ = "export_jobs"
+
+    id = Column(String(32), primary_key=True)
+    status = Column(String(10), nullable=False, default="queued")  # queued/running/done/failed
+    export_format = Column(String(10), nullable=False)
+    # JSON of the normalised RecordsFilterForm values.
+    filters = Column(Text, nullable=False)
+    rows_total = Column(Integer, nullable=True)
+    rows_done = Column(Integer, nullable=False, default=0)
+    file_path = Column(String(500), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (Index("ix_export_jobs_created_at", created_at),)
@@ -0,0 +1,469 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import MetaData, Select, Table, select, text, union_all
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import ClauseAdapter
+
+from . import database
+from .export import iter_batches as _iter_batches
+from .models import Entry
+
+_ARCHIVE_FILE = re.compile(r"^entries-(\d{4})-(\d{2})\.db$")
+_PARTITION_NAME = re.compile(r"^entries_y(\d{4})m(\d{2})$")
+# How often a worker that saw an unpartitioned table looks again (partition-entries runs while workers are up).
+_PARTITIONED_RECHECK_SECONDS = 60.0
+# Cached per-file aggregates of each_archived() (export versions): a few per filter combination.
+_ARCHIVE_RESULTS_SIZE = 256
+
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(first: date, last: date) -> List[date]:
+    """Month starts from ``first``'s month through ``last``'s month."""
+    months, month = [], month_start(first)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def partition_name(month: date) -> str:
+    return f"entries_y{month.year}m{month.month:02d}"
+
+
+class EntryPartitions:
+    """Month partitions of the entries table.
+
+    PostgreSQL: ``flask partition-entries`` turns entries into a table range
+    partitioned by work_date month. Partitions are created months ahead and,
+    for back-dated saves, on demand; the planner skips months outside a
+    query's work_date filter.
+
+    SQLite: ``flask archive-entries`` moves months older than
+    ARCHIVE_KEEP_MONTHS into one database file per month, which bounds the
+    size of the live file (reads are no faster, see benchmarks/partitions.py).
+    Reads go through fetch()/iter_batches()/each(), which query the live
+    table for recent months and ATTACH only the archive files a date filter
+    reaches.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._partitioned: Optional[bool] = None
+        self._partitioned_checked = 0.0
+        self._known_months: Set[date] = set()
+        self._archive_listing: Tuple[float, List[date]] = (-1.0, [])
+        self._archive_metadata = MetaData()
+        self._archive_results: OrderedDict = OrderedDict()
+        self.archive_dir: Optional[str] = None
+        self.keep_months = 12
+        self.months_ahead = 3
+
+    def init_app(self, app):
+        self.archive_dir = app.config.get("ARCHIVE_DIR") or None
+        self.keep_months = int(app.config.get("ARCHIVE_KEEP_MONTHS", 12))
+        self.months_ahead = int(app.config.get("PARTITION_MONTHS_AHEAD", 3))
+        self._partitioned = None
+        self._known_months = set()
+        self._archive_listing = (-1.0, [])
+        self._archive_results.clear()
+
+    @staticmethod
+    def _postgresql() -> bool:
+        return database.engine.dialect.name == "postgresql"
+
+    # -- PostgreSQL range partitions ------------------------------------------------------
+
+    def partitioned(self) -> bool:
+        """Whether entries is partitioned; a "no" is re-checked every minute, a "yes" is final."""
+        now = time.monotonic()
+        if self._partitioned is None or (
+            not self._partitioned and self._postgresql() and now - self._partitioned_checked >= _PARTITIONED_RECHECK_SECONDS
+        ):
+            self._partitioned = self._postgresql() and self._query_partitioned()
+            self._partitioned_checked = now
+        return self._partitioned
+
+    @staticmethod
+    def _query_partitioned() -> bool:
+        with database.engine.connect() as connection:
+            return bool(
+                connection.scalar(
+                    text("SELECT count(*) FROM pg_partitioned_table WHERE partrelid = to_regclass('entries')")
+                )
+            )
+
+    @staticmethod
+    def _partition_months(connection) -> Set[date]:
+        names = connection.scalars(
+            text(
+                "SELECT child.relname FROM pg_inherits"
+                " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+                " WHERE pg_inherits.inhparent = to_regclass('entries')"
+            )
+        )
+        months = set()
+        for name in names:
+            match = _PARTITION_NAME.match(name)
+            if match:
+                months.add(date(int(match.group(1)), int(match.group(2)), 1))
+        return months
+
+    @staticmethod
+    def _create_partition(connection, month: date):
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF entries"
+                f" FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            )
+        )
+
+    def create_partitions(self, months: Iterable[date]) -> List[str]:
+        """Create the missing monthly partitions; returns the names created."""
+        created = []
+        with database.engine.begin() as connection:
+            existing = self._partition_months(connection)
+            for month in sorted(set(months) - existing):
+                self._create_partition(connection, month)
+                created.append(partition_name(month))
+            existing.update(months)
+        with self._lock:
+            self._known_months |= existing
+        return created
+
+    def ensure_months(self, work_dates: Iterable[date]):
+        """Make sure every month about to receive a row has a partition (no-op unless partitioned)."""
+        if not self.partitioned():
+            return
+        months = {month_start(work_date) for work_date in work_dates if work_date is not None}
+        if months <= self._known_months:
+            return
+        try:
+            self.create_partitions(months)
+        except DBAPIError:
+            # Another worker created the same month concurrently; fine if it exists now.
+            with database.engine.connect() as connection:
+                existing = self._partition_months(connection)
+            if not months <= existing:
+                raise
+            with self._lock:
+                self._known_months |= existing
+
+    def partition_table(self, today: Optional[date] = None) -> List[str]:
+        """Convert entries to a month-partitioned table (once), then create upcoming months."""
+        if not self._postgresql():
+            raise RuntimeError("Range partitioning needs PostgreSQL; use archive-entries on SQLite.")
+        today = today or date.today()
+        changes = []
+        if not self.partitioned():
+            changes += self._convert(today)
+            self._partitioned = True
+        created = self.create_partitions(month_range(today, add_months(month_start(today), self.months_ahead)))
+        changes += [f"created partition {name}" for name in created]
+        return changes
+
+    def _convert(self, today: date) -> List[str]:
+        table = Entry.__table__
+        columns = ", ".join(column.name for column in table.columns)
+        with database.engine.begin() as connection:
+            # Copying and indexing 10M+ rows takes far longer than DB_STATEMENT_TIMEOUT_MS.
+            database.lift_statement_timeout(connection)
+            connection.execute(text("LOCK TABLE entries IN ACCESS EXCLUSIVE MODE"))
+            first, last = connection.execute(text("SELECT min(work_date), max(work_date) FROM entries")).one()
+            index_names = connection.scalars(
+                text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'entries'")
+            ).all()
+            connection.execute(text("ALTER TABLE entries RENAME TO entries_unpartitioned"))
+            for name in index_names:
+                connection.execute(text(f'ALTER INDEX "{name}" RENAME TO "{name[:40]}_unpartitioned"'))
+            connection.execute(
+                text(
+                    "CREATE TABLE entries (LIKE entries_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                    " PARTITION BY RANGE (work_date)"
+                )
+            )
+            # The partition key has to be part of every unique constraint.
+            connection.execute(text("ALTER TABLE entries ADD CONSTRAINT entries_pkey PRIMARY KEY (id, work_date)"))
+            connection.execute(text("ALTER SEQUENCE entries_id_seq OWNED BY entries.id"))
+            months = month_range(first or today, last or today)
+            for month in months:
+                self._create_partition(connection, month)
+            # One statement per month (through ix_entries_work_date_id) rather than the whole table
+            # at once; the transaction, and with it the lock, still covers the full copy.
+            copied = []
+            for month in months:
+                count = connection.execute(
+                    text(
+                        f"INSERT INTO entries ({columns}) SELECT {columns} FROM entries_unpartitioned"
+                        " WHERE work_date >= :first AND work_date < :after"
+                    ),
+                    {"first": month, "after": add_months(month, 1)},
+                ).rowcount
+                copied.append(f"copied {count} row(s) of {month:%Y-%m}")
+            for index in table.indexes:
+                if index.unique:
+                    # ux_entries_client_id turns into (client_id, work_date); entry_client_ids
+                    # is what keeps an offline-sync UUID unique across months.
+                    names = ", ".join([column.name for column in index.columns] + ["work_date"])
+                    connection.execute(text(f"CREATE UNIQUE INDEX {index.name} ON entries ({names})"))
+                else:
+                    index.create(connection)
+        return copied + [
+            "converted entries to monthly range partitions on work_date",
+            "kept the previous table as entries_unpartitioned (drop it once verified)",
+        ]
+
+    # -- SQLite archive files --------------------------------------------------------------
+
+    def archive_path(self, month: date) -> str:
+        return os.path.join(self.archive_dir, f"entries-{month.year}-{month.month:02d}.db")
+
+    def archived_months(self) -> List[date]:
+        """Months that have an archive file, newest first."""
+        if not self.archive_dir or self._postgresql():
+            return []
+        try:
+            mtime = os.stat(self.archive_dir).st_mtime
+        except OSError:
+            return []
+        if mtime != self._archive_listing[0]:
+            months = []
+            for name in os.listdir(self.archive_dir):
+                match = _ARCHIVE_FILE.match(name)
+                if match:
+                    months.append(date(int(match.group(1)), int(match.group(2)), 1))
+            self._archive_listing = (mtime, sorted(months, reverse=True))
+        return self._archive_listing[1]
+
+    def archive_boundary(self) -> Optional[date]:
+        """First day the live table is authoritative for; earlier months also have archive files."""
+        archived = self.archived_months()
+        return add_months(archived[0], 1) if archived else None
+
+    def archive(self, keep_months: Optional[int] = None, today: Optional[date] = None) -> List[Tuple[date, int]]:
+        """Move months older than ``keep_months`` into archive files; returns (month, rows) moved.
+
+        Re-running also sweeps rows saved into already archived months since the last run.
+        """
+        if self._postgresql():
+            raise RuntimeError("The archive tier is for SQLite; partition entries on PostgreSQL instead.")
+        keep_months = self.keep_months if keep_months is None else keep_months
+        cutoff = add_months(month_start(today or date.today()), -keep_months)
+        with database.engine.connect() as connection:
+            first = connection.scalar(select(Entry.work_date).where(Entry.work_date < cutoff).order_by(Entry.work_date))
+        if first is None:
+            return []
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        table = Entry.__table__
+        columns = ", ".join(column.name for column in table.columns)
+        moved = []
+        for month in month_range(first, add_months(cutoff, -1)):
+            schema = _schema(month)
+            bounds = {"first": month, "after": add_months(month, 1)}
+            where = "work_date >= :first AND work_date < :after"
+            unarchived = f"{where} AND id NOT IN (SELECT id FROM {schema}.entries)"
+            with database.engine.connect() as connection:
+                connection.exec_driver_sql(f"ATTACH DATABASE ? AS {schema}", (self.archive_path(month),))
+                try:
+                    self._archive_table(month).create(connection, checkfirst=True)
+                    # In WAL mode a commit spanning attached files is not atomic, so the copy is
+                    # committed on its own and rows are only deleted once the archive holds them.
+                    # A crash in between leaves duplicates, which reads skip and the next run clears.
+                    connection.execute(
+                        text(f"INSERT INTO {schema}.entries ({columns}) SELECT {columns} FROM main.entries WHERE {unarchived}"),
+                        bounds,
+                    )
+                    connection.commit()
+                    missing = connection.scalar(text(f"SELECT count(*) FROM main.entries WHERE {unarchived}"), bounds)
+                    if missing:
+                        raise RuntimeError(
+                            f"{missing} row(s) of {month:%Y-%m} are missing from {self.archive_path(month)};"
+                            " the live table was left unchanged."
+                        )
+                    count = connection.execute(
+                        text(f"DELETE FROM main.entries WHERE {where} AND id IN (SELECT id FROM {schema}.entries)"),
+                        bounds,
+                    ).rowcount
+                    connection.commit()
+                finally:
+                    connection.exec_driver_sql(f"DETACH DATABASE {schema}")
+            if count:
+                moved.append((month, count))
+        return moved
+
+    # -- reads -----------------------------------------------------------------------------
+
+    def _segments(self, date_from: Optional[date], date_to: Optional[date]) -> List[Optional[date]]:
+        """Newest-first sources for a work_date range: None for the live table, else an archive month."""
+        archived = self.archived_months()
+        if not archived:
+            return [None]
+        boundary = add_months(archived[0], 1)
+        segments: List[Optional[date]] = []
+        if date_to is None or date_to >= boundary:
+            segments.append(None)
+        for month in archived:
+            # The oldest archive also serves back-dated live rows from before it (see _adapter).
+            reaches = date_to is None or month <= date_to or month == archived[-1]
+            if reaches and (date_from is None or add_months(month, 1) > date_from):
+                segments.append(month)
+        return segments
+
+    def _archive_table(self, month: date) -> Table:
+        schema = _schema(month)
+        with self._lock:
+            archive_table = self._archive_metadata.tables.get(f"{schema}.{Entry.__tablename__}")
+            if archive_table is None:
+                archive_table = Entry.__table__.to_metadata(self._archive_metadata, schema=schema)
+            return archive_table
+
+    def _adapter(self, month: Optional[date], boundary: Optional[date], oldest: bool = False) -> Callable[[Select], Select]:
+        if boundary is None:
+            return lambda statement: statement
+        if month is None:
+            return lambda statement: statement.where(Entry.work_date >= boundary)
+        table = Entry.__table__
+        archive_table = self._archive_table(month)
+        # Rows saved into an archived month after it was archived stay in the live table until the
+        # next run; the oldest archive also picks up back-dated rows from before the first archive.
+        # Aliased: the archive table is also named entries, which would confuse the correlation.
+        live = table.alias("live_entries")
+        late = select(live).where(
+            live.c.work_date < add_months(month, 1),
+            # Rows an interrupted archive run already copied are only read from the archive.
+            ~select(archive_table.c.id).where(archive_table.c.id == live.c.id).exists(),
+        )
+        if not oldest:
+            late = late.where(live.c.work_date >= month)
+        adapter = ClauseAdapter(union_all(late, select(archive_table)).subquery(table.name))
+        return adapter.traverse
+
+    @contextmanager
+    def _attached(self, db_session: Session, month: Optional[date]):
+        if month is None:
+            yield
+            return
+        connection = db_session.connection()
+        connection.exec_driver_sql(f"ATTACH DATABASE ? AS {_schema(month)}", (self.archive_path(month),))
+        try:
+            yield
+        finally:
+            connection.exec_driver_sql(f"DETACH DATABASE {_schema(month)}")
+
+    def _plan(self, date_from, date_to, ascending=False) -> Iterator[Tuple[Optional[date], Callable[[Select], Select]]]:
+        """(source, statement rewrite) pairs in scan order, built lazily so an early stop skips the rest."""
+        archived = self.archived_months()
+        boundary = add_months(archived[0], 1) if archived else None
+        segments = self._segments(date_from, date_to)
+        for month in reversed(segments) if ascending else segments:
+            yield month, self._adapter(month, boundary, bool(archived) and month == archived[-1])
+
+    def fetch(
+        self,
+        db_session: Session,
+        statement: Select,
+        limit: int,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        ascending: bool = False,
+    ) -> list:
+        """Up to ``limit`` rows of an ordered statement across the live table and archives."""
+        rows: list = []
+        for month, adapt in self._plan(date_from, date_to, ascending):
+            with self._attached(db_session, month):
+                rows += db_session.execute(adapt(statement.limit(limit - len(rows)))).all()
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def iter_batches(
+        self,
+        db_session: Session,
+        statement: Select,
+        batch_size: int,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ) -> Iterator[list]:
+        """export.iter_batches() over the live table, then each archived month in range."""
+        for month, adapt in self._plan(date_from, date_to):
+            with self._attached(db_session, month):
+                yield from _iter_batches(db_session, statement, batch_size, adapt=adapt)
+
+    def each(
+        self, db_session: Session, statement: Select, date_from: Optional[date] = None, date_to: Optional[date] = None
+    ) -> Iterator[Sequence]:
+        """One result row of an aggregate statement per source (for adding up counts)."""
+        for month, adapt in self._plan(date_from, date_to):
+            with self._attached(db_session, month):
+                yield db_session.execute(adapt(statement)).one()
+
+    def each_archived(
+        self, db_session: Session, statement: Select, date_from: Optional[date] = None, date_to: Optional[date] = None
+    ) -> Iterator[tuple]:
+        """One result row of an aggregate statement per archive file in range, from the file alone.
+
+        Archive files only change through archive(), so rows are cached per file,
+        keyed on its size and mtime; only a miss ATTACHes it. Rows saved into
+        archived months since the last run are still in the live table.
+        """
+        compiled = statement.compile(database.engine)
+        query = (str(compiled), tuple(sorted((name, repr(value)) for name, value in compiled.params.items())))
+        for month in self._segments(date_from, date_to):
+            if month is None:
+                continue
+            stamp = _file_stamp(self.archive_path(month))
+            if stamp is None:
+                continue
+            key = (month, stamp, query)
+            with self._lock:
+                row = self._archive_results.get(key)
+                if row is not None:
+                    self._archive_results.move_to_end(key)
+            if row is None:
+                adapt = ClauseAdapter(self._archive_table(month), adapt_on_names=True).traverse
+                with self._attached(db_session, month):
+                    row = tuple(db_session.execute(adapt(statement)).one())
+                with self._lock:
+                    self._archive_results[key] = row
+                    while len(self._archive_results) > _ARCHIVE_RESULTS_SIZE:
+                        self._archive_results.popitem(last=False)
+            yield row
+
+
+def _file_stamp(path: str) -> Optional[tuple]:
+    """(size, mtime) of a database file and its WAL, or None when it is gone."""
+    stamp = []
+    for name in (path, path + "-wal"):
+        try:
+            stat = os.stat(name)
+        except OSError:
+            if name == path:
+                return None
+            continue
+        stamp += [stat.st_size, stat.st_mtime_ns]
+    return tuple(stamp)
+
+
+def _schema(month: date) -> str:
+    return f"archive_{month.year}_{month.month:02d}"
+
+
+partitions = EntryPartitions()
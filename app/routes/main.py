@@ -1,15 +1,21 @@
 from __future__ import annotations
 
 import csv
+import os
+import re
+import uuid
 from datetime import datetime, time
-from io import StringIO
-from typing import Iterable, List
+from io import StringIO, TextIOWrapper
+from types import SimpleNamespace
+from typing import Iterable, List, Optional, Tuple
 
 from flask import (
     Blueprint,
     Response,
+    abort,
     current_app,
     flash,
+    jsonify,
     redirect,
     render_template,
     request,
@@ -17,21 +23,29 @@ from flask import (
     stream_with_context,
     url_for,
 )
-
-from ..database import create_all, session_scope
-from ..forms import EntryForm, FeedbackForm, RecordsFilterForm
-from ..models import Entry, Feedback
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+
+from .. import fields, importer, limits, spc, summary
+from ..assets import assets
+from ..cache import MISSING, export_cache, fragment_cache, page_cache, prefill_cache
+from ..compression import compression
+from ..database import session_scope
+from ..export import EXPORT_FORMATS, export_chunks, export_columns, export_statement, filter_entries
+from ..forms import BatchEntryForm, EntryForm, FeedbackForm, ImportForm, RecordsFilterForm
+from ..jobs import export_jobs
+from ..keyset import decode_cursor, encode_cursor, newer_than, newest_first, older_than, oldest_first
+from ..live import entry_feed
+from ..metrics import metrics
+from ..partitions import partitions
+from ..models import Entry, EntryClientId, EntrySummary, Feedback
 
 bp = Blueprint("main", __name__)
 
 
-@bp.before_app_request
-def ensure_tables():
-    if not current_app.config.setdefault("_tables_ready", False):
-        create_all()
-        current_app.config["_tables_ready"] = True
-
-
 def _get_choices():
     cfg = current_app.config
     shift_choices = cfg.get("SHIFT_CHOICES") or ["A", "B", "C"]
@@ -63,55 +77,63 @@ def _guess_shift(shift_choices: List[str]):
     return shift_choices[2]
 
 
+def _latest_conditions(machine_no: int, model_name: str):
+    key = (machine_no, model_name)
+    snapshot = prefill_cache.get(key)
+    if snapshot is not MISSING:
+        return snapshot
+
+    generation = prefill_cache.generation
+    columns = [getattr(Entry, field_name) for field_name in fields.CONDITION_FIELDS]
+    statement = newest_first(
+        select(Entry.work_date, Entry.id, *columns).where(
+            Entry.machine_no == machine_no, Entry.model_name == model_name
+        )
+    )
+    with session_scope() as db_session:
+        # Normally answered by the live table; archives are only read for pairs with no recent entries.
+        latest = next(iter(partitions.fetch(db_session, statement, 1)), None)
+    if not latest:
+        prefill_cache.put(key, None, None, generation)
+        return None
+    snapshot = fields.condition_values(latest)
+    prefill_cache.put(key, (latest.work_date, latest.id), snapshot, generation)
+    return snapshot
+
+
 def _prefill_conditions(form: EntryForm, machine_no: int, model_name: str):
     if not machine_no or not model_name:
         return
-    with session_scope() as db_session:
-        latest = (
-            db_session.query(Entry)
-            .filter(Entry.machine_no == machine_no, Entry.model_name == model_name)
-            .order_by(Entry.work_date.desc(), Entry.id.desc())
-            .first()
-        )
-    if not latest:
+    snapshot = _latest_conditions(machine_no, model_name)
+    if not snapshot:
         return
-    field_names = [
-        "mold_temp_fixed",
-        "mold_temp_moving",
-        "nozzle_temp",
-        "cylinder_front_temp",
-        "cylinder_mid1_temp",
-        "cylinder_mid2_temp",
-        "cylinder_rear_temp",
-        "injection_speed_1",
-        "injection_speed_2",
-        "injection_switch_position",
-        "injection_pressure_setting",
-        "injection_time_setting",
-        "hold_pressure_1",
-        "hold_pressure_2",
-        "hold_time_1",
-        "hold_time_2",
-        "hold_pressure_total",
-        "metering_position",
-        "back_pressure",
-        "screw_rotation_speed",
-        "cooling_time",
-        "change_note",
-    ]
-    for field_name in field_names:
-        value = getattr(latest, field_name, None)
+    for field_name, value in snapshot.items():
         field = getattr(form, field_name, None)
         if field is None or value is None:
             continue
-        if field_name == "screw_rotation_speed" and value is not None:
-            value = int(value)
         if field.data in (None, ""):
             field.data = value
 
 
+def _entry_values(entry: Entry) -> dict:
+    return {column.key: getattr(entry, column.key) for column in Entry.__table__.columns}
+
+
+def _limit_options() -> dict:
+    cfg = current_app.config
+    return {
+        "alpha": cfg.get("LIMITS_ALPHA", 0.05),
+        "width": cfg.get("LIMITS_WIDTH", 3.0),
+        "min_samples": cfg.get("LIMITS_MIN_SAMPLES", 20),
+    }
+
+
 @bp.route("/home")
 def home():
+    return page_cache.response("main.home", _render_home)
+
+
+def _render_home():
     patch_notes = current_app.config.get("PATCH_NOTES", [])
     usage_steps = current_app.config.get("USAGE_GUIDE", [])
     latest_version = patch_notes[0].get("version") if patch_notes else ""
@@ -152,84 +174,24 @@ def index():
         _prefill_conditions(form, preselected_machine, form.model_name.data)
 
     if form.validate_on_submit():
+        partitions.ensure_months([form.work_date.data])
         with session_scope() as db_session:
-            entry = Entry(
-                work_date=form.work_date.data,
-                shift=form.shift.data,
-                machine_no=int(form.machine_no.data),
-                model_name=form.model_name.data,
-                environment_temp=float(form.environment_temp.data)
-                if form.environment_temp.data is not None
-                else None,
-                environment_humidity=float(form.environment_humidity.data)
-                if form.environment_humidity.data is not None
-                else None,
-                material_lot=form.material_lot.data or None,
-                inj_time=float(form.inj_time.data),
-                metering_time=float(form.metering_time.data),
-                vp_position=float(form.vp_position.data),
-                vp_pressure=float(form.vp_pressure.data),
-                min_cushion=float(form.min_cushion.data),
-                peak_pressure=float(form.peak_pressure.data),
-                cycle_time=float(form.cycle_time.data),
-                shot_count=form.shot_count.data,
-                mold_temp_fixed=float(form.mold_temp_fixed.data)
-                if form.mold_temp_fixed.data is not None
-                else None,
-                mold_temp_moving=float(form.mold_temp_moving.data)
-                if form.mold_temp_moving.data is not None
-                else None,
-                nozzle_temp=float(form.nozzle_temp.data) if form.nozzle_temp.data is not None else None,
-                cylinder_front_temp=float(form.cylinder_front_temp.data)
-                if form.cylinder_front_temp.data is not None
-                else None,
-                cylinder_mid1_temp=float(form.cylinder_mid1_temp.data)
-                if form.cylinder_mid1_temp.data is not None
-                else None,
-                cylinder_mid2_temp=float(form.cylinder_mid2_temp.data)
-                if form.cylinder_mid2_temp.data is not None
-                else None,
-                cylinder_rear_temp=float(form.cylinder_rear_temp.data)
-                if form.cylinder_rear_temp.data is not None
-                else None,
-                injection_speed_1=float(form.injection_speed_1.data)
-                if form.injection_speed_1.data is not None
-                else None,
-                injection_speed_2=float(form.injection_speed_2.data)
-                if form.injection_speed_2.data is not None
-                else None,
-                injection_switch_position=float(form.injection_switch_position.data)
-                if form.injection_switch_position.data is not None
-                else None,
-                injection_pressure_setting=float(form.injection_pressure_setting.data)
-                if form.injection_pressure_setting.data is not None
-                else None,
-                injection_time_setting=float(form.injection_time_setting.data)
-                if form.injection_time_setting.data is not None
-                else None,
-                hold_pressure_1=float(form.hold_pressure_1.data)
-                if form.hold_pressure_1.data is not None
-                else None,
-                hold_pressure_2=float(form.hold_pressure_2.data)
-                if form.hold_pressure_2.data is not None
-                else None,
-                hold_time_1=float(form.hold_time_1.data) if form.hold_time_1.data is not None else None,
-                hold_time_2=float(form.hold_time_2.data) if form.hold_time_2.data is not None else None,
-                hold_pressure_total=float(form.hold_pressure_total.data)
-                if form.hold_pressure_total.data is not None
-                else None,
-                metering_position=float(form.metering_position.data)
-                if form.metering_position.data is not None
-                else None,
-                back_pressure=float(form.back_pressure.data) if form.back_pressure.data is not None else None,
-                screw_rotation_speed=int(form.screw_rotation_speed.data)
-                if form.screw_rotation_speed.data is not None
-                else None,
-                cooling_time=float(form.cooling_time.data) if form.cooling_time.data is not None else None,
-                change_note=form.change_note.data or None,
-            )
+            entry = Entry(**fields.form_values(form))
+            values = _entry_values(entry)
+            flagged = limits.check_entries(db_session, [values], **_limit_options())[0]
+            entry.out_of_limit_fields = ",".join(flagged) or None
             db_session.add(entry)
+            summary.record_entries(db_session, [values])
+        entry_feed.publish([entry.id])
+        prefill_cache.record_write(
+            (entry.machine_no, entry.model_name),
+            (entry.work_date, entry.id),
+            fields.condition_values(entry),
+        )
         flash("保存しました。", "success")
+        if flagged:
+            labels = "、".join(getattr(form, field).label.text for field in flagged)
+            flash(f"管理限界を外れた値があります: {labels}", "error")
         return redirect(url_for("main.index", machine=form.machine_no.data))
 
     return render_template(
@@ -242,22 +204,273 @@ def index():
     )
 
 
+def _save_entries(entries: List[dict]):
+    """Insert entries with one multi-row INSERT in one transaction; returns (ids, flagged fields per entry)."""
+    partitions.ensure_months(values["work_date"] for values in entries)
+    with session_scope() as db_session:
+        flags = limits.check_entries(db_session, entries, **_limit_options())
+        for values, flagged in zip(entries, flags):
+            values["out_of_limit_fields"] = ",".join(flagged) or None
+        table = Entry.__table__
+        statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        ids = db_session.scalars(statement, entries).all()
+        client_ids = [
+            {"client_id": values["client_id"], "entry_id": entry_id}
+            for values, entry_id in zip(entries, ids)
+            if values.get("client_id")
+        ]
+        if client_ids:
+            # Raises IntegrityError for a UUID that is already stored, undoing the whole save.
+            db_session.execute(insert(EntryClientId), client_ids)
+        summary.record_entries(db_session, entries)
+    entry_feed.publish(ids)
+
+    latest = {}
+    for values, entry_id in zip(entries, ids):
+        key = (values["machine_no"], values["model_name"])
+        sort_key = (values["work_date"], entry_id)
+        if key not in latest or sort_key >= latest[key][0]:
+            latest[key] = (sort_key, values)
+    for key, (sort_key, values) in latest.items():
+        prefill_cache.record_write(key, sort_key, fields.condition_values(SimpleNamespace(**values)))
+    return ids, flags
+
+
+BATCH_COMMON_FIELDS = ["work_date", "shift", "environment_temp", "environment_humidity"]
+# Per-row inputs besides machine_no/model_name; a row with all of these blank is ignored.
+BATCH_ROW_FIELDS = [
+    "material_lot",
+    "inj_time",
+    "metering_time",
+    "vp_position",
+    "vp_pressure",
+    "min_cushion",
+    "peak_pressure",
+    "cycle_time",
+    "shot_count",
+]
+# Filled per row from the machine/model's latest entry, as the single-entry form does.
+# The change note describes one specific change and is not carried into batch rows.
+BATCH_PREFILL_FIELDS = [name for name in fields.CONDITION_FIELDS if name != "change_note"]
+_BATCH_ROW_KEY = re.compile(r"rows-(\d+)-")
+
+
+def _batch_row_forms(choices, formdata=None, count=0):
+    """One prefixed EntryForm per row; posted rows whose measurements are all blank are dropped."""
+    shift_choices, machine_choices, model_choices = choices
+    if formdata is None:
+        indexes = range(count)
+    else:
+        indexes = sorted({int(match.group(1)) for key in formdata for match in [_BATCH_ROW_KEY.match(key)] if match})
+    rows = []
+    for index in indexes:
+        prefix = f"rows-{index}-"
+        row_data = None
+        if formdata is not None:
+            if not any(formdata.get(prefix + name) for name in BATCH_ROW_FIELDS):
+                continue
+            row_data = MultiDict(
+                [(prefix + name, formdata.get(prefix + name, "")) for name in ["machine_no", "model_name"] + BATCH_ROW_FIELDS]
+                + [(prefix + name, formdata.get(name, "")) for name in BATCH_COMMON_FIELDS]
+            )
+        rows.append(
+            EntryForm(
+                formdata=row_data,
+                prefix=prefix,
+                meta={"csrf": False},
+                machine_choices=machine_choices,
+                model_choices=model_choices,
+                shift_choices=shift_choices,
+            )
+        )
+    return rows
+
+
+@bp.route("/batch", methods=["GET", "POST"])
+def batch_entry():
+    choices = _get_choices()
+    shift_choices, machine_choices, model_choices = choices
+    cfg = current_app.config
+    form = BatchEntryForm(shift_choices=shift_choices)
+    preselected_machine = _resolve_machine(machine_choices)
+    max_rows = cfg.get("BATCH_ENTRY_MAX_ROWS", 50)
+
+    if request.method == "GET":
+        if not form.shift.data:
+            form.shift.data = _guess_shift(shift_choices)
+        rows = _batch_row_forms(choices, count=min(cfg.get("BATCH_ENTRY_ROWS", 5), max_rows))
+        for row in rows:
+            row.machine_no.data = str(preselected_machine or machine_choices[0])
+            row.model_name.data = request.args.get("model") or str(model_choices[0])
+        return render_template("batch.html", form=form, rows=rows, max_rows=max_rows)
+
+    rows = _batch_row_forms(choices, formdata=request.form)
+    rows_valid = all([row.validate() for row in rows])
+    too_many = len(rows) > max_rows
+    if not form.validate_on_submit() or not rows or not rows_valid or too_many:
+        if not rows:
+            flash("入力された行がありません。", "error")
+        if too_many:
+            flash(f"一度に保存できるのは {max_rows} 行までです ({len(rows)} 行入力されています)。", "error")
+        return render_template("batch.html", form=form, rows=rows, max_rows=max_rows)
+
+    entries = []
+    for row in rows:
+        values = fields.form_values(row)
+        conditions = _latest_conditions(values["machine_no"], values["model_name"]) or {}
+        for name in BATCH_PREFILL_FIELDS:
+            if values.get(name) is None:
+                values[name] = conditions.get(name)
+        entries.append(values)
+
+    _, flags = _save_entries(entries)
+
+    flash(f"{len(entries)} 件保存しました。", "success")
+    flagged_rows = [str(number) for number, flagged in enumerate(flags, start=1) if flagged]
+    if flagged_rows:
+        flash(f"管理限界を外れた値がある行: {', '.join(flagged_rows)}", "error")
+    return redirect(url_for("main.batch_entry", machine=preselected_machine, model=entries[-1]["model_name"]))
+
+
+def _sync_entry(payload, choices):
+    """Validate one queued payload with EntryForm; returns (client_id, values or None, errors)."""
+    shift_choices, machine_choices, model_choices = choices
+    try:
+        client_id = str(uuid.UUID(str(payload.get("client_id"))))
+    except (AttributeError, ValueError):
+        return None, None, {"client_id": ["UUID が必要です。"]}
+    formdata = MultiDict({key: "" if value is None else str(value) for key, value in payload.items()})
+    form = EntryForm(
+        formdata=formdata,
+        meta={"csrf": False},
+        machine_choices=machine_choices,
+        model_choices=model_choices,
+        shift_choices=shift_choices,
+    )
+    if not form.validate():
+        return client_id, None, form.errors
+    values = fields.form_values(form)
+    values["client_id"] = client_id
+    return client_id, values, {}
+
+
+@bp.route("/api/csrf-token")
+def api_csrf_token():
+    # The offline queue may replay entries hours later; it asks for a fresh token (and the
+    # batch size /api/entries/sync accepts) right before syncing.
+    max_entries = current_app.config.get("SYNC_MAX_ENTRIES", 200)
+    return jsonify({"csrf_token": generate_csrf(), "sync_max_entries": max_entries})
+
+
+@bp.route("/api/entries/sync", methods=["POST"])
+def api_entries_sync():
+    """Idempotently save entries queued on a tablet while it was offline.
+
+    Each payload carries the EntryForm fields plus a client-generated UUID;
+    payloads whose UUID is already stored are reported as duplicates, so a
+    queue can be replayed safely after a lost response.
+    """
+    body = request.get_json(silent=True)
+    payloads = body.get("entries") if isinstance(body, dict) else None
+    max_entries = current_app.config.get("SYNC_MAX_ENTRIES", 200)
+    if not isinstance(payloads, list) or len(payloads) > max_entries:
+        error = f"entries must be a list of at most {max_entries} items"
+        return jsonify({"error": error, "max_entries": max_entries}), 400
+
+    choices = _get_choices()
+    results, pending = [], {}
+    for payload in payloads:
+        client_id, values, errors = _sync_entry(payload if isinstance(payload, dict) else {}, choices)
+        if values is None:
+            results.append({"client_id": client_id, "status": "invalid", "errors": errors})
+        else:
+            result = {"client_id": client_id, "status": "duplicate"}
+            if client_id not in pending:
+                pending[client_id] = (values, result)
+            results.append(result)
+
+    for attempt in range(2):
+        with session_scope() as db_session:
+            stored = set(
+                db_session.scalars(select(EntryClientId.client_id).where(EntryClientId.client_id.in_(list(pending))))
+            ) if pending else set()
+        new = [(values, result) for client_id, (values, result) in pending.items() if client_id not in stored]
+        if not new:
+            break
+        try:
+            ids, flags = _save_entries([values for values, _ in new])
+        except IntegrityError:
+            # A concurrent sync of the same queue won the race; re-check what is stored now.
+            if attempt:
+                raise
+            continue
+        for (values, result), entry_id, flagged in zip(new, ids, flags):
+            result.update(status="created", id=entry_id, out_of_limit_fields=flagged)
+        break
+
+    return jsonify({"results": results})
+
+
+def _queue_urls():
+    return {"token": url_for("main.api_csrf_token"), "sync": url_for("main.api_entries_sync")}
+
+
+@bp.route("/sw.js")
+def service_worker():
+    # Served from the root so its scope covers the entry form.
+    _, machine_choices, _ = _get_choices()
+    body = render_template(
+        "sw.js",
+        queue_urls=_queue_urls(),
+        entry_pages=[url_for("main.index", machine=machine) for machine in machine_choices],
+        entry_assets=[assets.url(name) for name in ("base.css", "index.css", "index.js", "entry-queue.js")],
+    )
+    response = Response(body, mimetype="application/javascript")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@bp.route("/api/conditions")
+def api_conditions():
+    _, machine_choices, model_choices = _get_choices()
+    machine_no = request.args.get("machine", type=int)
+    model_name = request.args.get("model", "")
+    if machine_no not in machine_choices or model_name not in {str(m) for m in model_choices}:
+        return jsonify({"error": "unknown machine or model"}), 400
+    # The form switches machines through here instead of reloading /?machine=, so remember it the same way.
+    if session.get("machine_no") != machine_no:
+        session["machine_no"] = machine_no
+
+    snapshot = _latest_conditions(machine_no, model_name) or dict.fromkeys(fields.CONDITION_FIELDS)
+    response = jsonify({"machine_no": machine_no, "model_name": model_name, "conditions": snapshot})
+    response.headers["Cache-Control"] = "no-cache"
+    response.add_etag()
+    return response.make_conditional(request)
+
+
 @bp.route("/select-machine")
 def select_machine():
     _, machine_choices, _ = _get_choices()
-    return render_template("select_machine.html", machine_choices=machine_choices)
+    return page_cache.response(
+        "main.select_machine", lambda: render_template("select_machine.html", machine_choices=machine_choices)
+    )
+
 
+# Columns rendered by records.html, plus id for the page cursors.
+RECORDS_COLUMNS = fields.names("record", "key", "environment", "measurement", "condition") + ["out_of_limit_fields"]
 
-def _apply_filters(query, form):
-    if form.machine_no.data:
-        query = query.filter(Entry.machine_no == int(form.machine_no.data))
-    if form.shift.data:
-        query = query.filter(Entry.shift == form.shift.data)
-    if form.date_from.data:
-        query = query.filter(Entry.work_date >= form.date_from.data)
-    if form.date_to.data:
-        query = query.filter(Entry.work_date <= form.date_to.data)
-    return query
+
+def _filter_values(form) -> dict:
+    return {
+        "machine_no": form.machine_no.data or None,
+        "shift": form.shift.data or None,
+        "date_from": form.date_from.data,
+        "date_to": form.date_to.data,
+    }
+
+
+def _apply_filters(query, form, model=Entry):
+    return filter_entries(query, model=model, **_filter_values(form))
 
 
 @bp.route("/records")
@@ -270,81 +483,140 @@ def records():
     )
     form.validate()
 
+    page_size = current_app.config.get("RECORDS_PAGE_SIZE", 250)
+    before = decode_cursor(request.args.get("before"))
+    after = None if before else decode_cursor(request.args.get("after"))
+
+    # The rendered table body and pager cursors, keyed by filters, page and data version.
+    key = (tuple(_filter_values(form).items()), before, after, page_size, prefill_cache.write_stamp())
+    fragment = fragment_cache.get(key)
+    if fragment is MISSING:
+        fragment = _records_fragment(form, before, after, page_size)
+        fragment_cache.put(key, fragment)
+    rows_html, row_count, older_cursor, newer_cursor = fragment
+
+    args = {k: v for k, v in request.args.items() if k not in ("before", "after")}
+    older_url = url_for("main.records", **args, before=older_cursor) if older_cursor else None
+    newer_url = url_for("main.records", **args, after=newer_cursor) if newer_cursor else None
+    # Only the newest page takes live updates; older pages stay as they are.
+    live_url = url_for("main.records_stream", **args) if entry_feed.enabled and not before and not after else None
+    return render_template(
+        "records.html",
+        rows_html=rows_html,
+        row_count=row_count,
+        form=form,
+        page_size=page_size,
+        older_url=older_url,
+        newer_url=newer_url,
+        live_url=live_url,
+    )
+
+
+def stream_arguments() -> Tuple[dict, Optional[int]]:
+    """Filters and resume id of a /records/stream request (shared with app.asgi)."""
+    shift_choices, machine_choices, _ = _get_choices()
+    form = RecordsFilterForm(
+        machine_choices=machine_choices,
+        shift_choices=shift_choices,
+        formdata=request.args,
+    )
+    form.validate()
+    # The browser sends Last-Event-ID on its own reconnects; records-live.js passes it after a 503.
+    last_event_id = request.headers.get("Last-Event-ID", type=int) or request.args.get("last_event_id", type=int)
+    return _filter_values(form), last_event_id
+
+
+@bp.route("/records/stream")
+def records_stream():
+    """Server-sent events of entries saved from now on, filtered like /records.
+
+    Served here under a WSGI server (one thread per stream); app.asgi answers
+    this path on its event loop instead.
+    """
+    if not entry_feed.enabled:
+        abort(404)
+    events = entry_feed.watch(*stream_arguments())
+    if events is None:
+        # Every stream slot of this worker is taken; the page retries later.
+        response = Response(status=503)
+        response.headers["Retry-After"] = str(max(int(entry_feed.max_seconds), 1))
+        return response
+    response = Response(events, mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Stops nginx-style proxies from buffering the stream.
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _records_fragment(form, before, after, page_size):
+    """Rendered table rows of one /records page, their count and the older/newer page cursors."""
+    # Plain Row tuples of the displayed columns instead of full Entry instances.
+    statement = _apply_filters(select(*export_columns(RECORDS_COLUMNS)), form)
+    if after:
+        statement = oldest_first(newer_than(statement, *after))
+    else:
+        statement = newest_first(statement)
+        if before:
+            statement = older_than(statement, *before)
+    # Bounds on work_date let archived months outside the page be skipped.
+    date_from, date_to = form.date_from.data, form.date_to.data
+    if before:
+        date_to = min(date_to, before[0]) if date_to else before[0]
+    if after:
+        date_from = max(date_from, after[0]) if date_from else after[0]
     with session_scope() as db_session:
-        query = db_session.query(Entry).order_by(Entry.work_date.desc(), Entry.id.desc())
-        query = _apply_filters(query, form)
-        rows = query.limit(current_app.config.get("RECORDS_LIMIT", 250)).all()
-
-    limit = current_app.config.get("RECORDS_LIMIT", 250)
-    return render_template("records.html", rows=rows, form=form, records_limit=limit)
-
-
-def _stream_csv(rows, filename):
-    header = [
-        "id",
-        "work_date",
-        "shift",
-        "machine_no",
-        "model_name",
-        "environment_temp",
-        "environment_humidity",
-        "material_lot",
-        "inj_time",
-        "metering_time",
-        "vp_position",
-        "vp_pressure",
-        "min_cushion",
-        "peak_pressure",
-        "cycle_time",
-        "shot_count",
-        "mold_temp_fixed",
-        "mold_temp_moving",
-        "nozzle_temp",
-        "cylinder_front_temp",
-        "cylinder_mid1_temp",
-        "cylinder_mid2_temp",
-        "cylinder_rear_temp",
-        "injection_speed_1",
-        "injection_speed_2",
-        "injection_switch_position",
-        "injection_pressure_setting",
-        "injection_time_setting",
-        "hold_pressure_1",
-        "hold_pressure_2",
-        "hold_time_1",
-        "hold_time_2",
-        "hold_pressure_total",
-        "metering_position",
-            "back_pressure",
-        "screw_rotation_speed",
-        "cooling_time",
-        "change_note",
-        "created_at",
-        "updated_at",
-    ]
+        rows = partitions.fetch(db_session, statement, page_size + 1, date_from, date_to, ascending=bool(after))
 
-    def generate():
-        buffer = StringIO()
-        writer = csv.writer(buffer)
-        writer.writerow(header)
-        yield buffer.getvalue()
-        buffer.seek(0)
-        buffer.truncate(0)
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if after:
+        rows.reverse()
+    has_older = has_more if not after else True
+    has_newer = has_more if after else before is not None
+
+    older_cursor = encode_cursor(rows[-1]) if rows and has_older else None
+    newer_cursor = encode_cursor(rows[0]) if rows and has_newer else None
+    return Markup(render_template("records_rows.html", rows=rows)), len(rows), older_cursor, newer_cursor
 
-        for row in rows:
-            data = row.as_dict()
-            writer.writerow([data.get(column, "") for column in header])
-            yield buffer.getvalue()
-            buffer.seek(0)
-            buffer.truncate(0)
 
-    response = Response(stream_with_context(generate()), mimetype="text/csv; charset=utf-8")
+def _stream_download(chunks, filename, mimetype):
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
     response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
     return response
 
 
+def _stream_csv(chunks, filename):
+    return _stream_download(chunks, filename, "text/csv; charset=utf-8")
+
+
+def _export_filename(extension):
+    stem, _ = os.path.splitext(current_app.config.get("EXPORT_FILENAME", "production-log-export.csv"))
+    return stem + extension
+
+
+def _export_version(form):
+    """(row count, max id, max updated_at) of the filtered entries; changes whenever the export would.
+
+    Counts the whole live table (including late rows of archived months) plus
+    cached per-file results for the archive files in range, so a cache hit does
+    not ATTACH anything.
+    """
+    statement = _apply_filters(select(func.count(Entry.id), func.max(Entry.id), func.max(Entry.updated_at)), form)
+    with session_scope() as db_session:
+        parts = [db_session.execute(statement).one()]
+        parts += partitions.each_archived(db_session, statement, form.date_from.data, form.date_to.data)
+    return (
+        sum(count for count, _, _ in parts),
+        max((max_id for _, max_id, _ in parts if max_id is not None), default=None),
+        max((updated for _, _, updated in parts if updated is not None), default=None),
+    )
+
+
 @bp.route("/export")
 def export():
+    export_format = request.args.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        abort(400)
     shift_choices, machine_choices, _ = _get_choices()
     form = RecordsFilterForm(
         machine_choices=machine_choices,
@@ -352,12 +624,240 @@ def export():
         formdata=request.args,
     )
     form.validate()
+    cfg = current_app.config
+    batch_size = cfg.get("EXPORT_BATCH_SIZE", 1000)
+    chunk_size = cfg.get("EXPORT_CHUNK_SIZE", 64 * 1024)
+    columns = export_columns()
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = _export_filename(extension)
+
+    if request.args.get("async") == "1":
+        job_id = export_jobs.submit(export_format, _filter_values(form))
+        if request.accept_mimetypes.accept_html:
+            return redirect(url_for("main.export_job", job_id=job_id))
+        response = jsonify(_job_json(export_jobs.get(job_id)))
+        response.status_code = 202
+        response.headers["Location"] = url_for("main.api_export_job", job_id=job_id)
+        return response
+
+    if export_cache.enabled:
+        version = _export_version(form)
+        last_modified = version[2]
+        key = export_cache.key(export_format, sorted(_filter_values(form).items()), version)
+        cached = export_cache.get(key, extension)
+        if cached:
+            # send_file hands the open file to the server (sendfile(2) under gunicorn) and answers 304s.
+            response = compression.send_file(
+                cached,
+                mimetype=mimetype,
+                as_attachment=True,
+                download_name=filename,
+                etag=key,
+                last_modified=last_modified,
+            )
+            response.cache_control.no_cache = True
+            return response
+
+    def generate():
+        with session_scope() as db_session:
+            statement = _apply_filters(export_statement(columns), form)
+            yield from export_chunks(
+                metrics.export_batches(
+                    partitions.iter_batches(db_session, statement, batch_size, form.date_from.data, form.date_to.data),
+                    export_format,
+                    "stream",
+                ),
+                columns,
+                export_format,
+                chunk_size,
+                cfg.get("EXPORT_ROW_GROUP_SIZE", 65536),
+            )
+
+    if not export_cache.enabled:
+        return _stream_download(generate(), filename, mimetype)
+
+    response = _stream_download(export_cache.tee(key, extension, generate()), filename, mimetype)
+    response.set_etag(key)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def _job_json(job):
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "format": job["format"],
+        "filters": job["filters"],
+        "rows_total": job["rows_total"],
+        "rows_done": job["rows_done"],
+        "error": job["error"],
+        "status_url": url_for("main.api_export_job", job_id=job["id"]),
+        "download_url": url_for("main.export_job_download", job_id=job["id"]) if job["status"] == "done" else None,
+    }
+
+
+@bp.route("/export/jobs/<job_id>")
+def export_job(job_id):
+    job = export_jobs.get(job_id)
+    if job is None:
+        abort(404)
+    return render_template("export_job.html", job=job)
+
+
+@bp.route("/api/export/jobs/<job_id>")
+def api_export_job(job_id):
+    job = export_jobs.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(_job_json(job))
+
+
+@bp.route("/export/jobs/<job_id>/download")
+def export_job_download(job_id):
+    job = export_jobs.get(job_id)
+    if job is None or job["status"] != "done" or not os.path.exists(job["file_path"]):
+        abort(404)
+    mimetype, extension = EXPORT_FORMATS[job["format"]]
+    return compression.send_file(
+        job["file_path"], mimetype=mimetype, as_attachment=True, download_name=_export_filename(extension)
+    )
+
+
+@bp.route("/import", methods=["GET", "POST"])
+def import_csv():
+    form = ImportForm()
+    result = None
+    if form.validate_on_submit():
+        stream = TextIOWrapper(form.csv_file.data.stream, encoding="utf-8-sig", newline="")
+        result = importer.import_with_config(stream, current_app.config)
+        if result.inserted:
+            flash(f"{result.inserted} 件を取り込みました。", "success")
+        if result.rejected:
+            flash(f"{result.rejected} 行にエラーがあります。", "error")
+        elif not result.inserted:
+            flash("取り込める行がありませんでした。", "error")
+    return render_template("import.html", form=form, result=result)
+
+
+def _summary_rows(form, limit=None):
+    query = select(EntrySummary).order_by(
+        EntrySummary.work_date.desc(),
+        EntrySummary.machine_no,
+        EntrySummary.shift,
+        EntrySummary.model_name,
+    )
+    query = _apply_filters(query, form, model=EntrySummary)
+    if limit:
+        query = query.limit(limit)
     with session_scope() as db_session:
-        query = db_session.query(Entry).order_by(Entry.work_date.desc(), Entry.id.desc())
-        query = _apply_filters(query, form)
-        rows = query.all()
-    filename = current_app.config.get("EXPORT_FILENAME", "production-log-export.csv")
-    return _stream_csv(rows, filename)
+        return db_session.scalars(query).all()
+
+
+@bp.route("/summary")
+def summary_view():
+    shift_choices, machine_choices, _ = _get_choices()
+    form = RecordsFilterForm(
+        machine_choices=machine_choices,
+        shift_choices=shift_choices,
+        formdata=request.args,
+    )
+    form.validate()
+    limit = current_app.config.get("RECORDS_PAGE_SIZE", 250)
+    rows = _summary_rows(form, limit)
+    return render_template(
+        "summary.html",
+        rows=rows,
+        form=form,
+        fields=summary.SUMMARY_FIELDS,
+        limit=limit,
+    )
+
+
+@bp.route("/summary/export")
+def summary_export():
+    shift_choices, machine_choices, _ = _get_choices()
+    form = RecordsFilterForm(
+        machine_choices=machine_choices,
+        shift_choices=shift_choices,
+        formdata=request.args,
+    )
+    form.validate()
+    rows = _summary_rows(form)
+
+    def generate():
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        header = list(summary.SUMMARY_KEYS) + ["entry_count", "shot_count_total"]
+        for field in summary.SUMMARY_FIELDS:
+            header += [f"{field}_mean", f"{field}_min", f"{field}_max", f"{field}_stddev"]
+        writer.writerow(header)
+        for row in rows:
+            values = [row.machine_no, row.model_name, row.work_date.isoformat(), row.shift]
+            values += [row.entry_count, row.shot_count_total]
+            for field in summary.SUMMARY_FIELDS:
+                values += [
+                    row.mean(field),
+                    getattr(row, f"{field}_min"),
+                    getattr(row, f"{field}_max"),
+                    row.stddev(field),
+                ]
+            writer.writerow(values)
+        yield buffer.getvalue()
+
+    filename = current_app.config.get("SUMMARY_EXPORT_FILENAME", "production-log-summary.csv")
+    return _stream_csv(generate(), filename)
+
+
+def _spc_target():
+    _, machine_choices, model_choices = _get_choices()
+    machine_no = request.args.get("machine", type=int)
+    if machine_no not in machine_choices:
+        machine_no = session.get("machine_no")
+    if machine_no not in machine_choices:
+        machine_no = machine_choices[0]
+    model_name = request.args.get("model")
+    if model_name not in {str(m) for m in model_choices}:
+        model_name = str(model_choices[0])
+    return machine_no, model_name
+
+
+def _spc_results(machine_no: int, model_name: str):
+    cfg = current_app.config
+    with session_scope() as db_session:
+        history = spc.load_history(
+            db_session, machine_no, model_name, limit=cfg.get("SPC_HISTORY_LIMIT") or None
+        )
+    return spc.analyse(
+        history,
+        subgroup_size=cfg.get("SPC_SUBGROUP_SIZE", 5),
+        lam=cfg.get("SPC_EWMA_LAMBDA", 0.2),
+        width=cfg.get("SPC_EWMA_WIDTH", 3.0),
+        spec_limits=cfg.get("SPC_SPEC_LIMITS"),
+    )
+
+
+@bp.route("/spc")
+def spc_view():
+    _, machine_choices, model_choices = _get_choices()
+    machine_no, model_name = _spc_target()
+    return render_template(
+        "spc.html",
+        results=_spc_results(machine_no, model_name),
+        machine_choices=machine_choices,
+        model_choices=model_choices,
+        machine_no=machine_no,
+        model_name=model_name,
+        subgroup_size=current_app.config.get("SPC_SUBGROUP_SIZE", 5),
+    )
+
+
+@bp.route("/api/spc")
+def api_spc():
+    machine_no, model_name = _spc_target()
+    results = _spc_results(machine_no, model_name)
+    points = current_app.config.get("SPC_JSON_POINTS", 200)
+    return jsonify({"machine_no": machine_no, "model_name": model_name, "fields": spc.to_json(results, points)})
 
 
 @bp.route("/feedback", methods=["GET", "POST"])
@@ -388,3 +888,10 @@ def feedback_manage():
 @bp.route("/ping")
 def ping():
     return "pong"
+
+
+@bp.route("/metrics")
+def metrics_view():
+    if not metrics.enabled:
+        abort(404)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
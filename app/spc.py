@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+from itertools import chain
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .models import Entry
+from .partitions import partitions
+
+SPC_FIELDS = ("inj_time", "metering_time", "vp_pressure", "min_cushion", "peak_pressure", "cycle_time")
+
+# Shewhart constants per subgroup size: (A2, D3, D4, d2).
+_XBAR_R_CONSTANTS = {
+    2: (1.880, 0.0, 3.267, 1.128),
+    3: (1.023, 0.0, 2.574, 1.693),
+    4: (0.729, 0.0, 2.282, 2.059),
+    5: (0.577, 0.0, 2.114, 2.326),
+    6: (0.483, 0.0, 2.004, 2.534),
+    7: (0.419, 0.076, 1.924, 2.704),
+    8: (0.373, 0.136, 1.864, 2.847),
+    9: (0.337, 0.184, 1.816, 2.970),
+    10: (0.308, 0.223, 1.777, 3.078),
+}
+SUBGROUP_SIZES = tuple(_XBAR_R_CONSTANTS)
+_MOVING_RANGE_D2 = 1.128
+
+# Western Electric zone rules: (name, window, required hits, threshold in sigma).
+_WESTERN_ELECTRIC_RULES = (
+    ("rule1", 1, 1, 3.0),
+    ("rule2", 3, 2, 2.0),
+    ("rule3", 5, 4, 1.0),
+    ("rule4", 8, 8, 0.0),
+)
+
+_EWMA_BLOCK = 64
+_HISTORY_BATCH = 5000
+
+
+def load_history(
+    db_session: Session,
+    machine_no: int,
+    model_name: str,
+    fields: Sequence[str] = SPC_FIELDS,
+    limit: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """Fetch a machine/model's monitored values, oldest first, as one float64 array per field.
+
+    Reads through partitions, so archived months count towards ``limit`` too.
+    """
+    columns = [getattr(Entry, field) for field in fields]
+    # work_date and id come last: the keyset batches of iter_batches() need them.
+    statement = (
+        select(*columns, Entry.work_date, Entry.id)
+        .where(Entry.machine_no == machine_no, Entry.model_name == model_name)
+        .order_by(Entry.work_date.desc(), Entry.id.desc())
+    )
+    if limit:
+        rows = partitions.fetch(db_session, statement, limit)
+    else:
+        rows = list(chain.from_iterable(partitions.iter_batches(db_session, statement, _HISTORY_BATCH)))
+    width = len(fields)
+    values = chain.from_iterable(row[:width] for row in rows)
+    matrix = np.fromiter(values, dtype=np.float64, count=len(rows) * width)
+    matrix = matrix.reshape(len(rows), width)[::-1]
+    return {field: np.ascontiguousarray(matrix[:, index]) for index, field in enumerate(fields)}
+
+
+def _window_sums(flags: np.ndarray, window: int) -> np.ndarray:
+    totals = np.concatenate(([0], np.cumsum(flags, dtype=np.int64)))
+    return totals[window:] - totals[:-window]
+
+
+def western_electric(z: np.ndarray) -> Dict[str, np.ndarray]:
+    """Indices of points (window ends) violating each zone rule, for standardised values ``z``."""
+    violations = {}
+    for name, window, hits, threshold in _WESTERN_ELECTRIC_RULES:
+        if len(z) < window:
+            violations[name] = np.empty(0, dtype=np.int64)
+            continue
+        above = _window_sums(z > threshold, window) >= hits
+        below = _window_sums(z < -threshold, window) >= hits
+        violations[name] = np.flatnonzero(above | below) + window - 1
+    return violations
+
+
+def xbar_r(values: np.ndarray, subgroup_size: int) -> Optional[dict]:
+    """X-bar/R chart over the most recent complete subgroups of consecutive entries."""
+    a2, d3, d4, d2 = _XBAR_R_CONSTANTS[subgroup_size]
+    groups = len(values) // subgroup_size
+    if groups < 2:
+        return None
+    subgroups = values[len(values) - groups * subgroup_size :].reshape(groups, subgroup_size)
+    means = subgroups.mean(axis=1)
+    ranges = np.ptp(subgroups, axis=1)
+    center = means.mean()
+    rbar = ranges.mean()
+    sigma_mean = a2 * rbar / 3
+    z = (means - center) / sigma_mean if sigma_mean > 0 else np.zeros_like(means)
+    return {
+        "subgroups": groups,
+        "center": center,
+        "ucl": center + a2 * rbar,
+        "lcl": center - a2 * rbar,
+        "r_bar": rbar,
+        "r_ucl": d4 * rbar,
+        "r_lcl": d3 * rbar,
+        "sigma_within": rbar / d2,
+        "means": means,
+        "ranges": ranges,
+        "violations": western_electric(z),
+    }
+
+
+def ewma(values: np.ndarray, lam: float, start: float) -> np.ndarray:
+    """EWMA statistic z_t = lam * x_t + (1 - lam) * z_{t-1}, evaluated block-wise with NumPy."""
+    count = len(values)
+    decay = 1.0 - lam
+    padded = np.concatenate((values, np.zeros(-count % _EWMA_BLOCK)))
+    blocks = padded.reshape(-1, _EWMA_BLOCK)
+
+    steps = np.arange(_EWMA_BLOCK)
+    # Within a block (starting from zero): lam * sum_{i<=j} decay^(j-i) * x_i.
+    partial = lam * np.cumsum(blocks * decay ** -steps, axis=1) * decay**steps
+
+    # Carry the value at the end of each block into the next one.
+    block_decay = decay**_EWMA_BLOCK
+    carried = np.empty(len(blocks))
+    previous = start
+    for index, block_end in enumerate(partial[:, -1]):
+        carried[index] = previous
+        previous = block_decay * previous + block_end
+
+    result = partial + carried[:, None] * decay ** (steps + 1)
+    return result.ravel()[:count]
+
+
+def ewma_chart(values: np.ndarray, lam: float, width: float) -> Optional[dict]:
+    if len(values) < 2:
+        return None
+    center = values.mean()
+    sigma = np.abs(np.diff(values)).mean() / _MOVING_RANGE_D2
+    z = ewma(values, lam, center)
+    # The start-up factor 1 - (1 - lam)^(2t) reaches 1.0 in float64 after a few hundred points.
+    warmup = min(len(values), int(np.log(1e-17) / (2 * np.log(1 - lam))) + 1)
+    factor = np.ones(len(values))
+    factor[:warmup] -= (1 - lam) ** (2 * np.arange(1, warmup + 1))
+    spread = width * sigma * np.sqrt(lam / (2 - lam) * factor)
+    if sigma > 0:
+        out_of_control = np.flatnonzero(np.abs(z - center) > spread)
+    else:
+        out_of_control = np.empty(0, dtype=np.int64)
+    return {
+        "center": center,
+        "sigma": sigma,
+        "last": z[-1],
+        "ucl": center + spread[-1],
+        "lcl": center - spread[-1],
+        "values": z,
+        "out_of_control": out_of_control,
+    }
+
+
+def cpk(mean: float, sigma: float, spec: Optional[Tuple[Optional[float], Optional[float]]]) -> Optional[float]:
+    if not spec or not sigma:
+        return None
+    lsl, usl = spec
+    sides = []
+    if usl is not None:
+        sides.append((usl - mean) / (3 * sigma))
+    if lsl is not None:
+        sides.append((mean - lsl) / (3 * sigma))
+    return min(sides) if sides else None
+
+
+def analyse(
+    history: Mapping[str, np.ndarray],
+    subgroup_size: int = 5,
+    lam: float = 0.2,
+    width: float = 3.0,
+    spec_limits: Optional[Mapping[str, Sequence[Optional[float]]]] = None,
+) -> Dict[str, dict]:
+    """X-bar/R, EWMA, Cpk and Western Electric violations for every field in ``history``."""
+    spec_limits = spec_limits or {}
+    results = {}
+    for field, values in history.items():
+        chart = xbar_r(values, subgroup_size)
+        results[field] = {
+            "count": len(values),
+            "mean": values.mean() if len(values) else None,
+            "xbar_r": chart,
+            "ewma": ewma_chart(values, lam, width),
+            "cpk": cpk(values.mean(), chart["sigma_within"], spec_limits.get(field)) if chart else None,
+        }
+    return results
+
+
+def _jsonable(value, points: int):
+    if isinstance(value, dict):
+        return {key: _jsonable(item, points) for key, item in value.items()}
+    if isinstance(value, np.ndarray):
+        return [_jsonable(item, points) for item in value[-points:].tolist()]
+    if isinstance(value, (float, np.floating)):
+        return float(value) if np.isfinite(value) else None
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def to_json(results: Mapping[str, dict], points: int = 200) -> dict:
+    """Plain-Python copy of ``results`` with every array cut to its last ``points`` items."""
+    return _jsonable(dict(results), points)
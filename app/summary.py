@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .models import Entry, EntrySummary
+
+SUMMARY_KEYS = ("machine_no", "model_name", "work_date", "shift")
+SUMMARY_FIELDS = ("cycle_time", "peak_pressure", "min_cushion")
+_TOTAL_COLUMNS = ["entry_count", "shot_count_total"] + [
+    f"{field}_{part}" for field in SUMMARY_FIELDS for part in ("sum", "sumsq", "min", "max")
+]
+
+
+def _aggregate(rows: Iterable[Mapping]) -> Dict[Tuple, dict]:
+    # Per key: [entry_count, shot_count_total] + [sum, sumsq, min, max] per field.
+    groups: Dict[Tuple, list] = {}
+    for row in rows:
+        key = (row["machine_no"], row["model_name"], row["work_date"], row["shift"])
+        totals = groups.get(key)
+        if totals is None:
+            totals = groups[key] = [0, 0]
+            for field in SUMMARY_FIELDS:
+                totals += [0.0, 0.0, row[field], row[field]]
+        totals[0] += 1
+        totals[1] += row["shot_count"] or 0
+        offset = 2
+        for field in SUMMARY_FIELDS:
+            value = row[field]
+            totals[offset] += value
+            totals[offset + 1] += value * value
+            if value < totals[offset + 2]:
+                totals[offset + 2] = value
+            if value > totals[offset + 3]:
+                totals[offset + 3] = value
+            offset += 4
+    return {key: dict(zip(_TOTAL_COLUMNS, totals)) for key, totals in groups.items()}
+
+
+def record_entries(db_session: Session, rows: Iterable[Mapping]):
+    """Fold newly saved entries into their summary rows with one executemany upsert."""
+    groups = _aggregate(rows)
+    if not groups:
+        return
+    dialect = db_session.get_bind().dialect.name
+    insert_factory = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    table = EntrySummary.__table__
+
+    statement = insert_factory(table)
+    excluded = statement.excluded
+    updates = {
+        "entry_count": table.c.entry_count + excluded.entry_count,
+        "shot_count_total": table.c.shot_count_total + excluded.shot_count_total,
+    }
+    for field in SUMMARY_FIELDS:
+        current_min, new_min = table.c[f"{field}_min"], excluded[f"{field}_min"]
+        current_max, new_max = table.c[f"{field}_max"], excluded[f"{field}_max"]
+        updates[f"{field}_sum"] = table.c[f"{field}_sum"] + excluded[f"{field}_sum"]
+        updates[f"{field}_sumsq"] = table.c[f"{field}_sumsq"] + excluded[f"{field}_sumsq"]
+        updates[f"{field}_min"] = case((new_min < current_min, new_min), else_=current_min)
+        updates[f"{field}_max"] = case((new_max > current_max, new_max), else_=current_max)
+    statement = statement.on_conflict_do_update(index_elements=list(SUMMARY_KEYS), set_=updates)
+    db_session.execute(statement, [{**dict(zip(SUMMARY_KEYS, key)), **totals} for key, totals in groups.items()])
+
+
+def backfill(db_session: Session, since: Optional[date] = None) -> int:
+    """Rebuild summary rows from the raw entries; returns the number of summary rows.
+
+    ``since`` limits the rebuild to work dates from then on, keeping the rows
+    of months that were moved out to archive files.
+    """
+    columns = [getattr(Entry, name) for name in SUMMARY_KEYS]
+    aggregates = [func.count(Entry.id), func.coalesce(func.sum(Entry.shot_count), 0)]
+    target = list(SUMMARY_KEYS) + ["entry_count", "shot_count_total"]
+    for field in SUMMARY_FIELDS:
+        column = getattr(Entry, field)
+        aggregates += [func.sum(column), func.min(column), func.max(column), func.sum(column * column)]
+        target += [f"{field}_sum", f"{field}_min", f"{field}_max", f"{field}_sumsq"]
+
+    source = select(*columns, *aggregates).group_by(*columns)
+    stale = delete(EntrySummary)
+    if since is not None:
+        source = source.where(Entry.work_date >= since)
+        stale = stale.where(EntrySummary.work_date >= since)
+    db_session.execute(stale)
+    db_session.execute(insert(EntrySummary).from_select(target, source))
+    return db_session.scalar(select(func.count()).select_from(EntrySummary))
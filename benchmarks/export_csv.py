@@ -0,0 +1,116 @@
+"""Compare CSV export throughput: Entry.as_dict() per row vs. column tuples.
+
+Usage: python benchmarks/export_csv.py [--rows 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from io import StringIO
+from itertools import chain
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app import create_app  # noqa: E402
+from app import database  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.export import (  # noqa: E402
+    EXPORT_COLUMNS,
+    csv_chunks,
+    export_columns,
+    export_statement,
+    iter_batches,
+    newest_first,
+)
+from app.models import Entry  # noqa: E402
+
+
+def seed(rows: int):
+    start = date(2020, 1, 1)
+    payload = [
+        {
+            "work_date": start + timedelta(days=i // 50),
+            "shift": "ABC"[i % 3],
+            "machine_no": 2 + i % 5,
+            "model_name": f"sample{1 + i % 10}",
+            "environment_temp": 24.5,
+            "environment_humidity": 55.0,
+            "material_lot": "LOT-BENCH",
+            "inj_time": 0.35,
+            "metering_time": 1.25,
+            "vp_position": 12.345,
+            "vp_pressure": 85.4,
+            "min_cushion": 0.3,
+            "peak_pressure": 120.5,
+            "cycle_time": 32.5,
+            "shot_count": i,
+            "nozzle_temp": 210.0,
+            "hold_pressure_1": 60.0,
+        }
+        for i in range(rows)
+    ]
+    with database.session_scope() as db_session:
+        db_session.execute(Entry.__table__.insert(), payload)
+
+
+def legacy_export():
+    """The pre-tuple path: ORM entities, as_dict() and one string per row."""
+    with database.session_scope() as db_session:
+        rows = newest_first(db_session.query(Entry)).all()
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        for row in rows:
+            data = row.as_dict()
+            writer.writerow([data.get(column, "") for column in EXPORT_COLUMNS])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+
+def tuple_export(batch_size: int, chunk_size: int):
+    columns = export_columns()
+    with database.session_scope() as db_session:
+        statement = export_statement(columns)
+        yield from csv_chunks(chain.from_iterable(iter_batches(db_session, statement, batch_size)), columns, chunk_size)
+
+
+def measure(label: str, chunks, rows: int):
+    started = time.perf_counter()
+    writes = 0
+    size = 0
+    for chunk in chunks:
+        writes += 1
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<8} {elapsed:8.3f}s {rows / elapsed:12,.0f} rows/s {writes:10,d} writes {size:14,d} chars")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        create_app(type("BenchConfig", (Config,), {"DB_PATH": os.path.join(tmp, "bench.db")}))
+        database.create_all()
+        seed(args.rows)
+
+        measure("legacy", legacy_export(), args.rows)
+        measure("tuples", tuple_export(args.batch_size, args.chunk_size), args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compare /export formats: response size, server time and peak memory (Python heap and Arrow pool).
+
+Usage: python benchmarks/export_formats.py [--rows 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import pyarrow as pa  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app import database  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.export import EXPORT_FORMATS  # noqa: E402
+
+from export_csv import seed  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(type("BenchConfig", (Config,), {"DB_PATH": os.path.join(tmp, "bench.db")}))
+        database.create_all()
+        seed(args.rows)
+        client = app.test_client()
+
+        baseline = None
+        for export_format in EXPORT_FORMATS:
+            tracemalloc.start()
+            started = time.perf_counter()
+            response = client.get(f"/export?format={export_format}")
+            size = sum(len(chunk) for chunk in response.response)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            baseline = baseline or size
+            print(
+                f"{export_format:<8} size={size / 1024 / 1024:8.2f}MiB ({size / baseline:6.1%}) "
+                f"time={elapsed:6.2f}s python-peak={peak / 1024 / 1024:7.2f}MiB "
+                f"arrow-pool-peak={pa.default_memory_pool().max_memory() / 1024 / 1024:7.2f}MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
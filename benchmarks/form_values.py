@@ -0,0 +1,192 @@
+"""Per-submit CPU cost of turning a validated EntryForm into Entry column values.
+
+Compares the original hand-written float()/int() expressions in index(), the
+per-call loop over Entry.__table__.columns that replaced them, and the
+precompiled converters in app.fields. Validation is timed separately so the
+conversion share of a submit is visible.
+
+Usage: python benchmarks/form_values.py [--number 20000] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import timeit
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from werkzeug.datastructures import MultiDict  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app import fields  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.forms import EntryForm  # noqa: E402
+from app.models import Entry  # noqa: E402
+
+FORM_DATA = {
+    "work_date": "2025-06-01",
+    "shift": "A",
+    "machine_no": "3",
+    "model_name": "sample1",
+    "environment_temp": "24.5",
+    "environment_humidity": "55.0",
+    "material_lot": "LOT-1",
+    "inj_time": "0.350",
+    "metering_time": "1.25",
+    "vp_position": "12.345",
+    "vp_pressure": "85.4",
+    "min_cushion": "0.30",
+    "peak_pressure": "120.5",
+    "cycle_time": "32.50",
+    "shot_count": "50",
+    "mold_temp_fixed": "60.0",
+    "mold_temp_moving": "60.0",
+    "nozzle_temp": "210.0",
+    "cylinder_front_temp": "205.0",
+    "cylinder_mid1_temp": "200.0",
+    "cylinder_mid2_temp": "195.0",
+    "cylinder_rear_temp": "190.0",
+    "injection_speed_1": "80.0",
+    "injection_speed_2": "40.0",
+    "injection_switch_position": "15.0",
+    "injection_pressure_setting": "150.0",
+    "injection_time_setting": "2.0",
+    "hold_pressure_1": "60.0",
+    "hold_pressure_2": "40.0",
+    "hold_time_1": "1.5",
+    "hold_time_2": "1.0",
+    "hold_pressure_total": "100.0",
+    "metering_position": "45.0",
+    "back_pressure": "5.0",
+    "screw_rotation_speed": "120",
+    "cooling_time": "15.0",
+}
+
+
+def optional_float(value):
+    return float(value) if value is not None else None
+
+
+def hand_written(form) -> dict:
+    """The expressions index() used to spell out for every column."""
+    return dict(
+        work_date=form.work_date.data,
+        shift=form.shift.data,
+        machine_no=int(form.machine_no.data),
+        model_name=form.model_name.data,
+        environment_temp=float(form.environment_temp.data) if form.environment_temp.data is not None else None,
+        environment_humidity=float(form.environment_humidity.data)
+        if form.environment_humidity.data is not None
+        else None,
+        material_lot=form.material_lot.data or None,
+        inj_time=float(form.inj_time.data),
+        metering_time=float(form.metering_time.data),
+        vp_position=float(form.vp_position.data),
+        vp_pressure=float(form.vp_pressure.data),
+        min_cushion=float(form.min_cushion.data),
+        peak_pressure=float(form.peak_pressure.data),
+        cycle_time=float(form.cycle_time.data),
+        shot_count=form.shot_count.data,
+        mold_temp_fixed=float(form.mold_temp_fixed.data) if form.mold_temp_fixed.data is not None else None,
+        mold_temp_moving=float(form.mold_temp_moving.data) if form.mold_temp_moving.data is not None else None,
+        nozzle_temp=float(form.nozzle_temp.data) if form.nozzle_temp.data is not None else None,
+        cylinder_front_temp=float(form.cylinder_front_temp.data)
+        if form.cylinder_front_temp.data is not None
+        else None,
+        cylinder_mid1_temp=float(form.cylinder_mid1_temp.data) if form.cylinder_mid1_temp.data is not None else None,
+        cylinder_mid2_temp=float(form.cylinder_mid2_temp.data) if form.cylinder_mid2_temp.data is not None else None,
+        cylinder_rear_temp=float(form.cylinder_rear_temp.data) if form.cylinder_rear_temp.data is not None else None,
+        injection_speed_1=float(form.injection_speed_1.data) if form.injection_speed_1.data is not None else None,
+        injection_speed_2=float(form.injection_speed_2.data) if form.injection_speed_2.data is not None else None,
+        injection_switch_position=float(form.injection_switch_position.data)
+        if form.injection_switch_position.data is not None
+        else None,
+        injection_pressure_setting=float(form.injection_pressure_setting.data)
+        if form.injection_pressure_setting.data is not None
+        else None,
+        injection_time_setting=float(form.injection_time_setting.data)
+        if form.injection_time_setting.data is not None
+        else None,
+        hold_pressure_1=float(form.hold_pressure_1.data) if form.hold_pressure_1.data is not None else None,
+        hold_pressure_2=float(form.hold_pressure_2.data) if form.hold_pressure_2.data is not None else None,
+        hold_time_1=float(form.hold_time_1.data) if form.hold_time_1.data is not None else None,
+        hold_time_2=float(form.hold_time_2.data) if form.hold_time_2.data is not None else None,
+        hold_pressure_total=float(form.hold_pressure_total.data)
+        if form.hold_pressure_total.data is not None
+        else None,
+        metering_position=float(form.metering_position.data) if form.metering_position.data is not None else None,
+        back_pressure=float(form.back_pressure.data) if form.back_pressure.data is not None else None,
+        screw_rotation_speed=int(form.screw_rotation_speed.data)
+        if form.screw_rotation_speed.data is not None
+        else None,
+        cooling_time=float(form.cooling_time.data) if form.cooling_time.data is not None else None,
+        change_note=form.change_note.data or None,
+    )
+
+
+def column_loop(form) -> dict:
+    """Generic conversion that inspects every column's type on each call."""
+    values = {}
+    for column in Entry.__table__.columns:
+        field = getattr(form, column.key, None)
+        if field is None:
+            continue
+        data = field.data
+        python_type = column.type.python_type
+        if python_type is str:
+            values[column.key] = data or None
+        elif data is None or python_type is date:
+            values[column.key] = data
+        else:
+            values[column.key] = python_type(data)
+    return values
+
+
+def build_form():
+    form = EntryForm(
+        formdata=MultiDict(FORM_DATA),
+        meta={"csrf": False},
+        machine_choices=[2, 3, 4, 5, 6],
+        model_choices=[f"sample{i}" for i in range(1, 11)],
+        shift_choices=["A", "B", "C"],
+    )
+    if not form.validate():
+        raise SystemExit(f"benchmark form does not validate: {form.errors}")
+    return form
+
+
+def per_call(statement, number: int, repeat: int) -> float:
+    """Median microseconds per call."""
+    return statistics.median(timeit.repeat(statement, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app(type("BenchConfig", (Config,), {"DB_PATH": ":memory:"}))
+    with app.test_request_context("/", method="POST"):
+        form = build_form()
+        expected = hand_written(form)
+        for name, convert in [("column loop", column_loop), ("registry", fields.form_values)]:
+            if convert(form) != expected:
+                raise SystemExit(f"{name} conversion differs from the hand-written one")
+
+        validate = per_call(lambda: build_form(), max(args.number // 20, 1), args.repeat)
+        print(f"{'build + validate form':<24} {validate:8.2f} us/submit")
+        baseline = None
+        for name, convert in [("hand-written", hand_written), ("column loop", column_loop), ("registry", fields.form_values)]:
+            elapsed = per_call(lambda: convert(form), args.number, args.repeat)
+            baseline = baseline or elapsed
+            print(f"{name:<24} {elapsed:8.2f} us/submit  ({baseline / elapsed:4.2f}x vs hand-written)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Delivery latency and database load of the /records/stream live feed with many watchers.
+
+Opens --watchers event streams (half filtered to one machine), saves
+--entries entries one at a time through the form and reports how long each
+took to reach every interested watcher, plus how many SQL statements the
+feed ran compared with every watcher polling /records itself once per save.
+
+Usage: python benchmarks/live_feed.py [--watchers 300] [--entries 50] [--database-url postgresql+psycopg2://...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app import database  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.live import entry_feed  # noqa: E402
+from load_test import entry_form, seed  # noqa: E402
+
+
+class Watcher(threading.Thread):
+    def __init__(self, events, expected: int):
+        super().__init__(daemon=True)
+        self.events = events
+        self.expected = expected
+        self.received = {}
+
+    def run(self):
+        for message in self.events:
+            if message.startswith("id: "):
+                self.received[int(message.split("\n", 1)[0][4:])] = time.perf_counter()
+                if len(self.received) >= self.expected:
+                    break
+        self.events.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--watchers", type=int, default=300)
+    parser.add_argument("--entries", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between saves")
+    parser.add_argument("--database-url", default="", help="PostgreSQL URL (default: SQLite)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        overrides = {
+            "DATABASE_URL": args.database_url,
+            "DB_PATH": os.path.join(tmp, "live.db"),
+            "WTF_CSRF_ENABLED": False,
+            "SESSION_COOKIE_SECURE": False,
+            "METRICS_ENABLED": False,
+            "PREFILL_CACHE_STAMP": os.path.join(tmp, "prefill.stamp"),
+            "LIVE_FEED_MAX_WATCHERS": args.watchers,
+            "LIVE_FEED_QUEUE_SIZE": args.entries + 10,
+        }
+        app = create_app(type("LiveConfig", (Config,), overrides))
+        database.create_all()
+        machines, models = app.config["MACHINE_CHOICES"], [str(m) for m in app.config["MODEL_CHOICES"]]
+        seed(1000, 30, machines, models)
+        machine_no = machines[0]
+
+        statements = []
+        event.listen(database.engine, "before_cursor_execute", lambda *_: statements.append(1))
+
+        watchers = []
+        for index in range(args.watchers):
+            filters = {"machine_no": str(machine_no)} if index % 2 else {}
+            expected = args.entries if not filters else (args.entries + len(machines) - 1) // len(machines)
+            watcher = Watcher(entry_feed.watch(filters), expected)
+            watcher.start()
+            watchers.append(watcher)
+
+        client = app.test_client()
+        rng = random.Random(1)
+        saved = {}
+        statements.clear()
+        for index in range(args.entries):
+            machine = machines[index % len(machines)]
+            form = entry_form(rng, machine, models[0])
+            started = time.perf_counter()
+            response = client.post(f"/?machine={machine}", data=form)
+            if response.status_code != 302:
+                raise SystemExit(f"save failed: {response.status_code}")
+            saved[started] = machine
+            time.sleep(args.interval)
+        for watcher in watchers:
+            watcher.join(timeout=10)
+        feed_statements = len(statements)
+
+    # Each save's id is the n-th delivered id; pair deliveries with save times in order.
+    save_times = sorted(saved)
+    latencies = []
+    for watcher in watchers:
+        ids = sorted(watcher.received)
+        starts = save_times if len(ids) == len(save_times) else [t for t in save_times if saved[t] == machine_no]
+        latencies += [watcher.received[i] - s for i, s in zip(ids, starts)]
+    missing = sum(w.expected - len(w.received) for w in watchers)
+    latencies.sort()
+    print(f"backend            {'postgresql' if args.database_url else 'sqlite'}")
+    print(f"watchers           {args.watchers}")
+    print(f"entries saved      {args.entries}")
+    print(f"deliveries         {len(latencies)} ({missing} missing)")
+    print(f"latency p50        {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"latency p99        {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+    print(f"SQL statements     {feed_statements} (saves + feed)")
+    print(f"polling instead    ~{args.watchers * args.entries} /records queries")
+
+
+if __name__ == "__main__":
+    main()
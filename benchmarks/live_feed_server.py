@@ -0,0 +1,151 @@
+"""Live-feed capacity of a running server: many /records/stream connections over HTTP.
+
+Opens --watchers event streams against --url (half filtered to one
+machine), saves --entries entries through /api/entries/sync and reports how
+many streams the server accepted, delivery latency, and /ping latency while
+the streams are open (a worker whose threads are all held by streams shows
+up there).
+
+Start the server first, for example:
+
+    uvicorn app.asgi:application --port 8000 --workers 2
+    gunicorn wsgi:app -b :8000 --workers 2 --threads 8     (for comparison)
+
+Usage: python benchmarks/live_feed_server.py --url http://127.0.0.1:8000 [--watchers 300] [--entries 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import http.cookiejar
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import urllib.request
+import uuid
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from load_test import entry_form  # noqa: E402
+
+
+class Stream:
+    def __init__(self, query: str):
+        self.query = query
+        self.status = None
+        self.received = {}
+
+    async def run(self, host: str, port: int, ready: asyncio.Event, stop: asyncio.Event):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(
+                f"GET /records/stream{self.query} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode()
+            )
+            await writer.drain()
+            self.status = int((await reader.readline()).split()[1])
+            ready.set()
+            if self.status != 200:
+                return
+            while not stop.is_set():
+                try:
+                    line = await asyncio.wait_for(reader.readline(), 0.5)
+                except asyncio.TimeoutError:
+                    continue
+                if not line:
+                    return
+                if line.startswith(b"id: "):
+                    self.received[int(line[4:])] = time.perf_counter()
+        finally:
+            writer.close()
+
+
+def ping_ms(url: str, count: int = 20) -> float:
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        with urllib.request.urlopen(f"{url}/ping", timeout=30) as response:
+            response.read()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+async def main_async(args):
+    parts = urlsplit(args.url)
+    machines = [int(value) for value in args.machines.split(",")]
+    machine_no = machines[0]
+    streams = [Stream(f"?machine_no={machine_no}" if index % 2 else "") for index in range(args.watchers)]
+    stop = asyncio.Event()
+    tasks = []
+    for stream in streams:
+        ready = asyncio.Event()
+        tasks.append(asyncio.ensure_future(stream.run(parts.hostname, parts.port or 80, ready, stop)))
+        await asyncio.wait_for(ready.wait(), 30)
+    accepted = [stream for stream in streams if stream.status == 200]
+
+    loop = asyncio.get_running_loop()
+    ping = await loop.run_in_executor(None, ping_ms, args.url)
+
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    rng = random.Random(1)
+    saved = {}
+    for index in range(args.entries):
+        machine = machines[index % len(machines)]
+        payload = dict(entry_form(rng, machine, args.model), client_id=str(uuid.uuid4()))
+
+        def save():
+            with opener.open(f"{args.url}/api/csrf-token", timeout=30) as response:
+                token = json.load(response)["csrf_token"]
+            request = urllib.request.Request(
+                f"{args.url}/api/entries/sync",
+                data=json.dumps({"entries": [payload]}).encode(),
+                headers={"Content-Type": "application/json", "X-CSRFToken": token},
+            )
+            started = time.perf_counter()
+            with opener.open(request, timeout=30) as response:
+                result = json.load(response)["results"][0]
+            return started, result["id"]
+
+        started, entry_id = await loop.run_in_executor(None, save)
+        saved[entry_id] = (started, machine)
+        await asyncio.sleep(args.interval)
+
+    await asyncio.sleep(args.poll_wait)
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies, missing = [], 0
+    for stream in accepted:
+        wanted = [i for i, (_, machine) in saved.items() if not stream.query or machine == machine_no]
+        missing += sum(1 for i in wanted if i not in stream.received)
+        latencies += [stream.received[i] - saved[i][0] for i in wanted if i in stream.received]
+    latencies.sort()
+    print(f"url                {args.url}")
+    print(f"watchers           {len(accepted)} accepted / {args.watchers} opened")
+    print(f"/ping p50          {ping:.1f} ms (with the streams open)")
+    print(f"entries saved      {len(saved)}")
+    print(f"deliveries         {len(latencies)} ({missing} missing)")
+    if latencies:
+        print(f"latency p50        {statistics.median(latencies) * 1000:.1f} ms")
+        print(f"latency p99        {latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--watchers", type=int, default=300)
+    parser.add_argument("--entries", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between saves")
+    parser.add_argument("--machines", default="2,3,4,5,6", help="MACHINE_CHOICES of the server")
+    parser.add_argument("--model", default="sample1")
+    parser.add_argument("--poll-wait", type=float, default=3.0, help="seconds to wait for the last deliveries")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare /records render latency and memory: full Entry entities vs. column projection.
+
+Usage: python benchmarks/records_view.py [--pages 250,5000] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from flask import render_template  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app import database  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.export import export_columns  # noqa: E402
+from app.forms import RecordsFilterForm  # noqa: E402
+from app.keyset import newest_first  # noqa: E402
+from app.models import Entry  # noqa: E402
+from app.routes.main import RECORDS_COLUMNS  # noqa: E402
+
+from export_csv import seed  # noqa: E402
+
+
+def load_entities(page_size: int):
+    with database.session_scope() as db_session:
+        return newest_first(db_session.query(Entry)).limit(page_size).all()
+
+
+def load_projection(page_size: int):
+    statement = newest_first(select(*export_columns(RECORDS_COLUMNS))).limit(page_size)
+    with database.session_scope() as db_session:
+        return db_session.execute(statement).all()
+
+
+def render(rows, page_size: int) -> str:
+    form = RecordsFilterForm(machine_choices=[2, 3, 4, 5, 6], shift_choices=["A", "B", "C"], formdata=None)
+    return render_template("records.html", rows=rows, form=form, page_size=page_size, older_url=None, newer_url=None)
+
+
+def measure(label: str, loader, page_size: int, repeat: int) -> str:
+    load_timings = []
+    total_timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = loader(page_size)
+        loaded = time.perf_counter()
+        body = render(rows, page_size)
+        load_timings.append(loaded - started)
+        total_timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    render(loader(page_size), page_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{label:<10} rows={page_size:<6} load={statistics.median(load_timings) * 1000:8.1f}ms "
+        f"total={statistics.median(total_timings) * 1000:8.1f}ms peak={peak / 1024 / 1024:7.2f}MiB"
+    )
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", default="250,5000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    page_sizes = [int(value) for value in args.pages.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(type("BenchConfig", (Config,), {"DB_PATH": os.path.join(tmp, "bench.db")}))
+        database.create_all()
+        seed(max(page_sizes))
+
+        with app.test_request_context("/records"):
+            for page_size in page_sizes:
+                before = measure("entities", load_entities, page_size, args.repeat)
+                after = measure("projection", load_projection, page_size, args.repeat)
+                if before != after:
+                    raise SystemExit("rendered output differs between the two paths")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Per-request cost of /home, /select-machine and /records with and without the render caches.
+
+Compares the page cache (prebuilt bodies, ETag, gzip/brotli variants) and
+the /records fragment cache against rendering every request, including a
+revalidation that ends in 304 Not Modified.
+
+Usage: python benchmarks/render_cache.py [--rows 5000] [--number 300] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app import create_app  # noqa: E402
+from app import database  # noqa: E402
+from app.config import Config  # noqa: E402
+from load_test import seed  # noqa: E402
+
+REQUESTS = {
+    "home": ("/home", {}),
+    "home (gzip)": ("/home", {"Accept-Encoding": "gzip, br"}),
+    "select-machine": ("/select-machine", {}),
+    "records": ("/records", {}),
+    "records (filtered)": ("/records?machine_no=3&shift=A", {}),
+}
+
+
+def per_request(client, url: str, headers: dict, number: int, repeat: int) -> float:
+    """Median milliseconds per request."""
+    client.get(url, headers=headers, buffered=True)
+    timings = timeit.repeat(lambda: client.get(url, headers=headers, buffered=True), number=number, repeat=repeat)
+    return statistics.median(timings) / number * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="entries to seed")
+    parser.add_argument("--number", type=int, default=300, help="requests per timing run")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for label, enabled in [("uncached", False), ("cached", True)]:
+            overrides = {
+                "DB_PATH": os.path.join(tmp, "render.db"),
+                "SESSION_COOKIE_SECURE": False,
+                "METRICS_ENABLED": False,
+                "PAGE_CACHE_ENABLED": enabled,
+                "RECORDS_FRAGMENT_CACHE_SIZE": 128 if enabled else 0,
+            }
+            app = create_app(type("RenderConfig", (Config,), overrides))
+            database.create_all()
+            seed(args.rows, 365, app.config["MACHINE_CHOICES"], [str(m) for m in app.config["MODEL_CHOICES"]])
+            client = app.test_client()
+            results[label] = {
+                name: per_request(client, url, headers, args.number, args.repeat)
+                for name, (url, headers) in REQUESTS.items()
+            }
+            if enabled:
+                etag = client.get("/home").headers["ETag"]
+                results[label]["home (304)"] = per_request(
+                    client, "/home", {"If-None-Match": etag}, args.number, args.repeat
+                )
+
+    print(f"{'request':<20} {'uncached ms':>12} {'cached ms':>10} {'speed-up':>9}")
+    for name, cached in results["cached"].items():
+        uncached = results["uncached"].get(name, results["uncached"]["home"])
+        print(f"{name:<20} {uncached:12.3f} {cached:10.3f} {uncached / cached:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
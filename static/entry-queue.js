@@ -0,0 +1,143 @@
+// 入力内容を IndexedDB に保存し、/api/entries/sync へまとめて送信するキュー。
+// ページとサービスワーカーの両方から読み込まれる（DOM には依存しない）。
+(function (scope) {
+  const DB_NAME = 'data-entry-app';
+  const PENDING = 'pending';
+  const REJECTED = 'rejected';
+
+  const queue = {
+    urls: { token: '/api/csrf-token', sync: '/api/entries/sync' },
+    // 1 回に送る件数。サーバーの SYNC_MAX_ENTRIES に合わせて更新する
+    maxPerSync: 50,
+  };
+
+  function openDb() {
+    return new Promise((resolve, reject) => {
+      const request = indexedDB.open(DB_NAME, 1);
+      request.onupgradeneeded = () => {
+        request.result.createObjectStore(PENDING, { keyPath: 'client_id' });
+        request.result.createObjectStore(REJECTED, { keyPath: 'client_id' });
+      };
+      request.onsuccess = () => resolve(request.result);
+      request.onerror = () => reject(request.error);
+    });
+  }
+
+  async function transaction(stores, mode, work) {
+    const db = await openDb();
+    return new Promise((resolve, reject) => {
+      const tx = db.transaction(stores, mode);
+      const result = work(tx);
+      tx.oncomplete = () => { db.close(); resolve(result); };
+      tx.onerror = () => { db.close(); reject(tx.error); };
+    });
+  }
+
+  function readAll(store) {
+    return transaction([store], 'readonly', (tx) => {
+      const items = [];
+      tx.objectStore(store).openCursor().onsuccess = (event) => {
+        const cursor = event.target.result;
+        if (cursor) {
+          items.push(cursor.value);
+          cursor.continue();
+        }
+      };
+      return items;
+    });
+  }
+
+  function newClientId() {
+    if (scope.crypto && scope.crypto.randomUUID) return scope.crypto.randomUUID();
+    const bytes = scope.crypto.getRandomValues(new Uint8Array(16));
+    bytes[6] = (bytes[6] & 0x0f) | 0x40;
+    bytes[8] = (bytes[8] & 0x3f) | 0x80;
+    const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, '0')).join('');
+    return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+  }
+
+  queue.add = async (fields) => {
+    const entry = { ...fields, client_id: newClientId(), queued_at: new Date().toISOString() };
+    await transaction([PENDING], 'readwrite', (tx) => tx.objectStore(PENDING).put(entry));
+    return entry;
+  };
+
+  queue.pending = () => readAll(PENDING);
+  queue.rejected = () => readAll(REJECTED);
+
+  // 送信を拒否された入力を取り出して削除する。フォームに戻して直してもらうため
+  queue.takeRejected = (clientId) =>
+    transaction([REJECTED], 'readwrite', (tx) => {
+      const taken = {};
+      const store = tx.objectStore(REJECTED);
+      store.get(clientId).onsuccess = (event) => {
+        Object.assign(taken, event.target.result);
+        store.delete(clientId);
+      };
+      return taken;
+    });
+
+  async function post(entries, token) {
+    return fetch(queue.urls.sync, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': token },
+      body: JSON.stringify({ entries }),
+    });
+  }
+
+  async function syncOnce() {
+    const queued = await readAll(PENDING);
+    if (!queued.length) return [];
+    const tokenResponse = await fetch(queue.urls.token, { credentials: 'same-origin' });
+    if (!tokenResponse.ok) throw new Error(`HTTP ${tokenResponse.status}`);
+    const { csrf_token: token, sync_max_entries: limit } = await tokenResponse.json();
+    if (limit > 0) queue.maxPerSync = limit;
+    let pending = queued.slice(0, queue.maxPerSync);
+    let response = await post(pending, token);
+    if (response.status === 400) {
+      // 上限が途中で下がったときは、返ってきた件数に分け直して送り直す
+      const { max_entries: max } = await response.json().catch(() => ({}));
+      if (!(max > 0 && max < pending.length)) throw new Error('HTTP 400');
+      queue.maxPerSync = max;
+      pending = pending.slice(0, max);
+      response = await post(pending, token);
+    }
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    const { results } = await response.json();
+    const byId = new Map(pending.map((entry) => [entry.client_id, entry]));
+    await transaction([PENDING, REJECTED], 'readwrite', (tx) => {
+      results.forEach((result) => {
+        const entry = byId.get(result.client_id);
+        if (!entry) return;
+        tx.objectStore(PENDING).delete(result.client_id);
+        if (result.status === 'invalid') {
+          tx.objectStore(REJECTED).put({ ...entry, errors: result.errors });
+        }
+      });
+    });
+    return results;
+  }
+
+  // 同じコンテキストからの同時送信はまとめる（別タブ・ワーカーとの重複はサーバー側で除外）
+  let running = null;
+  queue.sync = () => {
+    if (!running) {
+      running = (async () => {
+        const results = [];
+        try {
+          for (;;) {
+            const batch = await syncOnce();
+            results.push(...batch);
+            if (batch.length < queue.maxPerSync) return results;
+          }
+        } finally {
+          running = null;
+        }
+      })();
+    }
+    return running;
+  };
+
+  scope.EntryQueue = queue;
+})(self);
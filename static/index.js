@@ -0,0 +1,159 @@
+// 入力画面のスクリプト。URL は読み込み元の <script> タグの data-* 属性で受け取る
+const urls = document.currentScript.dataset;
+const conditionsUrl = urls.conditionsUrl;
+
+// モバイル時のスクロールを抑制し、連続入力で前回値を保持する
+if (window.history.replaceState) {
+  window.history.replaceState(null, document.title, window.location.pathname + window.location.search);
+}
+
+const entryForm = document.querySelector('form.production-form');
+const machineSelect = document.querySelector('select[name="machine_no"]');
+const modelSelect = document.querySelector('select[name="model_name"]');
+const machineBadge = document.querySelector('.header-grid .badge');
+
+function reloadForPrefill() {
+  if (!machineSelect || !modelSelect) return;
+  const params = new URLSearchParams(window.location.search);
+  params.set('machine', machineSelect.value);
+  params.set('model', modelSelect.value);
+  window.location = `${window.location.pathname}?${params.toString()}`;
+}
+
+// 号機/機種の切替時は成形条件だけを JSON で取得し、ページ全体は再読込しない
+async function loadConditions() {
+  if (!machineSelect || !modelSelect) return;
+  const params = new URLSearchParams({ machine: machineSelect.value, model: modelSelect.value });
+  try {
+    const response = await fetch(`${conditionsUrl}?${params.toString()}`, {
+      headers: { Accept: 'application/json' },
+    });
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    const data = await response.json();
+    Object.entries(data.conditions).forEach(([name, value]) => {
+      const input = entryForm.elements.namedItem(name);
+      if (input) input.value = value ?? '';
+    });
+  } catch (error) {
+    reloadForPrefill();
+    return;
+  }
+  window.history.replaceState(null, document.title, `${window.location.pathname}?${params.toString()}`);
+  if (machineBadge) machineBadge.textContent = `#${machineSelect.value} 号機に入力中`;
+}
+
+if (machineSelect) {
+  machineSelect.addEventListener('change', loadConditions);
+}
+if (modelSelect) {
+  modelSelect.addEventListener('change', loadConditions);
+}
+
+// オフラインでも入力を失わないよう、保存は端末内のキューに入れてから送信する
+(() => {
+  if (!window.indexedDB || !window.fetch || !window.EntryQueue) return;
+  EntryQueue.urls = { token: urls.tokenUrl, sync: urls.syncUrl };
+
+  const form = document.querySelector('form.production-form');
+  const status = document.getElementById('queue-status');
+  // 保存後にサーバーで再表示したときと同じく、成形条件以外の入力欄を空にする
+  const clearedFields = [
+    'environment_temp', 'environment_humidity', 'material_lot', 'inj_time', 'metering_time', 'vp_position',
+    'vp_pressure', 'min_cushion', 'peak_pressure', 'cycle_time', 'shot_count',
+  ];
+  let registration = null;
+
+  function labelFor(name) {
+    const label = form.querySelector(`label[for="${name}"]`);
+    return label ? label.textContent.trim() : name;
+  }
+
+  function show(message, warning = false) {
+    status.textContent = message;
+    status.classList.toggle('warning', warning);
+    status.style.display = message ? 'block' : 'none';
+  }
+
+  function errorDetails(entry) {
+    return Object.entries(entry.errors || {}).map(([name, messages]) => `${labelFor(name)}: ${messages[0]}`).join('、');
+  }
+
+  async function restoreRejected(entry) {
+    const typing = clearedFields.some((name) => {
+      const input = form.elements.namedItem(name);
+      return input && input.value;
+    });
+    if (typing && !window.confirm('入力中の値を、送信できなかった入力で置き換えますか？')) return;
+    const restored = await EntryQueue.takeRejected(entry.client_id);
+    Object.entries(restored).forEach(([name, value]) => {
+      const input = form.elements.namedItem(name);
+      if (input && name !== 'csrf_token') input.value = value ?? '';
+    });
+    await refreshStatus();
+    show(`入力欄に戻しました。修正して保存してください（${errorDetails(entry)}）`, true);
+    const first = form.elements.namedItem(Object.keys(entry.errors || {})[0] || '');
+    if (first && first.focus) first.focus();
+  }
+
+  async function refreshStatus(results = []) {
+    const pending = await EntryQueue.pending();
+    const rejected = await EntryQueue.rejected();
+    const flagged = results.filter((r) => r.status === 'created' && r.out_of_limit_fields && r.out_of_limit_fields.length);
+    if (rejected.length) {
+      // 入力値は捨てずに 1 件ずつフォームへ戻し、直して保存し直してもらう
+      const [entry] = rejected;
+      show(`送信できなかった入力が ${rejected.length} 件あります（${errorDetails(entry)}）`, true);
+      const restore = document.createElement('button');
+      restore.type = 'button';
+      restore.textContent = '入力欄に戻して修正';
+      restore.addEventListener('click', () => restoreRejected(entry));
+      status.appendChild(restore);
+    } else if (pending.length) {
+      show(`端末に保存しました。送信待ち ${pending.length} 件（電波が戻ると自動で送信します）`);
+    } else if (flagged.length) {
+      const labels = flagged.flatMap((r) => r.out_of_limit_fields).map(labelFor);
+      show(`保存しました。管理限界を外れた値があります: ${[...new Set(labels)].join('、')}`, true);
+    } else if (results.some((r) => r.status === 'created')) {
+      show('保存しました。');
+    }
+  }
+
+  async function sync() {
+    try {
+      refreshStatus(await EntryQueue.sync());
+    } catch (error) {
+      refreshStatus();
+    }
+  }
+
+  form.addEventListener('submit', async (event) => {
+    if (!form.reportValidity()) {
+      event.preventDefault();
+      return;
+    }
+    event.preventDefault();
+    const fields = Object.fromEntries(new FormData(form));
+    delete fields.csrf_token;
+    delete fields.submit;
+    await EntryQueue.add(fields);
+    clearedFields.forEach((name) => {
+      const input = form.elements.namedItem(name);
+      if (input) input.value = '';
+    });
+    await refreshStatus();
+    if (registration && registration.sync) {
+      registration.sync.register('entry-queue').catch(() => {});
+    }
+    sync();
+  });
+
+  if ('serviceWorker' in navigator) {
+    navigator.serviceWorker
+      .register(urls.serviceWorkerUrl)
+      .then((reg) => { registration = reg; })
+      .catch(() => {});
+  }
+  window.addEventListener('online', sync);
+  setInterval(() => { if (navigator.onLine) sync(); }, 30000);
+  sync();
+})();
@@ -0,0 +1,50 @@
+// 一覧の最新ページに、他の端末で保存された入力をその場で差し込む
+(() => {
+  const script = document.currentScript;
+  const tbody = document.querySelector('.records-table tbody');
+  const status = document.getElementById('live-status');
+  const pageSize = Number(script.dataset.pageSize);
+  if (!window.EventSource || !tbody) return;
+
+  // サーバーの同時接続枠が埋まっている (503) と EventSource は再接続しないので、少し待ってつなぎ直す
+  const RETRY_MS = 60 * 1000;
+  let source = null;
+  let lastId = '';
+
+  const onEntry = (event) => {
+    lastId = event.lastEventId;
+    const data = JSON.parse(event.data);
+    const template = document.createElement('template');
+    template.innerHTML = data.html;
+    const row = template.content.querySelector('tr');
+    if (!row) return;
+    const empty = tbody.querySelector('td[colspan]');
+    if (empty) empty.parentElement.remove();
+
+    // 一覧は日付の新しい順。同じ日付なら後から保存した行を上にする
+    const before = Array.from(tbody.rows).find((r) => r.cells[0].textContent <= data.work_date);
+    if (!before && tbody.rows.length >= pageSize) return;
+    row.classList.add('live-new');
+    tbody.insertBefore(row, before || null);
+    while (tbody.rows.length > pageSize) tbody.deleteRow(-1);
+  };
+
+  const connect = () => {
+    // つなぎ直したときは、途切れていた間の行から受け取る
+    const url = new URL(script.dataset.streamUrl, window.location.href);
+    if (lastId) url.searchParams.set('last_event_id', lastId);
+    source = new EventSource(url);
+    source.addEventListener('open', () => { if (status) status.hidden = false; });
+    source.addEventListener('error', () => {
+      if (status) status.hidden = true;
+      if (source.readyState === EventSource.CLOSED) setTimeout(connect, RETRY_MS);
+    });
+    source.addEventListener('entry', onEntry);
+    // 取りこぼしがあったとき（大量取込・再接続）はページを読み直す
+    source.addEventListener('reset', () => {
+      source.close();
+      window.location.reload();
+    });
+  };
+  connect();
+})();
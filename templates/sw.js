@@ -0,0 +1,71 @@
+// 入力画面をオフラインでも開けるようにし、電波が戻ったら送信待ちの入力を同期する。
+importScripts({{ asset_url('entry-queue.js')|tojson }});
+EntryQueue.urls = {{ queue_urls|tojson }};
+
+const PAGE_CACHE = 'data-entry-pages-v3';
+const INDEX_URL = {{ url_for('main.index')|tojson }};
+// 各号機の入力画面と、そこで使う版付きの静的ファイルだけをキャッシュする
+const ENTRY_PAGES = {{ entry_pages|tojson }};
+const ASSETS = {{ entry_assets|tojson }};
+
+function pageKey(url) {
+  const machine = url.searchParams.get('machine');
+  return machine ? `${INDEX_URL}?machine=${encodeURIComponent(machine)}` : null;
+}
+
+self.addEventListener('install', (event) => {
+  event.waitUntil(
+    caches.open(PAGE_CACHE).then(async (cache) => {
+      await cache.addAll(ASSETS);
+      // セッション (選択中の号機) を書き換えないよう、Cookie なしで取得する
+      await Promise.all(ENTRY_PAGES.map(async (url) => {
+        const response = await fetch(url, { credentials: 'omit' });
+        if (response.ok) await cache.put(url, response);
+      }));
+    }).then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil(
+    caches.keys()
+      .then((names) => Promise.all(names.filter((name) => name !== PAGE_CACHE).map((name) => caches.delete(name))))
+      .then(() => self.clients.claim())
+  );
+});
+
+// 入力画面はネットワーク優先でオフライン時のみキャッシュ、版付きの静的ファイルはキャッシュ優先。
+// 一覧・CSV 出力・ライブ更新などそれ以外のリクエストには関与しない
+self.addEventListener('fetch', (event) => {
+  const { request } = event;
+  const url = new URL(request.url);
+  if (request.method !== 'GET' || url.origin !== self.location.origin) return;
+
+  if (ASSETS.includes(url.pathname + url.search)) {
+    event.respondWith(caches.match(request).then((cached) => cached || fetch(request)));
+    return;
+  }
+  if (request.mode !== 'navigate' || url.pathname !== INDEX_URL) return;
+  const key = pageKey(url);
+  event.respondWith(
+    fetch(request)
+      .then((response) => {
+        if (key && response.ok && !response.redirected) {
+          const copy = response.clone();
+          caches.open(PAGE_CACHE).then((cache) => cache.put(key, copy));
+        }
+        return response;
+      })
+      .catch(async () => {
+        const cache = await caches.open(PAGE_CACHE);
+        const cached = (key && await cache.match(key)) || await cache.match(ENTRY_PAGES[0]);
+        return cached || Response.error();
+      })
+  );
+});
+
+self.addEventListener('sync', (event) => {
+  if (event.tag === 'entry-queue') {
+    event.waitUntil(EntryQueue.sync());
+  }
+});
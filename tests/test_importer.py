@@ -0,0 +1,86 @@
+import csv
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+os.environ.setdefault("SECRET_KEY", "test")
+
+from app import create_app, database  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.forms import EntryForm  # noqa: E402
+from app.importer import IMPORT_COLUMNS, import_csv  # noqa: E402
+
+CHOICES = {"machine_choices": [3], "model_choices": ["sample1"], "shift_choices": ["A"]}
+ROW = {
+    "work_date": "2024-01-01",
+    "shift": "A",
+    "machine_no": "3",
+    "model_name": "sample1",
+    "environment_temp": "20",
+    "environment_humidity": "50",
+    "material_lot": "LOT-1",
+    "inj_time": "0.35",
+    "metering_time": "1.2",
+    "vp_position": "12.3",
+    "vp_pressure": "85",
+    "min_cushion": "0.3",
+    "peak_pressure": "120",
+    "cycle_time": "32.5",
+    "shot_count": "1",
+}
+NOT_NUMBERS = ["nan", "NaN", "inf", "-inf", "Infinity", "1e400", "abc"]
+
+
+@pytest.fixture
+def app(tmp_path):
+    overrides = {
+        "DATABASE_URL": "",
+        "DB_PATH": str(tmp_path / "test.db"),
+        "ARCHIVE_DIR": str(tmp_path / "archive"),
+        "METRICS_ENABLED": False,
+        "WTF_CSRF_ENABLED": False,
+        "TESTING": True,
+    }
+    app = create_app(type("TestConfig", (Config,), overrides))
+    with app.app_context():
+        database.create_all()
+        yield app
+
+
+def _csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(IMPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([row.get(name, "") for name in IMPORT_COLUMNS])
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize("column", ["inj_time", "nozzle_temp"])
+@pytest.mark.parametrize("raw", NOT_NUMBERS)
+def test_import_rejects_non_finite_numbers(app, column, raw):
+    result = import_csv(_csv([ROW, dict(ROW, **{column: raw})]), **CHOICES)
+
+    assert (result.inserted, result.rejected) == (1, 1)
+    assert [(issue.line, issue.column) for issue in result.errors] == [(3, column)]
+
+
+@pytest.mark.parametrize("column", ["inj_time", "nozzle_temp"])
+@pytest.mark.parametrize("raw", NOT_NUMBERS)
+def test_form_rejects_non_finite_numbers(app, column, raw):
+    with app.test_request_context():
+        form = EntryForm(formdata=MultiDict(dict(ROW, **{column: raw})), meta={"csrf": False}, **CHOICES)
+        assert not form.validate()
+        assert column in form.errors
+
+
+def test_import_reports_physical_line_numbers(app):
+    rows = [dict(ROW, change_note="first line\nsecond line"), ROW, dict(ROW, inj_time="-1")]
+    result = import_csv(_csv(rows), **CHOICES)
+
+    # Header on line 1, the two-line note on lines 2-3, then lines 4 and 5.
+    assert (result.inserted, result.rejected) == (2, 1)
+    assert [(issue.line, issue.column) for issue in result.errors] == [(5, "inj_time")]